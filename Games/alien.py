@@ -1,5 +1,9 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import time, statistics, copy
+import time, copy
+from indexedScreen import Palette, Screen
+from slidingWindow import SlidingWindow
+from sensorSampler import SensorSampler
+from asyncRuntime import wait
 
 class Alien(object):
     """
@@ -21,12 +25,14 @@ class Alien(object):
     black = O = [0, 0, 0]
     white = W = [255, 255, 255]
 
+    palette = Palette([O, B, R, P, K, orange, Y, G, W])
+
     menuItemPixels = [
     W, W, R, R, W, W,
     W, W, R, R, W, W
     ]
 
-    normal_screens = [[
+    normal_screens = [Screen.fromPixels(palette, [
     W, W, W, R, R, W, W, W,
     W, W, R, W, W, R, W, W,
     W, R, W, W, W, W, R, W,
@@ -35,7 +41,7 @@ class Alien(object):
     W, R, W, W, W, W, R, W,
     W, W, R, W, W, R, W, W,
     W, W, W, R, R, W, W, W
-    ],[
+    ]), Screen.fromPixels(palette, [
     W, W, W, R, R, W, W, W,
     W, W, R, W, W, R, W, W,
     W, R, W, W, W, W, R, W,
@@ -44,9 +50,9 @@ class Alien(object):
     W, R, W, W, W, W, R, W,
     W, W, R, W, W, R, W, W,
     W, W, W, R, R, W, W, W
-    ]]
+    ])]
 
-    human_screens = [[
+    human_screens = [Screen.fromPixels(palette, [
     O, K, K, O, O, K, K, O,
     K, K, K, K, K, K, K, K,
     K, K, K, K, K, K, K, K,
@@ -55,7 +61,7 @@ class Alien(object):
     O, O, K, K, K, K, O, O,
     O, O, O, K, K, O, O, O,
     O, O, O, O, O, O, O, O
-    ],[
+    ]), Screen.fromPixels(palette, [
     O, O, O, O, O, O, O, O,
     O, K, K, O, O, K, K, O,
     K, K, K, K, K, K, K, K,
@@ -64,9 +70,9 @@ class Alien(object):
     O, K, K, K, K, K, K, O,
     O, O, K, K, K, K, O, O,
     O, O, O, K, K, O, O, O
-    ]]
+    ])]
 
-    alien_screens = [[
+    alien_screens = [Screen.fromPixels(palette, [
     O, O, O, O, O, O, O, O,
     O, B, O, O, O, O, B, O,
     O, O, B, O, O, B, O, O,
@@ -75,7 +81,7 @@ class Alien(object):
     B, B, B, B, B, B, B, B,
     B, B, B, B, B, B, B, B,
     B, O, B, O, O, B, O, B
-    ],[
+    ]), Screen.fromPixels(palette, [
     O, B, O, O, O, O, B, O,
     O, O, B, O, O, B, O, O,
     O, B, B, B, B, B, B, O,
@@ -84,7 +90,7 @@ class Alien(object):
     B, B, B, B, B, B, B, B,
     B, O, B, O, O, B, O, B,
     O, O, B, O, O, B, O, O
-    ]]
+    ])]
 
     HUMAN = 0
     ALIEN = 1
@@ -94,9 +100,10 @@ class Alien(object):
         self.sense.stick.direction_any = self.joystick_any
         self.shouldExit = False
         self.nextDetection = Alien.HUMAN
-        self.dataCount = Alien.P_DURATIUON / Alien.P_INTERVAL
-        self.temperatureArray = []
-        self.humidityArray = []
+        self.temperatureWindow = SlidingWindow(Alien.P_DURATIUON)
+        self.humidityWindow = SlidingWindow(Alien.P_DURATIUON)
+        # センサーはバックグラウンドで読み取る
+        self.sampler = SensorSampler(sense, {"temperature": Alien.P_INTERVAL, "humidity": Alien.P_INTERVAL})
 
     @classmethod
     def getName(cls):
@@ -123,26 +130,24 @@ class Alien(object):
 
     def getLatestTemperature(self):
         """ 
-        最新の温度を測定し、 self.temperatureArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.temperatureArray を最新のものにする。
+        サンプラーが読み取った最新の温度を、self.temperatureWindow に追加する。
+        self.temperatureWindow は過去 P_DURATIUON 秒分の値を保つ。
         最新の温度を返す。
         """
-        t = self.sense.temperature
-        self.temperatureArray.append(t)
-        if len(self.temperatureArray) > self.dataCount:
-            del(self.temperatureArray[0])
+        sample = self.sampler.get("temperature")
+        t = sample["value"]
+        self.temperatureWindow.appendIfNewer(t, sample["time"])
         return t        
 
     def getLatestHumidity(self):
         """ 
-        最新の湿度を測定し、 self.humidityArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.humidityArray を最新のものにする。
+        サンプラーが読み取った最新の湿度を、self.humidityWindow に追加する。
+        self.humidityWindow は過去 P_DURATIUON 秒分の値を保つ。
         最新の湿度を返す。
         """
-        h = self.sense.humidity
-        self.humidityArray.append(h)
-        if len(self.humidityArray) > self.dataCount:
-            del(self.humidityArray[0])
+        sample = self.sampler.get("humidity")
+        h = sample["value"]
+        self.humidityWindow.appendIfNewer(h, sample["time"])
         return h
 
     def showDetection(self):
@@ -157,56 +162,55 @@ class Alien(object):
         while duration <= Alien.P_DURATION_SHOW_DETECTION and not self.shouldExit:
             now = time.monotonic()
             subsecond = now % 1
-            screen = []
+            screen = None
             if subsecond < 0.5:
                 screen = screens[0]
             else:
                 screen = screens[1]
-            self.sense.set_pixels(screen)
+            self.sense.set_pixels(screen.toPixels())
             time.sleep(Alien.P_INTERVAL)
-            t = self.getLatestTemperature() # This is needed to update self.temperatureArray 
-            h = self.getLatestHumidity() # This is needed to update self.humidityArray 
+            t = self.getLatestTemperature() # This is needed to update self.temperatureWindow 
+            h = self.getLatestHumidity() # This is needed to update self.humidityWindow 
             # print("t:{:.2f}".format(t))
             duration = now - start_time
 
     def showAnalyzingScreen(self):
         screen0 = Alien.normal_screens[0]
-        screen1 = copy.copy(screen0)
-        for i in range(len(screen1)):
-            if screen1[i] == Alien.W:
-                screen1[i] = Alien.Y
+        screen1 = screen0.translate(Alien.palette.getTranslationTable(Alien.W, Alien.Y))
         count = 5
         while count > 0 and not self.shouldExit:
             if count % 2 == 1:
-                self.sense.set_pixels(screen1)
+                self.sense.set_pixels(screen1.toPixels())
             else:
-                self.sense.set_pixels(screen0)
+                self.sense.set_pixels(screen0.toPixels())
             count -= 1
-            time.sleep(Alien.P_INTERVAL * 5)
+            wait(self.sense, Alien.P_INTERVAL * 5)
 
     def run(self):
         print(self.__class__.__name__ + " is running")
+        self.sampler.start()
         while not self.shouldExit:
             t = self.getLatestTemperature()
-            t_ave = statistics.mean(self.temperatureArray)
+            t_ave = self.temperatureWindow.mean()
             t_delta = t - t_ave
             h = self.getLatestHumidity()
-            h_ave = statistics.mean(self.humidityArray)
+            h_ave = self.humidityWindow.mean()
             h_delta = h - h_ave
             t_h_multiple = 0 if t_delta <= 0 or h_delta <= 0 else t_delta * h_delta
             # print("t_delta:{:+.2f}, h_delta:{:+.2f}, t_h_multiple:{:+.2f}, {:}".format(t_delta, h_delta, t_h_multiple, "OK" if t_h_multiple >= 0.1 else ""))
             if t_h_multiple > Alien.P_THRESHOLD:
-                self.temperatureArray.pop()
+                self.temperatureWindow.pop()
                 self.showAnalyzingScreen()
                 self.showDetection()
             subsecond = time.monotonic() % 1
-            screen = []
+            screen = None
             if subsecond < 0.5:
                 screen = Alien.normal_screens[0]
             else:
                 screen = Alien.normal_screens[1]
-            self.sense.set_pixels(screen)
+            self.sense.set_pixels(screen.toPixels())
             time.sleep(Alien.P_INTERVAL)
+        self.sampler.stop()
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
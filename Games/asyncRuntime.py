@@ -0,0 +1,233 @@
+"""
+メニューから起動するゲームを実行し、途中で止められるようにする。
+
+ゲームには CancellableSense を渡す。ゲームの run() の種類によって、2通りの方法で実行する。
+- run() がコルーチン関数（async def run）のゲームは、asyncio のタスクとしてイベントループで実行する。
+  ジョイスティックのイベントは sense.stick.events() の非同期イテレーターで受け取れ、待つ処理は await sense.sleep() で行う。
+  キャンセルされると、タスクがキャンセルされるので、await しているところで、フレームの途中でも止まる。
+- run() が普通の関数のゲームは、これまでどおりブロックする run() を別のスレッド（デーモンスレッド）で動かす。
+  このスレッドは止められないので、協調的にキャンセルする。ジョイスティックのイベントは direction_any などでゲームに渡し、
+  ゲームが shouldExit を True にしたら、その場でキャンセルを知らせる。
+  キャンセルされると、CancellableSense.show_message() のスクロールと、wait() で待っているゲームは、次の画面を表示する前に戻る。
+  長く待つ処理（点滅など）は、time.sleep() の代わりに wait() を使うことで、終了の操作にすぐに応じられる。
+"""
+import time, asyncio, threading
+from textRenderer import TextRenderer
+
+def wait(sense, seconds):
+    """
+    seconds 秒待つ。sense が CancellableSense であれば、キャンセルされたらすぐに戻る。
+    そうでなければ（ゲームを単独で実行している場合など）、time.sleep() で待つ。
+    """
+    if isinstance(sense, CancellableSense):
+        sense.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+class CancellableStick(object):
+    """
+    ゲームに渡す sense.stick の代わり。ゲームが設定した direction_any などを保持し、GameRuntime から呼ぶ。
+    コルーチンのゲームを実行している間は、イベントを queue にも入れるので、events() で受け取れる。
+    """
+
+    def __init__(self):
+        self.direction_up = None
+        self.direction_down = None
+        self.direction_left = None
+        self.direction_right = None
+        self.direction_middle = None
+        self.direction_any = None
+        self.loop = None # queue を使うイベントループ
+        self.queue = None # events() で返すイベントの asyncio.Queue。コルーチンのゲームを実行している間だけ設定する
+
+    def dispatch(self, event):
+        """
+        イベントをゲームに渡す。ジョイスティックのスレッドなど、どのスレッドから呼んでもよい。
+        """
+        callback = getattr(self, "direction_" + event.direction, None)
+        if callback is not None:
+            callback(event)
+        if self.direction_any is not None:
+            self.direction_any(event)
+        if self.queue is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+            except RuntimeError:
+                pass # イベントループが先に終了した
+
+    async def events(self):
+        """
+        ジョイスティックのイベントを、届いた順に返す非同期イテレーター。コルーチンのゲームの中で async for で使う。
+        """
+        if self.queue is None:
+            raise RuntimeError("Joystick events are only available to coroutine games run by GameRuntime")
+        while True:
+            yield await self.queue.get()
+
+
+class CancellableSense(object):
+    """
+    ゲームに渡す sense の代わり。stick と show_message() 以外は、本物の sense にそのまま渡す。
+    show_message() は1画面ずつ表示し、キャンセルされたらスクロールの途中でも終わる。
+    """
+
+    def __init__(self, sense, cancelEvent):
+        self.sense = sense
+        self.stick = CancellableStick()
+        self.cancelEvent = cancelEvent
+        self.renderer = TextRenderer(sense)
+
+    def __getattr__(self, name):
+        return getattr(self.sense, name)
+
+    def isCancelled(self):
+        return self.cancelEvent.is_set()
+
+    def wait(self, seconds):
+        """
+        seconds 秒待つ。キャンセルされたらすぐに戻る。
+        time が仮想の時計の場合は、その時計で待つ。
+        """
+        if getattr(time, "waitForEvent", None) is not None:
+            time.sleep(seconds)
+        else:
+            self.cancelEvent.wait(seconds)
+
+    async def sleep(self, seconds):
+        """
+        コルーチンのゲームで、seconds 秒待つ。キャンセルされると、待っている途中で asyncio.CancelledError になる。
+        time が仮想の時計の場合は、その時計で待ってから、1度イベントループに戻る。
+        """
+        if getattr(time, "waitForEvent", None) is not None:
+            time.sleep(seconds)
+            seconds = 0
+        await asyncio.sleep(seconds)
+
+    def show_message(self, text_string, scroll_speed=0.1, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        for frame in self.renderer.iterateMessageFrames(text_string, text_colour, back_colour):
+            if self.isCancelled():
+                break
+            self.sense.set_pixels(frame)
+            self.wait(scroll_speed)
+
+
+class GameRuntime(object):
+    """
+    ゲームを実行し、途中で止められるようにする。
+    run() がコルーチン関数のゲームは、イベントループのタスクとして実行し、キャンセルするとタスクをキャンセルする。
+    そうでないゲームは、run() をデーモンスレッドで動かし、終了したら Future で知らせるので、イベントループは他の処理をしながら待てる。
+    ゲームが終了を求めたら（shouldExit が True になったら）、その場で CancellableSense にキャンセルを知らせる。
+    runGame() のコルーチン自体がキャンセルされた場合（Ctrl-C など）も、ゲームにキャンセルを知らせる。
+    ゲームのスレッドはデーモンスレッドなので、ゲームが終わらなくても、インタープリターの終了を妨げない。
+    """
+
+    def __init__(self, sense):
+        self.sense = sense
+        self.cancelEvent = None
+        self.game = None # 実行中のゲーム
+        self.gameTask = None # 実行中のコルーチンのゲームのタスク
+        self.loop = None # 実行中のゲームのイベントループ
+        self.eventCount = 0 # 実行中のゲームに渡したジョイスティックのイベントの数
+        self.cancelTime = None # 最後にキャンセルを知らせた時刻（time.monotonic()）
+
+    @classmethod
+    def isCoroutineGame(cls, gameClass):
+        return asyncio.iscoroutinefunction(gameClass.run)
+
+    def startGameThread(self, loop, game):
+        """
+        game.run() をデーモンスレッドで開始し、終了したら結果が設定される Future を返す。
+        """
+        gameFuture = loop.create_future()
+        def setResult(exception):
+            if gameFuture.done():
+                return
+            if exception is None:
+                gameFuture.set_result(None)
+            else:
+                gameFuture.set_exception(exception)
+        def runGame():
+            exception = None
+            try:
+                game.run()
+            except Exception as e:
+                exception = e
+            try:
+                loop.call_soon_threadsafe(setResult, exception)
+            except RuntimeError:
+                pass # イベントループが先に終了した（Ctrl-C など）
+        threading.Thread(target=runGame, name=game.__class__.__name__, daemon=True).start()
+        return gameFuture
+
+    async def runGameTask(self, game):
+        """
+        コルーチンのゲームの run() をタスクとして実行し、終了するまで待つ。
+        ゲームがキャンセルされて終わった場合は、正常に終了したものとする。
+        """
+        task = self.gameTask = asyncio.ensure_future(game.run())
+        try:
+            # asyncio.wait() は、ゲームのタスクがキャンセルされても例外にならず、runGame() 自体のキャンセルだけが例外になる
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            self.gameTask = None
+        if not task.cancelled():
+            task.result() # ゲームの例外を呼び出し元に伝える
+
+    async def runGame(self, gameClass):
+        """
+        ゲームを実行し、終了するまで待つコルーチン。ゲームのインスタンスを返す。
+        """
+        loop = self.loop = asyncio.get_running_loop()
+        self.cancelEvent = threading.Event()
+        self.eventCount = 0
+        sense = CancellableSense(self.sense, self.cancelEvent)
+        game = self.game = gameClass(sense)
+        isCoroutineGame = GameRuntime.isCoroutineGame(gameClass)
+        if isCoroutineGame:
+            sense.stick.loop = loop
+            sense.stick.queue = asyncio.Queue()
+        def onJoystick(event):
+            # ジョイスティックのスレッドから呼ばれる
+            self.eventCount += 1
+            sense.stick.dispatch(event)
+            if getattr(game, "shouldExit", False) and not self.cancelEvent.is_set():
+                self.cancel()
+        self.sense.stick.direction_any = onJoystick
+        try:
+            if isCoroutineGame:
+                await self.runGameTask(game)
+            else:
+                await self.startGameThread(loop, game)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        finally:
+            sense.stick.queue = None
+            self.game = None
+        return game
+
+    def cancel(self):
+        """
+        実行中のゲームにキャンセルを知らせる。どのスレッドから呼んでもよい。
+        コルーチンのゲームは、タスクをキャンセルする。
+        """
+        self.cancelTime = time.monotonic()
+        if self.game is not None:
+            self.game.shouldExit = True
+        self.cancelEvent.set()
+        task = self.gameTask
+        if task is not None:
+            try:
+                self.loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass # イベントループが先に終了した
+
+    def run(self, gameClass):
+        """
+        同期的なコードから、ゲームを実行して終了するまで待つ。
+        """
+        return asyncio.run(self.runGame(gameClass))
@@ -1,5 +1,7 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
 import math, time, copy
+from indexedScreen import Palette, Screen
+from frameScheduler import FrameScheduler
 
 class Ball(object):
     """
@@ -18,12 +20,14 @@ class Ball(object):
     white = W = [255, 255, 255]
     ball_color = green
 
+    palette = Palette([O, G, R, pink, orange, yellow, W])
+
     menuItemPixels = [
     R, R, G, G, R, R,
     R, R, G, G, R, R
     ]
 
-    normal_screen = [
+    normal_screen = Screen.fromPixels(palette, [
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
@@ -32,9 +36,9 @@ class Ball(object):
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O
-    ]
+    ])
 
-    alert_screen = [
+    alert_screen = Screen.fromPixels(palette, [
     R, R, R, R, R, R, R, R,
     R, R, R, R, R, R, R, R,
     R, R, R, R, R, R, R, R,
@@ -43,7 +47,7 @@ class Ball(object):
     R, R, R, R, R, R, R, R,
     R, R, R, R, R, R, R, R,
     R, R, R, R, R, R, R, R
-    ]
+    ])
 
     def __init__(self, sense):
         self.sense = sense
@@ -74,7 +78,7 @@ class Ball(object):
     def run(self):
         print(self.__class__.__name__ + " is running")
         pre_x = pre_y = -1
-        lastFrameTime = time.monotonic()
+        scheduler = FrameScheduler(Ball.P_FRAME_TIME)
         while not self.shouldExit:
             orientation_rad = self.sense.get_orientation_radians()
             #print("p: {pitch}, r: {roll}, y: {yaw}".format(**orientation_rad))
@@ -92,25 +96,21 @@ class Ball(object):
             #print("x: %d, y: %d, pre_x: %d, pre_y: %d" % (x, y, pre_x, pre_y))
             
             if not(pre_x == x and pre_y == y and xF["flag"] and yF["flag"]):
-                pixels = []
+                pixels = None
                 if xF["flag"] and yF["flag"]:
-                    pixels = copy.copy(Ball.normal_screen)
+                    pixels = Ball.normal_screen.copy()
                 else:
-                    pixels = copy.copy(Ball.alert_screen)
-                pixels[y*8 + x] = Ball.ball_color
-                pixels[y*8 + x+1] = Ball.ball_color
-                pixels[(y+1)*8 + x] = Ball.ball_color
-                pixels[(y+1)*8 + x+1] = Ball.ball_color
-                self.sense.set_pixels(pixels)
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
+                    pixels = Ball.alert_screen.copy()
+                ball = Ball.palette.getIndex(Ball.ball_color)
+                pixels[y*8 + x] = ball
+                pixels[y*8 + x+1] = ball
+                pixels[(y+1)*8 + x] = ball
+                pixels[(y+1)*8 + x+1] = ball
+                self.sense.set_pixels(pixels.toPixels())
             pre_x = x
             pre_y = y
-            if Ball.P_FRAME_TIME - duration >0:
-                time.sleep(Ball.P_FRAME_TIME - duration)
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}".format(Ball.P_FRAME_TIME))
+            scheduler.waitForNextFrame()
+        print(scheduler.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
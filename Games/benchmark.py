@@ -0,0 +1,576 @@
+"""
+ゲームの処理時間などを、EmulatedSenseHat を使って実機なしで測定する。
+結果は JSON で出力するので、測定結果を保存して比較できる。
+
+    python3 benchmark.py games --frames 300 --output result.json
+    python3 benchmark.py startup --repeat 5
+    python3 benchmark.py menu
+    python3 benchmark.py mazes --sizes 15 101 1001 --games Maze LargeMaze
+    python3 benchmark.py viewport --sizes 15 501
+    python3 benchmark.py cache --sizes 101 501
+    python3 benchmark.py batch --sizes 101 301 --processes 1 2 3 4
+"""
+import sys, os, time, math, random, json, argparse, platform, subprocess, tracemalloc, tempfile
+from emulatedSenseHat import VirtualClock, EmulatedSenseHat, installSenseHatModule, installVirtualTime
+from asyncRuntime import GameRuntime
+
+class FrameLimitExceeded(Exception):
+    """
+    終了のイベントを送っても、ゲームが終了しなかった場合に、ゲームを中断するために使う。
+    """
+    pass
+
+
+class FrameProbe(VirtualClock):
+    """
+    sleep() が呼ばれるたびに、前の sleep() から戻ってからの実際の時間を1フレームの処理時間として記録する仮想の時計。
+    frameLimit フレームを記録したら onLimit() を呼ぶ（ゲームに終了のイベントを送る）。
+    traceAllocations が True の場合は、1フレームの間に確保したメモリーも記録する。
+    """
+    P_EXIT_FRAME_LIMIT = 10000 # 終了のイベントを送ってから、ゲームの終了を待つ最大のフレーム数
+
+    def __init__(self, frameLimit, onLimit, traceAllocations=False):
+        VirtualClock.__init__(self)
+        self.frameLimit = frameLimit
+        self.onLimit = onLimit
+        self.traceAllocations = traceAllocations
+        self.frameTimes = [] # 各フレームの処理時間（秒）
+        self.frameBytes = [] # 各フレームで一時的に確保したメモリーの最大量（バイト）
+        self.frameBlocks = [] # 各フレームで増えたメモリーブロックの数
+        self.sleepCountAfterLimit = 0
+        self.startFrame()
+
+    def startFrame(self):
+        if self.traceAllocations:
+            tracemalloc.reset_peak()
+            self.frameStartMemory = tracemalloc.get_traced_memory()[0]
+            self.frameStartBlocks = sys.getallocatedblocks()
+        self.frameStartTime = time.perf_counter()
+
+    def sleep(self, seconds):
+        frameTime = time.perf_counter() - self.frameStartTime
+        if len(self.frameTimes) < self.frameLimit:
+            self.frameTimes.append(frameTime)
+            if self.traceAllocations:
+                self.frameBytes.append(tracemalloc.get_traced_memory()[1] - self.frameStartMemory)
+                self.frameBlocks.append(sys.getallocatedblocks() - self.frameStartBlocks)
+            if len(self.frameTimes) == self.frameLimit:
+                self.onLimit()
+        else:
+            self.sleepCountAfterLimit += 1
+            if self.sleepCountAfterLimit > FrameProbe.P_EXIT_FRAME_LIMIT:
+                raise FrameLimitExceeded()
+        VirtualClock.sleep(self, seconds)
+        self.startFrame()
+
+
+def getSyntheticSensors():
+    """
+    ゆっくりと動かしているような、仮想の時刻の関数として決まるセンサーの値を返す。
+    """
+    return {
+        "temperature": lambda t: 25.0 + 0.5 * math.sin(t * 0.2),
+        "humidity": lambda t: 40.0 + 2.0 * math.sin(t * 0.1),
+        "pressure": lambda t: 1013.0 + 0.5 * math.sin(t * 0.05),
+        "compass": lambda t: {"x": 20.0 + 30.0 * math.sin(t * 0.5), "y": 10.0 * math.cos(t * 0.5), "z": -40.0},
+        "orientation": lambda t: {"pitch": 0.4 * math.sin(t * 1.3), "roll": -0.3 + 0.2 * math.sin(t * 0.7), "yaw": 0.1 * t},
+        "accelerometer": lambda t: {"x": 0.3 * math.sin(t * 5.0), "y": 1.0 + 0.2 * math.sin(t * 3.0), "z": 0.1 * math.cos(t * 2.0)},
+    }
+
+
+def getPercentile(values, percent):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def callWithOutputToStderr(function):
+    """
+    標準出力を標準エラー出力に切り替えて function() を呼び、戻り値を返す。ゲームの表示で、JSON の出力が乱れないようにする。
+    """
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        return function()
+    finally:
+        sys.stdout = stdout
+
+
+def runGame(gameClass, frames, seed, traceAllocations):
+    """
+    ゲームを1回動かし、frames フレームを記録したら真ん中のボタンを押して終了させる。
+    (FrameProbe, EmulatedSenseHat, 終了したかどうか) を返す。
+    """
+    random.seed(seed)
+    probe = None
+    sense = None
+    def onLimit():
+        sense.stick.press(probe.monotonic(), "middle")
+    probe = FrameProbe(frames, onLimit, traceAllocations)
+    sense = EmulatedSenseHat(probe, getSyntheticSensors())
+    installVirtualTime(probe)
+    exited = True
+    def run():
+        # コルーチンのゲームは、メニューと同じく GameRuntime で実行する
+        if GameRuntime.isCoroutineGame(gameClass):
+            GameRuntime(sense).run(gameClass)
+        else:
+            gameClass(sense).run()
+    try:
+        callWithOutputToStderr(run)
+    except FrameLimitExceeded:
+        exited = False
+    return probe, sense, exited
+
+
+def benchmarkGame(gameClass, frames, seed, traceAllocations=True):
+    """
+    1つのゲームを測定した結果を辞書で返す。
+    処理時間への影響を避けるため、メモリーの測定は別に動かして行う。
+    """
+    probe, sense, exited = runGame(gameClass, frames, seed, False)
+    frameTimes = probe.frameTimes
+    result = {
+        "game": gameClass.getName(),
+        "frames": len(frameTimes),
+        "exited": exited,
+        "virtualSeconds": probe.monotonic(),
+        "latencyMs": {
+            "mean": sum(frameTimes) / max(len(frameTimes), 1) * 1000,
+            "p50": getPercentile(frameTimes, 50) * 1000,
+            "p90": getPercentile(frameTimes, 90) * 1000,
+            "p99": getPercentile(frameTimes, 99) * 1000,
+            "max": max(frameTimes) * 1000 if len(frameTimes) > 0 else 0.0,
+        },
+        "deviceWrites": {
+            "set_pixels": sense.setPixelsCount,
+            "set_pixel": sense.setPixelCount,
+            "perFrame": (sense.setPixelsCount + sense.setPixelCount) / max(len(frameTimes), 1),
+        },
+        "sensorReads": sense.sensorReadCount,
+    }
+    if traceAllocations:
+        tracemalloc.start()
+        try:
+            probe, sense, exited = runGame(gameClass, frames, seed, True)
+        finally:
+            tracemalloc.stop()
+        result["allocations"] = {
+            "peakBytesPerFrame": sum(probe.frameBytes) / max(len(probe.frameBytes), 1),
+            "maxPeakBytes": max(probe.frameBytes) if len(probe.frameBytes) > 0 else 0,
+            "netBlocksPerFrame": sum(probe.frameBlocks) / max(len(probe.frameBlocks), 1),
+        }
+    return result
+
+
+def benchmarkGames(args):
+    import menu
+    gameClasses = [item.load() for item in menu.Menu.MENUITEMS if args.games is None or item.getName() in args.games]
+    results = []
+    for gameClass in gameClasses:
+        print("Benchmarking " + gameClass.getName(), file=sys.stderr)
+        results.append(benchmarkGame(gameClass, args.frames, args.seed, not args.no_allocations))
+    return {"frames": args.frames, "seed": args.seed, "results": results}
+
+
+def measureStartup(warmUp, itemCount=None):
+    """
+    新しいプロセスの中で呼ばれ、menu を import してから最初のメニューの画面を表示するまでの実際の時間を測定して、
+    JSON で標準出力に書き出す。
+    itemCount を指定した場合は、プラグインを追加した場合を想定して、Menu.MENUITEMS を繰り返して itemCount 個の項目にする。
+    """
+    startTime = time.perf_counter()
+    installSenseHatModule()
+    import menu
+    importSeconds = time.perf_counter() - startTime
+    sense = EmulatedSenseHat()
+    installVirtualTime(sense.clock)
+    firstFrameTimes = []
+    setPixels = sense.set_pixels
+    def setPixelsAndRecord(pixels):
+        if len(firstFrameTimes) == 0:
+            firstFrameTimes.append(time.perf_counter() - startTime)
+        setPixels(pixels)
+    sense.set_pixels = setPixelsAndRecord
+    sense.stick.press(0.0, "left", holdCount=1) # 最初の画面を表示したら、すぐに終了する
+    menuItems = None
+    if itemCount is not None:
+        menuItems = [menu.Menu.MENUITEMS[i % len(menu.Menu.MENUITEMS)] for i in range(itemCount)]
+    menuInstance = callWithOutputToStderr(lambda: menu.Menu(sense, warmUp, menuItems))
+    callWithOutputToStderr(menuInstance.run)
+    print(json.dumps({
+        "importSeconds": importSeconds,
+        "firstFrameSeconds": firstFrameTimes[0],
+        "frameCacheSeconds": menuInstance.frameCacheSeconds,
+        "items": len(menuInstance.menuItems),
+        "loadedGames": [item.getName() for item in menu.Menu.MENUITEMS if item.isLoaded()],
+    }))
+
+
+def benchmarkStartup(args):
+    """
+    新しいプロセスで Menu を起動し、最初のメニューの画面を表示するまでの時間を repeat 回測定する。
+    """
+    runs = []
+    for i in range(args.repeat):
+        startTime = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", "import benchmark; benchmark.measureStartup({}, {})".format(not args.no_warm_up, args.items)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        run["processSeconds"] = time.perf_counter() - startTime
+        runs.append(run)
+    firstFrameSeconds = [run["firstFrameSeconds"] for run in runs]
+    frameCacheSeconds = [run["frameCacheSeconds"] for run in runs]
+    return {
+        "repeat": args.repeat,
+        "warmUp": not args.no_warm_up,
+        "items": runs[0]["items"],
+        "firstFrameSeconds": {"min": min(firstFrameSeconds), "p50": getPercentile(firstFrameSeconds, 50), "max": max(firstFrameSeconds)},
+        "frameCacheSeconds": {"min": min(frameCacheSeconds), "p50": getPercentile(frameCacheSeconds, 50), "max": max(frameCacheSeconds)},
+        "runs": runs,
+    }
+
+
+def benchmarkMenu(args):
+    """
+    Menu で上下にカーソルを動かし、ジョイスティックのイベントから LED に書き込むまでの遅れ（仮想の時刻）と、
+    何も操作していない間に1秒あたり何回起きたかを測定する。
+    """
+    import menu
+    sense = EmulatedSenseHat()
+    clock = sense.clock
+    installVirtualTime(clock)
+    writeTimes = []
+    setPixels = sense.set_pixels
+    setPixel = sense.set_pixel
+    def setPixelsAndRecord(pixels):
+        setPixels(pixels)
+        writeTimes.append(clock.monotonic())
+    def setPixelAndRecord(x, y, color):
+        setPixel(x, y, color)
+        writeTimes.append(clock.monotonic())
+    sense.set_pixels = setPixelsAndRecord
+    sense.set_pixel = setPixelAndRecord
+    pressTimes = []
+    at = 0.55 # 点滅の切り替わりと重ならない時刻から始める
+    itemCount = len(menu.Menu.MENUITEMS)
+    for direction in ["down"] * (itemCount - 1) + ["up"] * (itemCount - 1):
+        sense.stick.press(at, direction)
+        pressTimes.append(at)
+        at += args.interval
+    idleStartTime = at
+    sense.stick.press(idleStartTime + args.idle, "left", holdCount=1)
+    wakeCounts = {}
+    clock.schedule(idleStartTime, lambda: wakeCounts.update(start=clock.sleepCount + clock.waitCount))
+    clock.schedule(idleStartTime + args.idle, lambda: wakeCounts.update(end=clock.sleepCount + clock.waitCount))
+    callWithOutputToStderr(lambda: menu.Menu(sense, False).run())
+    latencies = [min(t for t in writeTimes if t >= pressTime) - pressTime for pressTime in pressTimes]
+    return {
+        "presses": len(pressTimes),
+        "inputToPixelMs": {
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "p50": getPercentile(latencies, 50) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "idleSeconds": args.idle,
+        "idleWakeupsPerSecond": (wakeCounts["end"] - wakeCounts["start"]) / args.idle,
+        "deviceWrites": sense.setPixelsCount + sense.setPixelCount,
+    }
+
+
+def timeMazeGeneration(gameClass, size, seed):
+    """
+    Maze か LargeMaze の迷路の大きさを size x size にして、generateWalls() にかかる時間を返す。
+    """
+    sense = EmulatedSenseHat()
+    game = gameClass(sense)
+    savedLengths = None
+    if hasattr(gameClass, "P_BLOCK_X_LENGTH"):
+        savedLengths = (gameClass.P_BLOCK_X_LENGTH, gameClass.P_BLOCK_Y_LENGTH)
+        gameClass.P_BLOCK_X_LENGTH = gameClass.P_BLOCK_Y_LENGTH = size
+    else:
+        game.BLOCK_X_LENGTH = game.BLOCK_Y_LENGTH = size
+    random.seed(seed)
+    try:
+        startTime = time.perf_counter()
+        callWithOutputToStderr(game.generateWalls)
+        return time.perf_counter() - startTime
+    finally:
+        if savedLengths is not None:
+            gameClass.P_BLOCK_X_LENGTH, gameClass.P_BLOCK_Y_LENGTH = savedLengths
+
+
+def measureMazeMemory(algorithm, size, seed):
+    """
+    size x size の迷路を生成し、迷路を持つのに使うメモリーと、生成の途中で一時的に使った最大のメモリーを、1セルあたりのバイト数で返す。
+    """
+    import mazeGenerator
+    tracemalloc.start()
+    try:
+        generator = mazeGenerator.generateMaze(size, size, algorithm, random.Random(seed))
+        peakBytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    gridBytes = generator.grid.getMemoryBytes()
+    return {"gridBytes": gridBytes, "bytesPerCell": gridBytes / (size * size), "peakBytesPerCell": peakBytes / (size * size)}
+
+
+def timeMazeSolver(algorithm, size, seed):
+    """
+    size x size の迷路を生成し、右下隅のゴールからの距離の場を MazeSolver で求める時間を返す。
+    """
+    import mazeGenerator, mazeSolver
+    grid = mazeGenerator.generateMaze(size, size, algorithm, random.Random(seed)).grid
+    startTime = time.perf_counter()
+    mazeSolver.MazeSolver(grid, size - 2, size - 2)
+    return time.perf_counter() - startTime
+
+
+def benchmarkMazes(args):
+    """
+    mazeGenerator の各方法と、Maze と LargeMaze の generateWalls() で、size x size の迷路を生成する時間を測定する。
+    mazeGenerator の各方法については、1セルあたりのメモリーと、MazeSolver で距離の場を求める時間も測定する。
+    """
+    import mazeGenerator
+    def getSeconds(generate):
+        seconds = []
+        for i in range(args.repeat):
+            seconds.append(generate(args.seed + i))
+        return {"min": min(seconds), "p50": getPercentile(seconds, 50), "max": max(seconds)}
+    def timeGenerator(algorithm, size, seed):
+        startTime = time.perf_counter()
+        mazeGenerator.generateMaze(size, size, algorithm, random.Random(seed))
+        return time.perf_counter() - startTime
+    results = []
+    failures = []
+    for algorithm in args.algorithms or sorted(mazeGenerator.ALGORITHMS):
+        for size in args.sizes:
+            print("Generating {} {}x{}".format(algorithm, size, size), file=sys.stderr)
+            result = {"algorithm": algorithm, "size": size, "seconds": getSeconds(lambda seed: timeGenerator(algorithm, size, seed)),
+                "memory": measureMazeMemory(algorithm, size, args.seed), "solveSeconds": timeMazeSolver(algorithm, size, args.seed)}
+            if size == args.target_size:
+                # 真ん中の時間が目標の時間以下なら合格
+                result["meetsTarget"] = result["seconds"]["p50"] <= args.target_seconds
+                print("{} {} {}x{}: {:.3f} s (target {} s)".format("PASS" if result["meetsTarget"] else "FAIL", algorithm, size, size,
+                    result["seconds"]["p50"], args.target_seconds), file=sys.stderr)
+                if not result["meetsTarget"]:
+                    failures.append(algorithm)
+            results.append(result)
+    gameResults = []
+    if len(args.games) > 0:
+        import maze, largeMaze
+        gameClasses = [gameClass for gameClass in [maze.Maze, largeMaze.LargeMaze] if gameClass.getName() in args.games]
+        for gameClass in gameClasses:
+            for size in args.sizes:
+                print("Generating {} {}x{}".format(gameClass.getName(), size, size), file=sys.stderr)
+                gameResults.append({"game": gameClass.getName(), "algorithm": gameClass.P_ALGORITHM, "replay": gameClass.P_REPLAY,
+                    "size": size, "seconds": getSeconds(lambda seed: timeMazeGeneration(gameClass, size, seed))})
+    return {"repeat": args.repeat, "seed": args.seed, "target": {"size": args.target_size, "seconds": args.target_seconds, "failures": failures},
+        "results": results, "games": gameResults}
+
+
+def benchmarkViewport(args):
+    """
+    size x size の LargeMaze で、スクロールしながら drawScreen() を呼び、1画面を描く時間と、WallGrid から読んだセルの数を測定する。
+    比較のために、毎回 8 x 8 の全体を読み直す getScreen() の時間も測定する。
+    """
+    import largeMaze
+    LargeMaze = largeMaze.LargeMaze
+    savedSettings = (LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_REPLAY, LargeMaze.P_USE_CACHE)
+    results = []
+    try:
+        for size in args.sizes:
+            print("Scrolling LargeMaze {}x{}".format(size, size), file=sys.stderr)
+            LargeMaze.P_BLOCK_X_LENGTH = LargeMaze.P_BLOCK_Y_LENGTH = size
+            LargeMaze.P_REPLAY = False
+            LargeMaze.P_USE_CACHE = False
+            random.seed(args.seed)
+            game = LargeMaze(EmulatedSenseHat())
+            callWithOutputToStderr(game.generateWalls)
+            # 1フレームごとに、縦か横に 1 だけスクロールする位置の列。端に着いたら向きを変える
+            rand = random.Random(args.seed)
+            positions = []
+            x = y = 0
+            for i in range(args.frames):
+                if rand.random() < 0.5:
+                    x = min(max(x + rand.choice((-1, 1)), 0), max(size - 8, 0))
+                else:
+                    y = min(max(y + rand.choice((-1, 1)), 0), max(size - 8, 0))
+                positions.append((x, y))
+            def measure(draw):
+                frameTimes = []
+                for x, y in positions:
+                    game.currentScrollX = x
+                    game.currentScrollY = y
+                    game.ballX = x + 3
+                    game.ballY = y + 3
+                    startTime = time.perf_counter()
+                    draw()
+                    frameTimes.append(time.perf_counter() - startTime)
+                return {"mean": sum(frameTimes) / len(frameTimes) * 1e6, "p99": getPercentile(frameTimes, 99) * 1e6}
+            fetchedCellCount = game.viewport.fetchedCellCount
+            viewportMicroseconds = measure(game.drawScreen)
+            results.append({
+                "size": size,
+                "viewportMicroseconds": viewportMicroseconds,
+                "cellsFetchedPerFrame": (game.viewport.fetchedCellCount - fetchedCellCount) / len(positions),
+                "fullWindowMicroseconds": measure(lambda: game.getScreen(game.wallGrid, False)),
+            })
+    finally:
+        LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_REPLAY, LargeMaze.P_USE_CACHE = savedSettings
+    return {"frames": args.frames, "seed": args.seed, "results": results}
+
+
+def benchmarkMazeCache(args):
+    """
+    一時的なディレクトリの MazeCache を使って、size x size の LargeMaze の generateWalls() にかかる時間を、
+    キャッシュがない場合（生成して書き込む）と、ある場合（mmap して読み込む）で測定する。キャッシュの読み込みだけの時間も測定する。
+    """
+    import largeMaze, mazeCache
+    LargeMaze = largeMaze.LargeMaze
+    savedSettings = (LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_REPLAY, LargeMaze.P_USE_CACHE, LargeMaze.P_CACHE_DIRECTORY, LargeMaze.P_SEED, LargeMaze.P_ALGORITHM)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            LargeMaze.P_REPLAY = False
+            LargeMaze.P_USE_CACHE = True
+            LargeMaze.P_CACHE_DIRECTORY = directory
+            LargeMaze.P_SEED = args.seed
+            LargeMaze.P_ALGORITHM = args.algorithm
+            for size in args.sizes:
+                print("Launching LargeMaze {}x{}".format(size, size), file=sys.stderr)
+                LargeMaze.P_BLOCK_X_LENGTH = LargeMaze.P_BLOCK_Y_LENGTH = size
+                games = []
+                def timeLaunch():
+                    game = LargeMaze(EmulatedSenseHat())
+                    games.append(game)
+                    startTime = time.perf_counter()
+                    callWithOutputToStderr(game.generateWalls)
+                    return time.perf_counter() - startTime
+                coldSeconds = timeLaunch()
+                warmSeconds = [timeLaunch() for i in range(args.repeat)]
+                # 候補の中から選んだ迷路は、args.seed とは異なる seed でキャッシュされている
+                mazeSeed = games[0].mazeSeed
+                cache = mazeCache.MazeCache(directory)
+                loadSeconds = []
+                for i in range(args.repeat):
+                    startTime = time.perf_counter()
+                    cache.load(size, size, args.algorithm, mazeSeed)
+                    loadSeconds.append(time.perf_counter() - startTime)
+                results.append({
+                    "size": size,
+                    "coldLaunchSeconds": coldSeconds,
+                    "cachedLaunchSeconds": min(warmSeconds),
+                    "cacheLoadSeconds": min(loadSeconds),
+                    "mazeSeed": mazeSeed,
+                    "fileBytes": os.path.getsize(cache.getPath(size, size, args.algorithm, mazeSeed)),
+                })
+    finally:
+        (LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_REPLAY, LargeMaze.P_USE_CACHE, LargeMaze.P_CACHE_DIRECTORY,
+            LargeMaze.P_SEED, LargeMaze.P_ALGORITHM) = savedSettings
+    return {"algorithm": args.algorithm, "repeat": args.repeat, "seed": args.seed, "results": results}
+
+
+def benchmarkMazeBatch(args):
+    """
+    size x size の迷路の候補を candidates 個、mazeBatch.findBestMaze() で評価する時間を、プロセスの数ごとに測定する。
+    時間には、プロセスを起動する時間も含む。1プロセスに対する速さの比（speedup）も求める。
+    """
+    import mazeBatch
+    results = []
+    for size in args.sizes:
+        seeds = range(args.seed, args.seed + args.candidates)
+        singleSeconds = None
+        for processCount in args.processes:
+            print("Scoring {} mazes of {}x{} on {} processes".format(args.candidates, size, size, processCount), file=sys.stderr)
+            startTime = time.perf_counter()
+            difficulty, pathLength, bestSeed = mazeBatch.findBestMaze(size, size, args.algorithm, seeds, size - 2, size - 2, processCount)
+            seconds = time.perf_counter() - startTime
+            if singleSeconds is None:
+                singleSeconds = seconds
+            results.append({
+                "size": size,
+                "processes": processCount,
+                "seconds": seconds,
+                "mazesPerSecond": args.candidates / seconds,
+                "speedup": singleSeconds / seconds,
+                "bestSeed": bestSeed,
+                "bestDifficulty": difficulty,
+            })
+    return {"algorithm": args.algorithm, "candidates": args.candidates, "seed": args.seed, "cpuCount": mazeBatch.getProcessCount(), "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Sense HAT games on an emulated device")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+
+    gamesParser = subparsers.add_parser("games", help="per-frame cost of every game in Menu.MENUITEMS")
+    gamesParser.add_argument("--frames", type=int, default=300, help="number of frames to measure per game")
+    gamesParser.add_argument("--seed", type=int, default=0, help="seed for the random module")
+    gamesParser.add_argument("--games", nargs="+", help="names of the games to measure (default: all)")
+    gamesParser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    gamesParser.set_defaults(function=benchmarkGames)
+
+    startupParser = subparsers.add_parser("startup", help="time from process start to the first menu frame")
+    startupParser.add_argument("--repeat", type=int, default=5, help="number of fresh processes to measure")
+    startupParser.add_argument("--no-warm-up", action="store_true", help="do not load the games in the background")
+    startupParser.add_argument("--items", type=int, help="repeat the menu items up to this many entries, as if plugins were added")
+    startupParser.set_defaults(function=benchmarkStartup)
+
+    menuParser = subparsers.add_parser("menu", help="input-to-pixel latency and idle wakeups of the menu loop")
+    menuParser.add_argument("--interval", type=float, default=1.37, help="seconds between joystick presses")
+    menuParser.add_argument("--idle", type=float, default=10.0, help="seconds to stay idle after the presses")
+    menuParser.set_defaults(function=benchmarkMenu)
+
+    mazesParser = subparsers.add_parser("mazes", help="maze generation time and memory per cell, per algorithm and size")
+    mazesParser.add_argument("--sizes", type=int, nargs="+", default=[15, 101, 301, 1001], help="odd maze widths (and heights) to generate")
+    mazesParser.add_argument("--algorithms", nargs="+", help="names in mazeGenerator.ALGORITHMS (default: all)")
+    mazesParser.add_argument("--games", nargs="*", default=["Maze", "LargeMaze"], help="game classes whose generateWalls() to measure (none to skip)")
+    mazesParser.add_argument("--repeat", type=int, default=3, help="number of mazes to generate per algorithm and size")
+    mazesParser.add_argument("--seed", type=int, default=0, help="seed of the first maze")
+    mazesParser.add_argument("--target-size", type=int, default=1001, help="maze size whose generation time is checked against --target-seconds")
+    mazesParser.add_argument("--target-seconds", type=float, default=0.5, help="median generation time that passes at --target-size")
+    mazesParser.set_defaults(function=benchmarkMazes)
+
+    viewportParser = subparsers.add_parser("viewport", help="LargeMaze screen cost while scrolling, per maze size")
+    viewportParser.add_argument("--sizes", type=int, nargs="+", default=[15, 101, 501], help="odd maze widths (and heights)")
+    viewportParser.add_argument("--frames", type=int, default=2000, help="number of one-step scrolls to draw")
+    viewportParser.add_argument("--seed", type=int, default=0, help="seed for the maze and the scroll path")
+    viewportParser.set_defaults(function=benchmarkViewport)
+
+    cacheParser = subparsers.add_parser("cache", help="LargeMaze launch time with and without the maze cache, per maze size")
+    cacheParser.add_argument("--sizes", type=int, nargs="+", default=[101, 501, 1001], help="odd maze widths (and heights)")
+    cacheParser.add_argument("--algorithm", default="wallExtension", help="name in mazeGenerator.ALGORITHMS")
+    cacheParser.add_argument("--repeat", type=int, default=5, help="number of cached launches to measure per size")
+    cacheParser.add_argument("--seed", type=int, default=0, help="seed of the maze")
+    cacheParser.set_defaults(function=benchmarkMazeCache)
+
+    batchParser = subparsers.add_parser("batch", help="throughput of scoring candidate mazes on 1 to N processes")
+    batchParser.add_argument("--sizes", type=int, nargs="+", default=[101, 301], help="odd maze widths (and heights)")
+    batchParser.add_argument("--candidates", type=int, default=32, help="number of candidate mazes per size")
+    batchParser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 3, 4], help="process counts to measure; the first is the baseline")
+    batchParser.add_argument("--algorithm", default="wallExtension", help="name in mazeGenerator.ALGORITHMS")
+    batchParser.add_argument("--seed", type=int, default=0, help="seed of the first candidate")
+    batchParser.set_defaults(function=benchmarkMazeBatch)
+
+    args = parser.parse_args(argv)
+    installSenseHatModule()
+    result = {
+        "benchmark": args.command,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    result.update(args.function(args))
+    text = json.dumps(result, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
 import math, time
+from indexedScreen import Palette, Screen
+from frameScheduler import FrameScheduler
 
 class Daruma(object):
     """
@@ -17,13 +19,15 @@ class Daruma(object):
     black = O = [0, 0, 0]
     white = W = [255, 255, 255]
 
+    palette = Palette([O, G, R, Y, W])
+
     menuItemPixels = [
     R, Y, Y, Y, Y, R,
     Y, R, Y, Y, R, Y
     ]
 
     # 通常の画面
-    normal_screens = [[
+    normal_screens = [Screen.fromPixels(palette, [
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
@@ -32,7 +36,7 @@ class Daruma(object):
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O
-    ],[
+    ]), Screen.fromPixels(palette, [
     R, O, O, O, O, O, O, R,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
@@ -41,10 +45,10 @@ class Daruma(object):
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     R, O, O, O, O, O, O, R
-    ]]
+    ])]
 
     # 違反した（動いている状態）画面
-    violation_screen = [
+    violation_screen = Screen.fromPixels(palette, [
     R, Y, Y, Y, Y, Y, Y, R,
     Y, R, Y, Y, Y, Y, R, Y,
     Y, Y, R, Y, Y, R, Y, Y,
@@ -53,7 +57,7 @@ class Daruma(object):
     Y, Y, R, Y, Y, R, Y, Y,
     Y, R, Y, Y, Y, Y, R, Y,
     R, Y, Y, Y, Y, Y, Y, R
-    ]
+    ])
 
     # さっきまで違反していた（動いていた）画面
     violated_screen = normal_screens[1]
@@ -81,10 +85,11 @@ class Daruma(object):
 
     def run(self):
         print(self.__class__.__name__ + " is running")
-        lastFrameTime = pre_time = time.monotonic()
+        scheduler = FrameScheduler(Daruma.P_FRAME_TIME)
+        pre_time = time.monotonic()
         lastViolatedTime = -1
         violated = False
-        lastScreen = []
+        lastScreen = None # 最後に表示した画面。あらかじめ用意した画面のどれかなので、同一性だけで比較できる
         while not self.shouldExit:
             a_raw = self.sense.accel_raw
             x = a_raw["x"]
@@ -95,18 +100,18 @@ class Daruma(object):
             
             now = time.monotonic()
             if a > Daruma.P_THRESHOLD_ACCEL:
-                if lastScreen != Daruma.violation_screen:
+                if lastScreen is not Daruma.violation_screen:
                     lastScreen = Daruma.violation_screen
-                    self.sense.set_pixels(Daruma.violation_screen)
+                    self.sense.set_pixels(Daruma.violation_screen.toPixels())
                 lastViolatedTime = now
             if now - lastViolatedTime <= Daruma.P_VIOLATION_TIME:
-                if lastScreen != Daruma.violation_screen:
+                if lastScreen is not Daruma.violation_screen:
                     lastScreen = Daruma.violation_screen
-                    self.sense.set_pixels(Daruma.violation_screen)
+                    self.sense.set_pixels(Daruma.violation_screen.toPixels())
             elif now - lastViolatedTime <= Daruma.P_VIOLATED_TIME :
-                if lastScreen != Daruma.violated_screen:
+                if lastScreen is not Daruma.violated_screen:
                     lastScreen = Daruma.violated_screen
-                    self.sense.set_pixels(Daruma.violated_screen)
+                    self.sense.set_pixels(Daruma.violated_screen.toPixels())
                 violated = True
             else:
                 if violated:
@@ -114,20 +119,16 @@ class Daruma(object):
                     pre_time = time.monotonic()
                 subsecond = (now - pre_time) % 1
                 if subsecond < 0.5:
-                    if lastScreen != Daruma.normal_screens[0]:
+                    if lastScreen is not Daruma.normal_screens[0]:
                         lastScreen = Daruma.normal_screens[0]
-                        self.sense.set_pixels(Daruma.normal_screens[0])
+                        self.sense.set_pixels(Daruma.normal_screens[0].toPixels())
                 else:
-                    if lastScreen != Daruma.normal_screens[1]:
+                    if lastScreen is not Daruma.normal_screens[1]:
                         lastScreen = Daruma.normal_screens[1]
-                        self.sense.set_pixels(Daruma.normal_screens[1])
+                        self.sense.set_pixels(Daruma.normal_screens[1].toPixels())
 
-            duration = now - lastFrameTime
-            lastFrameTime = now
-            if Daruma.P_FRAME_TIME - duration >0:
-                time.sleep(Daruma.P_FRAME_TIME - duration)
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}".format(Daruma.P_FRAME_TIME))
+            scheduler.waitForNextFrame()
+        print(scheduler.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
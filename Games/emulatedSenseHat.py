@@ -0,0 +1,353 @@
+import time, sys, os, types, heapq, bisect, json, collections
+from textRenderer import TextRenderer
+
+class VirtualClock(object):
+    """
+    ゲームの time モジュールの代わりに使う、仮想の時計。
+    sleep() は実際には待たずに、仮想の時刻を進めるだけなので、ゲームを最大の速度で動かせる。
+    schedule() で登録した処理（ジョイスティックのイベントなど）は、仮想の時刻がその時刻になった時に呼ばれる。
+    monotonic()、time()、sleep() 以外の属性は、本物の time モジュールのものを返す。
+    """
+    P_EPOCH = 1500000000.0 # time() が返す値の、仮想の時刻 0 に相当する時刻
+
+    def __init__(self, start=0.0):
+        self.now = start # 仮想の時刻（秒）
+        self.events = [] # (時刻, 登録順, 処理) のヒープ
+        self.eventCount = 0
+        self.sleepCount = 0 # sleep() が呼ばれた回数
+        self.waitCount = 0 # waitForEvent() が呼ばれた回数
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return VirtualClock.P_EPOCH + self.now
+
+    def sleep(self, seconds):
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.sleepCount += 1
+        self.advance(seconds)
+
+    def waitForEvent(self, timeout=None):
+        """
+        次に登録された処理の時刻と timeout 秒後の早い方まで仮想の時刻を進め、その時刻の処理を1つ呼ぶ。
+        eventQueue.EventQueue が、イベントを別のスレッドから待つ代わりに使う。
+        """
+        self.waitCount += 1
+        if len(self.events) == 0 or (timeout is not None and self.events[0][0] > self.now + timeout):
+            if timeout is None:
+                raise RuntimeError("Waiting for an event that is never scheduled")
+            self.now += timeout
+            return
+        at, count, callback = heapq.heappop(self.events)
+        self.now = max(self.now, at)
+        callback()
+
+    def schedule(self, at, callback):
+        """
+        仮想の時刻が at になった時に callback() を呼ぶ。
+        """
+        heapq.heappush(self.events, (at, self.eventCount, callback))
+        self.eventCount += 1
+
+    def advance(self, seconds):
+        """
+        仮想の時刻を seconds 秒進める。途中の時刻に登録された処理は、時刻の順に呼ぶ。
+        """
+        target = self.now + seconds
+        while len(self.events) > 0 and self.events[0][0] <= target:
+            at, count, callback = heapq.heappop(self.events)
+            self.now = max(self.now, at)
+            callback()
+        self.now = max(self.now, target)
+
+
+InputEvent = collections.namedtuple("InputEvent", ("timestamp", "direction", "action"))
+
+
+class EmulatedStick(object):
+    """
+    sense.stick の代わり。あらかじめ登録したイベントを、仮想の時刻に合わせて direction_any などに渡す。
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.direction_up = None
+        self.direction_down = None
+        self.direction_left = None
+        self.direction_right = None
+        self.direction_middle = None
+        self.direction_any = None
+        self.pendingEvents = [] # get_events() で返す、まだ取り出されていないイベント
+        self.eventCount = 0 # 配信したイベントの数
+
+    def pushEvent(self, at, direction, action):
+        """
+        仮想の時刻 at に、direction の方向の action のイベントを発生させる。
+        """
+        self.clock.schedule(at, lambda: self.deliver(InputEvent(self.clock.time(), direction, action)))
+
+    def press(self, at, direction, holdCount=0, interval=0.1):
+        """
+        仮想の時刻 at にジョイスティックを押し、holdCount 回の長押しのイベントの後に離す。
+        """
+        self.pushEvent(at, direction, "pressed")
+        for i in range(holdCount):
+            self.pushEvent(at + interval * (i + 1), direction, "held")
+        self.pushEvent(at + interval * (holdCount + 1), direction, "released")
+
+    def deliver(self, event):
+        self.eventCount += 1
+        self.pendingEvents.append(event)
+        callback = getattr(self, "direction_" + event.direction)
+        if callback is not None:
+            callback(event)
+        if self.direction_any is not None:
+            self.direction_any(event)
+
+    def get_events(self):
+        events = self.pendingEvents
+        self.pendingEvents = []
+        return events
+
+
+class EmulatedSenseHat(object):
+    """
+    SenseHat の代わりに使う、ハードウェアを使わないエミュレーター。
+    LED はメモリー上の 8 x 8 の配列で、書き込んだ回数を数える。
+    センサーの値は、固定の値、仮想の時刻を受け取る関数、または記録した (時刻, 値) の配列で指定する。
+    ジョイスティックのイベントは stick.press() や stick.pushEvent() で、仮想の時刻を指定して登録する。
+    show_message() は実際には待たずに、スクロールにかかる時間だけ仮想の時刻を進める。
+    """
+    # センサーの初期値。机の上に置いて動かしていない状態
+    P_DEFAULT_SENSORS = {
+        "temperature": 25.0,
+        "humidity": 40.0,
+        "pressure": 1013.0,
+        "compass": {"x": 20.0, "y": 0.0, "z": -40.0},
+        "orientation": {"pitch": 0.0, "roll": 0.0, "yaw": 0.0},
+        "accelerometer": {"x": 0.0, "y": 0.0, "z": 1.0},
+    }
+
+    def __init__(self, clock=None, sensors=None):
+        self.clock = VirtualClock() if clock is None else clock
+        self.stick = EmulatedStick(self.clock)
+        self.pixels = [(0, 0, 0) for i in range(64)]
+        self.rotation = 0
+        self.low_light = False
+        self.sensors = {}
+        self.sensorTimes = {} # 記録した値を指定したセンサーの名前から、時刻の配列への辞書
+        self.sensorReadCount = 0 # センサーを読み取った回数
+        self.setPixelCount = 0 # set_pixel() が呼ばれた回数
+        self.setPixelsCount = 0 # set_pixels() と clear() が呼ばれた回数
+        self.messageFrameCount = 0 # show_message() と show_letter() で表示した画面の数
+        self.renderer = TextRenderer(self)
+        for name, value in EmulatedSenseHat.P_DEFAULT_SENSORS.items():
+            self.setSensor(name, value)
+        if sensors is not None:
+            for name, value in sensors.items():
+                self.setSensor(name, value)
+
+    # LED
+
+    def set_pixel(self, x, y, *args):
+        if not (0 <= x <= 7 and 0 <= y <= 7):
+            raise ValueError("X and Y position must be between 0 and 7")
+        self.pixels[y * 8 + x] = tuple(args[0] if len(args) == 1 else args)
+        self.setPixelCount += 1
+
+    def get_pixel(self, x, y):
+        return list(self.pixels[y * 8 + x])
+
+    def set_pixels(self, pixel_list):
+        if len(pixel_list) != 64:
+            raise ValueError("Pixel lists must have 64 elements")
+        self.pixels = [tuple(color) for color in pixel_list]
+        self.setPixelsCount += 1
+
+    def get_pixels(self):
+        return [list(color) for color in self.pixels]
+
+    def clear(self, *args):
+        color = (0, 0, 0) if len(args) == 0 else tuple(args[0] if len(args) == 1 else args)
+        self.set_pixels([color for i in range(64)])
+
+    def _get_char_pixels(self, s):
+        """
+        文字の 5 x 8 ピクセルを、本物の SenseHat と同じく、[255, 255, 255] か [0, 0, 0] の 40 個の配列で返す。
+        フォントは持たないので、空白以外は、文字コードから決まる模様を返す。
+        """
+        code = ord(s[0]) if len(s) > 0 else 0
+        pixels = []
+        for column in range(5):
+            for row in range(8):
+                lit = s != " " and 1 <= row <= 6 and (column == 2 or (code >> column) & 1 == 1)
+                pixels.append([255, 255, 255] if lit else [0, 0, 0])
+        return pixels
+
+    def show_message(self, text_string, scroll_speed=0.1, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        """
+        本物と同じ画面を、本物と同じ画面数だけ表示したものとして、仮想の時刻を進める。
+        """
+        for frame in self.renderer.iterateMessageFrames(text_string, text_colour, back_colour):
+            self.pixels = [tuple(color) for color in frame]
+            self.messageFrameCount += 1
+            self.clock.sleep(scroll_speed)
+
+    def show_letter(self, s, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        self.pixels = [tuple(color) for color in self.renderer.getLetterFrame(s, text_colour, back_colour)]
+        self.messageFrameCount += 1
+
+    # センサー
+
+    def setSensor(self, name, source):
+        """
+        センサーの値を指定する。source は固定の値、仮想の時刻を受け取る関数、または (時刻, 値) の配列である。
+        配列の場合は、仮想の時刻以前で最も新しい値を返す。
+        """
+        if isinstance(source, list):
+            source = sorted(source, key=lambda sample: sample[0])
+            self.sensorTimes[name] = [sample[0] for sample in source]
+        self.sensors[name] = source
+
+    def loadRecording(self, path):
+        """
+        recordSensors() で保存したファイルを読み込み、センサーの値として使う。
+        """
+        with open(path) as f:
+            recording = json.load(f)
+        for name, samples in recording.items():
+            self.setSensor(name, [tuple(sample) for sample in samples])
+
+    def readSensor(self, name):
+        self.sensorReadCount += 1
+        source = self.sensors[name]
+        if callable(source):
+            value = source(self.clock.monotonic())
+        elif isinstance(source, list):
+            i = bisect.bisect_right(self.sensorTimes[name], self.clock.monotonic())
+            value = source[max(i - 1, 0)][1]
+        else:
+            value = source
+        return dict(value) if isinstance(value, dict) else value
+
+    @property
+    def temperature(self):
+        return self.readSensor("temperature")
+
+    def get_temperature(self):
+        return self.temperature
+
+    @property
+    def humidity(self):
+        return self.readSensor("humidity")
+
+    def get_humidity(self):
+        return self.humidity
+
+    @property
+    def pressure(self):
+        return self.readSensor("pressure")
+
+    def get_pressure(self):
+        return self.pressure
+
+    def get_compass_raw(self):
+        return self.readSensor("compass")
+
+    def get_orientation_radians(self):
+        return self.readSensor("orientation")
+
+    @property
+    def accel_raw(self):
+        return self.readSensor("accelerometer")
+
+    def get_accelerometer_raw(self):
+        return self.accel_raw
+
+
+def recordSensors(sense, path, duration, interval=0.05):
+    """
+    本物の SenseHat のセンサーの値を duration 秒間記録し、EmulatedSenseHat.loadRecording() で読み込める形式で保存する。
+    """
+    readers = {
+        "temperature": lambda: sense.temperature,
+        "humidity": lambda: sense.humidity,
+        "pressure": lambda: sense.pressure,
+        "compass": lambda: sense.get_compass_raw(),
+        "orientation": lambda: sense.get_orientation_radians(),
+        "accelerometer": lambda: sense.accel_raw,
+    }
+    recording = {name: [] for name in readers}
+    startTime = time.monotonic()
+    while time.monotonic() - startTime < duration:
+        for name, reader in readers.items():
+            recording[name].append((time.monotonic() - startTime, reader()))
+        time.sleep(interval)
+    with open(path, "w") as f:
+        json.dump(recording, f)
+
+
+def installSenseHatModule():
+    """
+    sense_hat モジュールがインストールされていない場合に、EmulatedSenseHat を SenseHat とする代わりのモジュールを登録する。
+    ゲームのモジュールを import する前に呼ぶこと。
+    """
+    try:
+        import sense_hat
+        return sense_hat
+    except ImportError:
+        pass
+    module = types.ModuleType("sense_hat")
+    module.SenseHat = EmulatedSenseHat
+    module.DIRECTION_UP = "up"
+    module.DIRECTION_DOWN = "down"
+    module.DIRECTION_LEFT = "left"
+    module.DIRECTION_RIGHT = "right"
+    module.DIRECTION_MIDDLE = "middle"
+    module.ACTION_PRESSED = "pressed"
+    module.ACTION_RELEASED = "released"
+    module.ACTION_HELD = "held"
+    sys.modules["sense_hat"] = module
+    return module
+
+
+def installVirtualTime(clock):
+    """
+    このディレクトリーにある読み込み済みのモジュールの time を、clock に置き換える。
+    ゲームのモジュールを import した後に呼ぶこと。別の clock で再び呼ぶと、その clock に置き換える。
+    VirtualClock を import している、エミュレーターを使う側のモジュール（benchmark など）は置き換えない。
+    仮想の時刻はスレッドからは進められないので、SensorSampler はスレッドを使わずに読み取るようにする。
+    """
+    import sensorSampler
+    sensorSampler.SensorSampler.P_THREADED = False
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path is None or module is sys.modules[__name__] or getattr(module, "VirtualClock", None) is VirtualClock:
+            continue
+        moduleTime = getattr(module, "time", None)
+        if os.path.dirname(os.path.abspath(path)) == directory and (moduleTime is time or isinstance(moduleTime, VirtualClock)):
+            module.time = clock
+
+
+if __name__ == '__main__':
+    # 実機がなくても、メニューから迷路を選んで遊び、終了するまでを仮想の時刻で動かす
+    installSenseHatModule()
+    import menu
+    # ゲームのモジュールも、installVirtualTime() が time を置き換えられるように、先に読み込んでおく
+    for item in menu.Menu.MENUITEMS:
+        item.load()
+    sense = EmulatedSenseHat()
+    installVirtualTime(sense.clock)
+    sense.stick.press(1.0, "down")
+    sense.stick.press(2.0, "middle")
+    sense.stick.press(10.0, "middle")
+    sense.stick.press(11.0, "left", holdCount=3)
+    realStartTime = time.monotonic()
+    menu.Menu(sense).run()
+    print("{:.1f} virtual seconds in {:.2f} seconds, {} set_pixels, {} set_pixel".format(sense.clock.monotonic(), time.monotonic() - realStartTime, sense.setPixelsCount, sense.setPixelCount))
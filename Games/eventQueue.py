@@ -0,0 +1,52 @@
+import time, threading, collections
+
+class EventQueue(object):
+    """
+    ジョイスティックのイベントなどを、別のスレッドから受け取るためのキュー。
+    get() は、イベントが届くか、指定した時刻になるまで眠るので、何も起きていない間は CPU を使わない。
+    time が emulatedSenseHat.VirtualClock に置き換えられている場合は、仮想の時刻で待つ。
+    """
+
+    def __init__(self):
+        self.events = collections.deque()
+        self.condition = threading.Condition()
+        self.waitCount = 0 # get() で眠った回数
+
+    def __len__(self):
+        return len(self.events)
+
+    def put(self, event):
+        """
+        イベントを追加し、get() で待っているスレッドを起こす。どのスレッドから呼んでもよい。
+        """
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify()
+
+    def clear(self):
+        with self.condition:
+            self.events.clear()
+
+    def get(self, deadline=None):
+        """
+        最も古いイベントを取り出して返す。
+        イベントがなければ、deadline（time.monotonic() の時刻）まで待ち、それでもなければ None を返す。
+        deadline が None の場合は、イベントが届くまで待つ。
+        """
+        waitForEvent = getattr(time, "waitForEvent", None) # 仮想の時計の場合だけある
+        with self.condition:
+            while len(self.events) == 0:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    return None
+                self.waitCount += 1
+                if waitForEvent is None:
+                    self.condition.wait(timeout)
+                else:
+                    # 仮想の時刻を次のイベントか deadline まで進める。イベントは put() で追加される
+                    self.condition.release()
+                    try:
+                        waitForEvent(timeout)
+                    finally:
+                        self.condition.acquire()
+            return self.events.popleft()
@@ -0,0 +1,80 @@
+from indexedScreen import Screen
+
+class FrameBuffer(object):
+    """
+    LED の 8 x 8 画面を表すフレームバッファ。
+    ゲームは sense.set_pixel や sense.set_pixels の代わりにこのフレームバッファに描画し、
+    1フレームの描画が終わったら flush() を呼ぶ。
+    flush() は、最後にデバイスに書き込んだ画面と比較して、変化したピクセルだけを書き込む。
+    変化したピクセルが多い場合は、set_pixels の1回の書き込みにまとめる。
+    """
+    P_BULK_THRESHOLD = 8 # 変化したピクセル数がこの数以上であれば、set_pixels で一括して書き込む
+
+    black = O = (0, 0, 0)
+
+    def __init__(self, sense):
+        self.sense = sense
+        self.pixels = [FrameBuffer.O for i in range(64)] # 描画中の画面。要素は色を表すタプル
+        self.committed = [None for i in range(64)] # 最後にデバイスに書き込んだ画面。None は不明（必ず書き込む）を表す
+        self.requestedWrites = 0 # 今のフレームで、直接デバイスに書き込んでいたら発生していた書き込み回数
+        self.deviceWrites = 0 # 今までにデバイスに実際に書き込んだ回数
+        self.lastSavedWrites = 0 # 直前の flush() で節約できた書き込み回数
+        self.totalSavedWrites = 0 # 今までに節約できた書き込み回数の合計
+        self.frameCount = 0 # flush() した回数
+
+    def set_pixel(self, x, y, color):
+        self.pixels[y * 8 + x] = tuple(color)
+        self.requestedWrites += 1
+
+    def get_pixel(self, x, y):
+        return self.pixels[y * 8 + x]
+
+    def set_pixels(self, pixels):
+        """
+        64 個のピクセルの色をまとめて設定する。
+        pixels は色の配列か、indexedScreen.Screen である。
+        """
+        if isinstance(pixels, Screen):
+            self.pixels = list(pixels.toPixels())
+        else:
+            self.pixels = [tuple(color) for color in pixels]
+        self.requestedWrites += 1
+
+    def get_pixels(self):
+        return list(self.pixels)
+
+    def clear(self, color=O):
+        self.pixels = [tuple(color) for i in range(64)]
+        self.requestedWrites += 1
+
+    def invalidate(self):
+        """
+        デバイスの画面が、このフレームバッファ以外（show_message など）で書き換えられた場合に呼ぶ。
+        次の flush() では画面全体を書き込む。
+        """
+        self.committed = [None for i in range(64)]
+
+    def flush(self):
+        """
+        変化したピクセルだけをデバイスに書き込む。
+        このフレームで節約できた書き込み回数を返す。
+        """
+        changed = [i for i in range(64) if self.pixels[i] != self.committed[i]]
+        writes = 0
+        if len(changed) >= FrameBuffer.P_BULK_THRESHOLD:
+            self.sense.set_pixels(self.pixels)
+            writes = 1
+        else:
+            for i in changed:
+                self.sense.set_pixel(i % 8, i // 8, self.pixels[i])
+            writes = len(changed)
+        self.committed = list(self.pixels)
+        self.deviceWrites += writes
+        self.lastSavedWrites = max(self.requestedWrites - writes, 0)
+        self.totalSavedWrites += self.lastSavedWrites
+        self.requestedWrites = 0
+        self.frameCount += 1
+        return self.lastSavedWrites
+
+    def getStatsText(self):
+        return "{} frames, {} device writes, {} writes saved".format(self.frameCount, self.deviceWrites, self.totalSavedWrites)
@@ -0,0 +1,96 @@
+import time, collections
+
+class FrameScheduler(object):
+    """
+    ゲームのフレームの間隔を一定に保つ。
+    各フレームの締め切り時刻を frameTime ずつ進め、waitForNextFrame() で締め切り時刻まで待つので、
+    フレームの処理時間が変動しても、待ち時間の誤差が積み重なることはない。
+    締め切りに間に合わなかった場合は、遅れを取り戻そうとせずに、その時刻から数え直す。
+    物理計算などは getSteps() で、描画とは独立した一定の時間刻み stepTime ごとに進められる。
+    各フレームの処理時間を記録し、中央値や99パーセンタイル、締め切りに間に合わなかった回数を返す。
+    """
+    P_HISTORY_SIZE = 512 # 処理時間を記録するフレーム数
+    P_MAX_STEPS = 8 # 1回の getSteps() で返す最大の回数。処理が大きく遅れた時に、物理計算が追いつけなくなるのを防ぐ
+
+    def __init__(self, frameTime, stepTime=None):
+        self.frameTime = frameTime # フレーム間の時間（秒）
+        self.stepTime = frameTime if stepTime is None else stepTime # 物理計算の時間刻み（秒）
+        self.frameTimes = collections.deque(maxlen=FrameScheduler.P_HISTORY_SIZE) # 各フレームの処理時間（秒）
+        self.frameCount = 0 # waitForNextFrame() を呼んだ回数
+        self.missedCount = 0 # 締め切りに間に合わなかった回数
+        self.start()
+
+    def start(self):
+        """
+        今の時刻から数え直す。ゲームの開始前に時間のかかる処理をした場合などに呼ぶ。
+        """
+        now = time.monotonic()
+        self.deadline = now + self.frameTime # 今のフレームの締め切り時刻
+        self.frameStartTime = now # 今のフレームの処理を開始した時刻
+        self.lastStepTime = now # 最後に getSteps() を呼んだ時刻
+        self.accumulator = 0.0 # まだ物理計算で進めていない時間（秒）
+
+    def getSteps(self):
+        """
+        前回の呼び出しから経過した時間分だけ物理計算を進めるには、stepTime の計算を何回行えばよいかを返す。
+        端数の時間は次の呼び出しに持ち越す。
+        """
+        now = time.monotonic()
+        self.accumulator += now - self.lastStepTime
+        self.lastStepTime = now
+        steps = int(self.accumulator / self.stepTime)
+        self.accumulator -= steps * self.stepTime
+        if steps > FrameScheduler.P_MAX_STEPS:
+            steps = FrameScheduler.P_MAX_STEPS
+            self.accumulator = 0.0
+        return steps
+
+    def endFrame(self):
+        """
+        今のフレームの処理時間を記録して、次のフレームの締め切り時刻を決め、今のフレームの締め切り時刻まで待つ秒数を返す。
+        締め切りに間に合わなかった場合は None を返す。
+        """
+        now = time.monotonic()
+        self.frameTimes.append(now - self.frameStartTime)
+        self.frameCount += 1
+        if self.deadline > now:
+            seconds = self.deadline - now
+            self.deadline += self.frameTime
+            return seconds
+        self.missedCount += 1
+        print("フレーム落ち P_FRAME_TIME = {:.2f}, duration = {:.2f}".format(self.frameTime, now - self.frameStartTime))
+        self.deadline = now + self.frameTime
+        return None
+
+    def waitForNextFrame(self):
+        """
+        今のフレームの締め切り時刻まで待つ。
+        締め切りに間に合った場合は True、間に合わなかった場合は False を返す。
+        """
+        seconds = self.endFrame()
+        if seconds is not None:
+            time.sleep(seconds)
+        self.frameStartTime = time.monotonic()
+        return seconds is not None
+
+    async def waitForNextFrameAsync(self, sleep):
+        """
+        waitForNextFrame() のコルーチン版。sleep（秒数を受け取るコルーチン関数。CancellableSense.sleep など）で待つ。
+        締め切りに間に合わなかった場合も、sleep(0) で1度イベントループに戻るので、ほかのタスクやキャンセルが処理される。
+        """
+        seconds = self.endFrame()
+        await sleep(0 if seconds is None else seconds)
+        self.frameStartTime = time.monotonic()
+        return seconds is not None
+
+    def getPercentile(self, percent):
+        """
+        最近のフレームの処理時間（秒）の percent パーセンタイルを返す。
+        """
+        if len(self.frameTimes) == 0:
+            return 0.0
+        frameTimes = sorted(self.frameTimes)
+        return frameTimes[min(int(len(frameTimes) * percent / 100), len(frameTimes) - 1)]
+
+    def getStatsText(self):
+        return "{} frames, p50 {:.1f} ms, p99 {:.1f} ms, {} missed deadlines".format(self.frameCount, self.getPercentile(50) * 1000, self.getPercentile(99) * 1000, self.missedCount)
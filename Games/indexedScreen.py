@@ -0,0 +1,106 @@
+class Palette(object):
+    """
+    画面で使う色の一覧。色とインデックス（0から255）を相互に変換する。
+    インデックス 0 の色が、何も描画していない画面の色になるので、最初には黒を指定すること。
+    """
+
+    def __init__(self, colors):
+        self.colors = [] # インデックスから色を表すタプルを得るための配列
+        self.indexes = {} # 色を表すタプルからインデックスを得るための辞書
+        for color in colors:
+            self.getIndex(color)
+
+    def getIndex(self, color):
+        """
+        色のインデックスを返す。まだ登録されていない色であれば追加する。
+        """
+        key = tuple(color)
+        index = self.indexes.get(key)
+        if index is None:
+            if len(self.colors) >= 256:
+                raise ValueError("A palette can hold at most 256 colors")
+            index = len(self.colors)
+            self.colors.append(key)
+            self.indexes[key] = index
+        return index
+
+    def getColor(self, index):
+        return self.colors[index]
+
+    def getTranslationTable(self, fromColor, toColor):
+        """
+        bytes.translate() に渡せる、fromColor を toColor に置き換える変換表を返す。
+        """
+        table = bytearray(range(256))
+        table[self.getIndex(fromColor)] = self.getIndex(toColor)
+        return bytes(table)
+
+
+class Screen(object):
+    """
+    8 x 8 の画面。64 バイトのパレットのインデックスの配列で表す。
+    screen[i] や screen[a:b] で、インデックスの値を読み書きできる。
+    デバイスに書き込む色の配列への変換は toPixels() で行い、結果は次に書き換えられるまでキャッシュされる。
+    同じ画面かどうかは、まず同一のオブジェクトかどうかで判定するので、
+    あらかじめ用意した画面同士の比較は O(1) である。
+    """
+    __slots__ = ("palette", "indexes", "pixelsCache")
+
+    def __init__(self, palette, indexes=None):
+        self.palette = palette
+        self.indexes = bytearray(64) if indexes is None else bytearray(indexes)
+        self.pixelsCache = None
+
+    @classmethod
+    def fromPixels(cls, palette, pixels):
+        """
+        色の配列から画面を作る。
+        """
+        return cls(palette, [palette.getIndex(color) for color in pixels])
+
+    def copy(self):
+        return Screen(self.palette, self.indexes)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, key):
+        return self.indexes[key]
+
+    def __setitem__(self, key, value):
+        self.indexes[key] = value
+        self.pixelsCache = None
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Screen):
+            return NotImplemented
+        return self.palette is other.palette and self.indexes == other.indexes
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def set_pixel(self, x, y, color):
+        self[y * 8 + x] = self.palette.getIndex(color)
+
+    def get_pixel(self, x, y):
+        return self.palette.colors[self.indexes[y * 8 + x]]
+
+    def translate(self, table):
+        """
+        Palette.getTranslationTable() で得た変換表で色を置き換えた、新しい画面を返す。
+        """
+        return Screen(self.palette, self.indexes.translate(table))
+
+    def toPixels(self):
+        """
+        sense.set_pixels() に渡せる、64 個の色の配列を返す。
+        """
+        if self.pixelsCache is None:
+            colors = self.palette.colors
+            self.pixelsCache = [colors[i] for i in self.indexes]
+        return self.pixelsCache
@@ -1,5 +1,12 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import random, math, time, copy, colorsys
+import random, math, time, copy
+from frameBuffer import FrameBuffer
+from rainbow import Rainbow
+from mazeGenerator import generateMaze, newSeed
+from mazeCache import MazeCache
+from viewport import Viewport
+from mazeSolver import MazeSolver
+from mazeBatch import findBestMaze
 
 class LargeMaze(object):
     """
@@ -9,6 +16,21 @@ class LargeMaze(object):
     P_SENSITIVE = 6.0  # Sensibility for orientation
     P_BLOCK_X_LENGTH = 15 # 迷路の横の広さを表すブロック数。奇数であること。
     P_BLOCK_Y_LENGTH = 15 # 迷路の縦の広さを表すブロック数。奇数であること。
+    P_ALGORITHM = "wallExtension" # 迷路を生成する方法。mazeGenerator.ALGORITHMS のキー
+    P_REPLAY = True # 迷路を生成する様子を再生するかどうか
+    P_SEED = None # 迷路の seed。None の場合は、起動するたびに新しい seed にする
+    P_USE_CACHE = True # 生成した迷路を MazeCache にキャッシュするかどうか。生成する様子を再生する場合は使わない
+    P_CACHE_DIRECTORY = None # MazeCache のディレクトリ。None の場合は MazeCache の既定のディレクトリ
+    P_MIN_PATH_LENGTH = 20 # スタートからゴールまでの道のりのセルの数が、これより短い迷路は作り直す
+    P_MAX_ATTEMPTS = 10 # 迷路を作り直す（P_CANDIDATE_COUNT が 1 より大きければ、候補を評価し直す）最大の回数。すべて短ければ、一番長い（候補を評価する場合は一番難しい）迷路を使う
+    P_HINT_DELAY = 5.0 # ボールがこの秒数だけ止まっていたら、ゴールへの道のりのヒントを表示する
+    P_HINT_LENGTH = 4 # ヒントとして表示する道のりのセルの数
+    P_CANDIDATE_COUNT = 8 # 1 より大きければ、seed から順にこの数の迷路を評価して、道のりが P_MIN_PATH_LENGTH 以上の中で一番難しい迷路を使う
+    # 候補を評価するプロセスの数。1 の場合は、このプロセスで評価する。None の場合は、使えるコアの数のプロセスを spawn で起動する。
+    # 複数のコアで、プロセスを起動する方が速いことをまだ測定していないので、既定では 1 にしている。
+    # 1コアの環境の benchmark.py batch では、201 x 201 で 2プロセスは 0.66倍、301 x 301 で 0.99倍の速さだった
+    P_PROCESS_COUNT = 1
+    P_PARALLEL_MIN_CELLS = 201 * 201 # P_PROCESS_COUNT が 1 でない場合も、これより小さい迷路は1つのプロセスで評価する。複数のコアで測定して決め直すこと
 
     gray = G = [100, 100, 100]
     red = R = [255, 0, 0]
@@ -20,6 +42,7 @@ class LargeMaze(object):
     white = W = [255, 255, 255]
     pillarNotWall = [60, 255, 60] # Color for pillar that is not covered by wall
     pillarWall = [200, 255, 30] # Color for pillar that is covered by wall
+    hint = [60, 60, 0] # Color for cells on the way to the goal
     WALL = W
     BALL = R
     GOAL = B
@@ -33,11 +56,16 @@ class LargeMaze(object):
         self.GENERATE_SPEED = 0.001 # less as faster。迷路自動生成の速度に関係する待ち時間。
         self.sense = sense
         self.sense.stick.direction_any = self.joystick_any
+        self.frameBuffer = FrameBuffer(sense)
         self.shouldExit = False
-        self.workingPillarList = [] # 稼働中（壁を伸ばすことを検証すべき）の柱のリスト。中身は柱を表すインデックスの数値
-        self.pillarList = [] # どの柱がどこにあるかを示す配列。値は {"x": 2, "y": 3} のようなオブジェクト
-        self.wallTable = [] # どこに壁があるかを示す２次元配列。壁で覆われた柱も、壁とみなす。1 が壁、0が壁でない。
-        self.world = [] # 迷路の全体を表す、LED に表示する色を要素として持つ P_BLOCK_X_LENGTH x P_BLOCK_Y_LENGTH 個の配列。ただし、X Y 各々、8より小さい場合には、8 に調整される。
+        self.seed = None # 迷路の seed。作り直した迷路や候補の迷路の seed は、seed + 作り直した回数（候補の番号）
+        self.generator = None # 迷路を生成した MazeGenerator
+        self.wallGrid = None # どこに壁があるかを示す WallGrid。壁で覆われた柱も、壁とみなす。
+        self.viewport = None # 表示している 8 x 8 の範囲の壁をキャッシュする Viewport
+        self.solver = None # ゴールまでの距離の場を持つ MazeSolver
+        self.hintCells = [] # ヒントとして表示しているセルの (x, y) のリスト
+        self.ballX = 1 # ボールの位置 x
+        self.ballY = 1 # ボールの位置 y
         self.currentScrollX = 0 # 現在のスクロール横位置
         self.currentScrollY = 0 # 現在のスクロール縦位置
         self.goalX = 0 # ゴールの位置 x
@@ -58,19 +86,14 @@ class LargeMaze(object):
         if event.action == ACTION_RELEASED:
             self.shouldExit = True
     
-    def initDraw(self):
-        AISLE = LargeMaze.O
-        WALL = LargeMaze.WALL
-        PNW = LargeMaze.pillarNotWall
-        PW = LargeMaze.pillarWall
-        START = LargeMaze.BALL
-        GOAL = LargeMaze.GOAL
-
-        # 横や縦が 8 よりも小さい場合、8 まで拡張して world を生成する。
-        self.world = [LargeMaze.O for i in range(max(LargeMaze.P_BLOCK_X_LENGTH, 8) * max(LargeMaze.P_BLOCK_Y_LENGTH, 8))]
-
+    def generateWalls(self):
+        """
+        ゴールの位置を決め、迷路を生成して、wallGrid に設定する。P_REPLAY が True の場合は、生成する様子を後で再生するために、途中の変化も記録する。
+        ゴールの位置と迷路は seed だけで決まるので、表示された seed を P_SEED に設定すると、同じ迷路を遊べる。
+        """
+        self.seed = LargeMaze.P_SEED if LargeMaze.P_SEED is not None else newSeed()
         # ゴールの位置は、右上隅、左下隅、右下隅のどれかランダム
-        goalRandom = random.randint(1,3)
+        goalRandom = random.Random(self.seed).randint(1,3)
         if goalRandom == 1:
             # 右上隅
             self.goalX = LargeMaze.P_BLOCK_X_LENGTH - 2
@@ -84,110 +107,144 @@ class LargeMaze(object):
             self.goalX = LargeMaze.P_BLOCK_X_LENGTH - 2
             self.goalY = LargeMaze.P_BLOCK_Y_LENGTH - 2
 
-        for y in range(LargeMaze.P_BLOCK_Y_LENGTH):
-            wallRow = []
-            for x in range(LargeMaze.P_BLOCK_X_LENGTH):
-                color = ()
-                if x == 0 or x == LargeMaze.P_BLOCK_X_LENGTH - 1 or y == 0 or y == LargeMaze.P_BLOCK_Y_LENGTH - 1:
-                    wallRow.append(1)
-                    color = WALL
-                else:
-                    wallRow.append(0)
-                    if x == 1 and y == 1:
-                        color = START
-                    elif x == self.goalX and y == self.goalY:
-                        color = GOAL
-                    else:
-                        color = AISLE
-                if x % 2 == 0 and y % 2 == 0:
-                    pillarIndex = len(self.pillarList)
-                    if x ==0 or x == LargeMaze.P_BLOCK_X_LENGTH - 1 or y == 0 or y == LargeMaze.P_BLOCK_Y_LENGTH - 1:
-                        self.workingPillarList.append(pillarIndex)
-                    self.pillarList.append({"x": x, "y": y})
-                    if color == WALL:
-                        color = PW
-                    else:
-                        color = PNW
-                self.world[y * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + x] = color
-            self.wallTable.append(wallRow)
-        screen = []
-        for y in range(8):
-            row = self.world[y * max(LargeMaze.P_BLOCK_X_LENGTH, 8): y * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + 8]
-            screen.extend(row)
-        self.sense.set_pixels(screen)
-
-    def  generateWalls(self):
-        WALL = LargeMaze.WALL
+        cache = MazeCache(LargeMaze.P_CACHE_DIRECTORY) if LargeMaze.P_USE_CACHE and not LargeMaze.P_REPLAY else None
+        if LargeMaze.P_CANDIDATE_COUNT > 1:
+            # 候補の迷路を評価して、一番難しい迷路の seed だけを使う
+            seeds = [self.chooseSeed(cache)]
+        else:
+            # スタートからゴールまでの道のりが P_MIN_PATH_LENGTH より短い迷路は作り直す
+            seeds = range(self.seed, self.seed + LargeMaze.P_MAX_ATTEMPTS)
 
-        while len(self.workingPillarList) > 0:
-            randomIndex = random.randint(0, len(self.workingPillarList) - 1)
-            index = self.workingPillarList.pop(randomIndex)
-            x = self.pillarList[index]["x"]
-            y = self.pillarList[index]["y"]
-            
-            # 壁を伸ばせる可能性配列。値はその方向を表す {"x": 2, "y": 0} や {"x": 0, "y": -2} のようなオブジェクト
-            possibleExtend = []
+        pathLength = None
+        for attempt, seed in enumerate(seeds):
+            if cache is None:
+                generator = generateMaze(LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_ALGORITHM, recordSteps=LargeMaze.P_REPLAY, seed=seed)
+            else:
+                generator = cache.getGenerator(LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_ALGORITHM, seed)
+            solver = MazeSolver(generator.grid, self.goalX, self.goalY)
+            if pathLength is None or solver.getDistance(1, 1) > pathLength:
+                self.generator = generator
+                self.solver = solver
+                self.mazeSeed = seed # 迷路を生成した seed。P_CANDIDATE_COUNT が 1 より大きいか、作り直した場合は self.seed と異なる
+                pathLength = solver.getDistance(1, 1)
+            if pathLength >= LargeMaze.P_MIN_PATH_LENGTH:
+                break
+        print("Seed: {}, maze seed: {}, path length: {}, difficulty: {}, attempts: {}".format(self.seed, self.mazeSeed, pathLength, self.solver.getDifficulty(1, 1), attempt + 1))
+        if cache is not None:
+            print(cache.getStatsText())
+        self.wallGrid = self.generator.grid
+        self.viewport = Viewport(self.wallGrid, LargeMaze.WALL, LargeMaze.O)
 
-            if x + 2 <= LargeMaze.P_BLOCK_X_LENGTH - 1 and self.wallTable[y][x + 2] == 0:
-                possibleExtend.append({"x": 2, "y": 0})
-            if x - 2 >= 0 and self.wallTable[y][x - 2] == 0:
-                possibleExtend.append({"x": -2, "y": 0})
-            if y + 2 <= LargeMaze.P_BLOCK_Y_LENGTH - 1 and self.wallTable[y + 2][x] == 0:
-                possibleExtend.append({"x": 0, "y": 2})
-            if y - 2 >= 0 and self.wallTable[y - 2][x] == 0:
-                possibleExtend.append({"x": 0, "y": -2})
-            
-            self.world[y * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + x] = WALL
+    def chooseSeed(self, cache):
+        """
+        self.seed から順に P_CANDIDATE_COUNT 個の候補の迷路を評価して、道のりが P_MIN_PATH_LENGTH 以上の中で一番難しい迷路の seed を返す。
+        そのような迷路がなければ、次の P_CANDIDATE_COUNT 個を評価する（最大 P_MAX_ATTEMPTS 回）。すべて短ければ、一番難しい迷路を使う。
+        cache があれば、選んだ seed を保存し、次に同じ設定で選ぶ時は、候補を評価せずに保存した seed を返す。
+        """
+        count = LargeMaze.P_CANDIDATE_COUNT
+        minPathLength = LargeMaze.P_MIN_PATH_LENGTH
+        seeds = range(self.seed, self.seed + count * LargeMaze.P_MAX_ATTEMPTS)
+        condition = "goal {},{} min {} candidates {}".format(self.goalX, self.goalY, minPathLength, count)
+        if cache is not None:
+            seed = cache.loadChoice(LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_ALGORITHM, seeds, condition)
+            if seed is not None:
+                print("Best candidate from the cache: seed {}".format(seed))
+                return seed
+        processCount = LargeMaze.P_PROCESS_COUNT
+        if LargeMaze.P_BLOCK_X_LENGTH * LargeMaze.P_BLOCK_Y_LENGTH < LargeMaze.P_PARALLEL_MIN_CELLS:
+            processCount = 1
+        best = None
+        for attempt in range(LargeMaze.P_MAX_ATTEMPTS):
+            score = findBestMaze(LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_ALGORITHM,
+                seeds[attempt * count : (attempt + 1) * count], self.goalX, self.goalY, processCount, minPathLength)
+            if best is None or (score[1] >= minPathLength, score) > (best[1] >= minPathLength, best):
+                best = score
+            if best[1] >= minPathLength:
+                break
+        print("Best of {} candidates: seed {}".format(count * (attempt + 1), best[2]))
+        if cache is not None:
+            cache.storeChoice(LargeMaze.P_BLOCK_X_LENGTH, LargeMaze.P_BLOCK_Y_LENGTH, LargeMaze.P_ALGORITHM, seeds, condition, best[2])
+        return best[2]
 
-            if len(possibleExtend) > 0:
-                extendDirection = possibleExtend[random.randint(0, len(possibleExtend) - 1)]
-                # print(extendDirection)
+    def getCellColor(self, x, y, isWall, showPillar):
+        """
+        セル (x, y) の色を返す。showPillar が True の場合は、柱（x と y が両方とも偶数のセル）を、壁かどうかで色分けする。
+        迷路の外（迷路が 8 よりも小さい場合の右や下）は黒である。
+        """
+        if x >= LargeMaze.P_BLOCK_X_LENGTH or y >= LargeMaze.P_BLOCK_Y_LENGTH:
+            return LargeMaze.O
+        if showPillar and x % 2 == 0 and y % 2 == 0:
+            return LargeMaze.pillarWall if isWall else LargeMaze.pillarNotWall
+        if isWall:
+            return LargeMaze.WALL
+        if x == self.ballX and y == self.ballY:
+            return LargeMaze.BALL
+        if x == self.goalX and y == self.goalY:
+            return LargeMaze.GOAL
+        return LargeMaze.O
 
-                # 伸ばす1つ目。柱ではない。
-                x1 = int(x + extendDirection["x"] / 2)
-                y1 = int(y + extendDirection["y"] / 2)
+    def getScreen(self, grid, showPillar):
+        """
+        grid の、現在のスクロール位置から 8 x 8 の範囲の画面を返す。
+        """
+        wallMasks = grid.getWindowMasks(self.currentScrollX, self.currentScrollY)
+        screen = []
+        for y in range(8):
+            for x in range(8):
+                screen.append(self.getCellColor(x + self.currentScrollX, y + self.currentScrollY, (wallMasks[y] >> x) & 1 == 1, showPillar))
+        return screen
 
-                self.world[y1 * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + x1] = WALL
-                self.wallTable[y1][x1] = 1
+    def drawScreen(self):
+        """
+        現在のスクロール位置の画面を表示する。viewport がキャッシュした壁と通路の画面に、ヒントとゴールとボールを重ねる。
+        """
+        self.viewport.scrollTo(self.currentScrollX, self.currentScrollY)
+        screen = list(self.viewport.pixels)
+        cells = [(x, y, LargeMaze.hint) for x, y in self.hintCells] + [(self.goalX, self.goalY, LargeMaze.GOAL), (self.ballX, self.ballY, LargeMaze.BALL)]
+        for x, y, color in cells:
+            x -= self.currentScrollX
+            y -= self.currentScrollY
+            if 0 <= x < 8 and 0 <= y < 8:
+                screen[y * 8 + x] = color
+        self.frameBuffer.set_pixels(screen)
+        self.frameBuffer.flush()
 
-                # 伸ばす2つ目。柱である。
-                x2 = x + extendDirection["x"]
-                y2 = y + extendDirection["y"]
-                self.world[y2 * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + x2] = WALL
-                self.wallTable[y2][x2] = 1
+    def initDraw(self):
+        """
+        迷路を表示する。生成する様子を再生する場合は、生成する前の状態を表示する。
+        """
+        if self.generator.steps is not None:
+            self.frameBuffer.set_pixels(self.getScreen(self.generator.initialGrid, True))
+            self.frameBuffer.flush()
+        else:
+            self.drawScreen()
 
-                # 到達した柱を、稼働中の柱として保存する
-                reachedPillarIndex = LargeMaze.findPillarIndex(self.pillarList, x2, y2)
-                if reachedPillarIndex != -1:
-                    self.workingPillarList.append(reachedPillarIndex)
-                else:
-                    raise Exception("reachedPillarIndex == -1")
-                
-                # 到達する前の柱も、まだ稼働中の柱として保存する
-                if len(possibleExtend) >= 2:
-                    self.workingPillarList.append(index)
-            screen = []
-            for y3 in range(8):
-                row = self.world[y3 * max(LargeMaze.P_BLOCK_X_LENGTH, 8): y3 * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + 8]
-                screen.extend(row)
-            self.sense.set_pixels(screen)
-            time.sleep(self.GENERATE_SPEED)
-        
-    @classmethod
-    def findPillarIndex(cls, pillarList, x, y):
-        """ 
-        配列の中から、xとyで指定したオブジェクトの値と合致するものの最初のものの配列のインデックスを返す。ヒットしなければ -1 を返す。
+    def replayWalls(self):
+        """
+        記録した生成の途中の変化を、1つずつ表示する。画面の外の変化は、書き込む画面を変えない。
         """
-        for i in range(len(pillarList)):
-            if pillarList[i]["x"] == x and pillarList[i]["y"] == y:
-                return i
-        return -1
-        
+        if self.generator.steps is None:
+            return
+        screen = self.getScreen(self.generator.initialGrid, True)
+        for step in self.generator.steps:
+            if self.shouldExit:
+                break
+            for x, y, isWall in step:
+                if x < 8 and y < 8:
+                    screen[y * 8 + x] = self.getCellColor(x, y, isWall, False)
+            self.frameBuffer.set_pixels(screen)
+            self.frameBuffer.flush() # 画面外で変化した場合には何も書き込まれない
+            time.sleep(self.GENERATE_SPEED)
+        self.drawScreen()
+
     def run(self):
         print(self.__class__.__name__ + " is running")
-        self.initDraw()
         self.generateWalls()
+        self.initDraw()
+        self.replayWalls()
         self.goMaze()
+        print(self.frameBuffer.getStatsText())
+        print(self.viewport.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
     def goMaze(self):
@@ -211,10 +268,10 @@ class LargeMaze(object):
             # 加速度の方向に壁があれば、加速度を0にする。なお、斜めには動かないので、斜めの場所はチェックしない。
             targetX = x + (1 if xAccel > 0 else -1)
             targetY = y + (1 if yAccel > 0 else -1)
-            if self.wallTable[y][targetX] == 1:
+            if self.wallGrid.isWall(targetX, y):
                 xAccel = 0
                 xPh = float(x)
-            if self.wallTable[targetY][x] == 1:
+            if self.wallGrid.isWall(x, targetY):
                 yAccel = 0
                 yPh = float(y)
             
@@ -238,13 +295,10 @@ class LargeMaze(object):
                 elif y - self.currentScrollY <= 2 and self.currentScrollY > 0:
                     self.currentScrollY -= 1
 
-                self.world[pre_y * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + pre_x] = O
-                self.world[y * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + x] = BALL
-                screen = []
-                for y1 in range(8):
-                    row = self.world[(y1 + self.currentScrollY) * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + self.currentScrollX: (y1 + self.currentScrollY) * max(LargeMaze.P_BLOCK_X_LENGTH, 8) + self.currentScrollX + 8]
-                    screen.extend(row)
-                self.sense.set_pixels(screen)
+                self.ballX = x
+                self.ballY = y
+                self.hintCells = []
+                self.drawScreen()
 
                 pre_time = time.monotonic()
                 if x == self.goalX and y == self.goalY:
@@ -252,11 +306,15 @@ class LargeMaze(object):
                     self.gotGoal()
                     continue
             else:
+                if len(self.hintCells) == 0 and time.monotonic() - pre_time >= LargeMaze.P_HINT_DELAY:
+                    self.hintCells = self.solver.getPath(x, y, LargeMaze.P_HINT_LENGTH)
+                    self.drawScreen()
                 subsecond = (time.monotonic() - pre_time) % 1
                 if subsecond < 0.8:
-                    self.sense.set_pixel(x - self.currentScrollX, y - self.currentScrollY, BALL)
+                    self.frameBuffer.set_pixel(x - self.currentScrollX, y - self.currentScrollY, BALL)
                 else:
-                    self.sense.set_pixel(x - self.currentScrollX, y - self.currentScrollY, O)
+                    self.frameBuffer.set_pixel(x - self.currentScrollX, y - self.currentScrollY, O)
+                self.frameBuffer.flush()
 
             pre_x = x
             pre_y = y
@@ -264,13 +322,18 @@ class LargeMaze(object):
     
     def gotGoal(self):
         count = 0.00
+        # 画面の各行の壁のビットマスク。ゴールした後はスクロールしないので、最初に1度だけ読み出す
+        self.viewport.scrollTo(self.currentScrollX, self.currentScrollY)
+        wallMasks = list(self.viewport.masks)
         while not self.shouldExit:
-            color = colorsys.hsv_to_rgb(count, 1.0, 1.0)
-            color = (int(color[0]*255), int(color[1]*255), int(color[2]*255))
-            for y in range(self.currentScrollY, self.currentScrollY + 8):
-                for x in range(self.currentScrollX, self.currentScrollX + 8):
-                    if self.wallTable[y][x] == 1:
-                        self.sense.set_pixel(x - self.currentScrollX, y - self.currentScrollY, color)
+            color = Rainbow.getColor(count)
+            for y in range(8):
+                mask = wallMasks[y]
+                while mask != 0:
+                    x = (mask & -mask).bit_length() - 1 # 一番下の 1 のビットの列
+                    self.frameBuffer.set_pixel(x, y, color)
+                    mask &= mask - 1
+            self.frameBuffer.flush() # 壁の数だけ set_pixel する代わりに、一括して書き込む
             count += 0.08
             time.sleep(0.05)
 
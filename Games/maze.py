@@ -1,11 +1,17 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import random, math, time, copy, colorsys
+import random, math, time, copy
+from frameBuffer import FrameBuffer
+from rainbow import Rainbow
+from mazeGenerator import generateMaze, newSeed
 
 class Maze(object):
     """ 
     自動的に迷路を生成し、ジャイロセンサーで傾きを感知して、ボールを動かしてゴールするゲーム
     """
     P_SENSITIVE = 6.0  # Sensibility for orientation
+    P_ALGORITHM = "wallExtension" # 迷路を生成する方法。mazeGenerator.ALGORITHMS のキー
+    P_REPLAY = True # 迷路を生成する様子を再生するかどうか
+    P_SEED = None # 迷路の seed。None の場合は、起動するたびに新しい seed にする
 
     gray = G = [100, 100, 100]
     red = R = [255, 0, 0]
@@ -43,10 +49,11 @@ class Maze(object):
         self.GENERATE_SPEED = 0.01 # less as faster。迷路自動生成の速度に関係する待ち時間。
         self.sense = sense
         self.sense.stick.direction_any = self.joystick_any
+        self.frameBuffer = FrameBuffer(sense)
         self.shouldExit = False
-        self.workingPillarList = [] # 稼働中（壁を伸ばすことを検証すべき）の柱のリスト。中身は柱を表すインデックスの数値
-        self.pillarList = [] # どの柱がどこにあるかを示す配列。値は {"x": 2, "y": 3} のようなオブジェクト
-        self.wallTable = [] # どこに壁があるかを示す２次元配列。壁で覆われた柱も、壁とみなす。1 が壁、0が壁でない。
+        self.seed = None # 迷路の seed
+        self.generator = None # 迷路を生成した MazeGenerator
+        self.wallGrid = None # どこに壁があるかを示す WallGrid。壁で覆われた柱も、壁とみなす。
 
     @classmethod
     def getName(cls):
@@ -63,111 +70,69 @@ class Maze(object):
         if event.action == ACTION_RELEASED:
             self.shouldExit = True
     
-    def initDraw(self):
-        AISLE = Maze.O
-        WALL = Maze.WALL
-        PNW = Maze.pillarNotWall
-        PW = Maze.pillarWall
-        START = Maze.BALL
-        GOAL = Maze.GOAL
+    def generateWalls(self):
+        """
+        迷路を生成して、wallGrid に設定する。P_REPLAY が True の場合は、生成する様子を後で再生するために、途中の変化も記録する。
+        表示された seed を P_SEED に設定すると、同じ迷路を遊べる。
+        """
+        self.seed = Maze.P_SEED if Maze.P_SEED is not None else newSeed()
+        print("Seed: {}".format(self.seed))
+        self.generator = generateMaze(self.BLOCK_X_LENGTH, self.BLOCK_Y_LENGTH, Maze.P_ALGORITHM, recordSteps=Maze.P_REPLAY, seed=self.seed)
+        self.wallGrid = self.generator.grid
 
+    def getCellColor(self, x, y, isWall, showPillar):
+        """
+        セル (x, y) の色を返す。showPillar が True の場合は、柱（x と y が両方とも偶数のセル）を、壁かどうかで色分けする。
+        """
+        if showPillar and x % 2 == 0 and y % 2 == 0:
+            return Maze.pillarWall if isWall else Maze.pillarNotWall
+        if isWall:
+            return Maze.WALL
+        if x == 1 and y == 1:
+            return Maze.BALL
+        if x == self.BLOCK_X_LENGTH - 2 and y == self.BLOCK_Y_LENGTH - 2:
+            return Maze.GOAL
+        return Maze.O
+
+    def drawWalls(self, grid, showPillar):
         pixels = copy.copy(Maze.normal_screen)
         for y in range(self.BLOCK_Y_LENGTH):
-            wallRow = []
             for x in range(self.BLOCK_X_LENGTH):
-                color = ()
-                if x == 0 or x == self.BLOCK_X_LENGTH - 1 or y == 0 or y == self.BLOCK_Y_LENGTH - 1:
-                    wallRow.append(1)
-                    color = WALL
-                else:
-                    wallRow.append(0)
-                    if x == 1 and y == 1:
-                        color = START
-                    elif x == self.BLOCK_X_LENGTH - 2 and y == self.BLOCK_Y_LENGTH - 2:
-                        color = GOAL
-                    else:
-                        color = AISLE
-                if x % 2 == 0 and y % 2 == 0:
-                    pillarIndex = len(self.pillarList)
-                    if x ==0 or x == self.BLOCK_X_LENGTH - 1 or y == 0 or y == self.BLOCK_Y_LENGTH - 1:
-                        self.workingPillarList.append(pillarIndex)
-                    self.pillarList.append({"x": x, "y": y})
-                    if color == WALL:
-                        color = PW
-                    else:
-                        color = PNW
-                pixels[y * 8 + x] = color                
-            self.wallTable.append(wallRow)
-        self.sense.set_pixels(pixels)
-
-    def  generateWalls(self):
-        WALL = Maze.WALL
-
-        while len(self.workingPillarList) > 0:
-            randomIndex = random.randint(0, len(self.workingPillarList) - 1)
-            index = self.workingPillarList.pop(randomIndex)
-            x = self.pillarList[index]["x"]
-            y = self.pillarList[index]["y"]
-            
-            # 壁を伸ばせる可能性配列。値はその方向を表す {"x": 2, "y": 0} や {"x": 0, "y": -2} のようなオブジェクト
-            possibleExtend = []
-
-            if x + 2 <= self.BLOCK_X_LENGTH - 1 and self.wallTable[y][x + 2] == 0:
-                possibleExtend.append({"x": 2, "y": 0})
-            if x - 2 >= 0 and self.wallTable[y][x - 2] == 0:
-                possibleExtend.append({"x": -2, "y": 0})
-            if y + 2 <= self.BLOCK_Y_LENGTH - 1 and self.wallTable[y + 2][x] == 0:
-                possibleExtend.append({"x": 0, "y": 2})
-            if y - 2 >= 0 and self.wallTable[y - 2][x] == 0:
-                possibleExtend.append({"x": 0, "y": -2})
-            
-            self.sense.set_pixel(x, y, WALL)
-
-            if len(possibleExtend) > 0:
-                extendDirection = possibleExtend[random.randint(0, len(possibleExtend) - 1)]
-                # print(extendDirection)
-
-                # 伸ばす1つ目。柱ではない。
-                x1 = int(x + extendDirection["x"] / 2)
-                y1 = int(y + extendDirection["y"] / 2)
-
-                self.sense.set_pixel(x1, y1, WALL)
-                self.wallTable[y1][x1] = 1
+                pixels[y * 8 + x] = self.getCellColor(x, y, grid.isWall(x, y), showPillar)
+        self.frameBuffer.set_pixels(pixels)
+        self.frameBuffer.flush()
 
-                # 伸ばす2つ目。柱である。
-                x2 = x + extendDirection["x"]
-                y2 = y + extendDirection["y"]
-                self.sense.set_pixel(x2, y2, WALL)
-                self.wallTable[y2][x2] = 1
+    def initDraw(self):
+        """
+        迷路を表示する。生成する様子を再生する場合は、生成する前の状態を表示する。
+        """
+        if self.generator.steps is not None:
+            self.drawWalls(self.generator.initialGrid, True)
+        else:
+            self.drawWalls(self.wallGrid, False)
 
-                # 到達した柱を、稼働中の柱として保存する
-                reachedPillarIndex = Maze.findPillarIndex(self.pillarList, x2, y2)
-                if reachedPillarIndex != -1:
-                    self.workingPillarList.append(reachedPillarIndex)
-                else:
-                    raise Exception("reachedPillarIndex == -1")
-                
-                # 到達する前の柱も、まだ稼働中の柱として保存する
-                if len(possibleExtend) >= 2:
-                    self.workingPillarList.append(index)
-            
+    def replayWalls(self):
+        """
+        記録した生成の途中の変化を、1つずつ表示する。
+        """
+        if self.generator.steps is None:
+            return
+        for step in self.generator.steps:
+            if self.shouldExit:
+                break
+            for x, y, isWall in step:
+                self.frameBuffer.set_pixel(x, y, self.getCellColor(x, y, isWall, False))
+            self.frameBuffer.flush()
             time.sleep(self.GENERATE_SPEED)
+        self.drawWalls(self.wallGrid, False)
 
-    @classmethod
-    def findPillarIndex(cls, pillarList, x, y):
-        """ 
-        配列の中から、xとyで指定したオブジェクトの値と合致するものの最初のものの配列のインデックスを返す。ヒットしなければ -1 を返す。
-        """
-        for i in range(len(pillarList)):
-            if pillarList[i]["x"] == x and pillarList[i]["y"] == y:
-                return i
-        return -1
-        
     def run(self):
         print(self.__class__.__name__ + " is running")
-        self.initDraw()
         self.generateWalls()
+        self.initDraw()
+        self.replayWalls()
         self.goMaze()
+        print(self.frameBuffer.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
     def goMaze(self):
@@ -191,10 +156,10 @@ class Maze(object):
             # 加速度の方向に壁があれば、加速度を0にする。なお、斜めには動かないので、斜めの場所はチェックしない。
             targetX = x + (1 if xAccel > 0 else -1)
             targetY = y + (1 if yAccel > 0 else -1)
-            if self.wallTable[y][targetX] == 1:
+            if self.wallGrid.isWall(targetX, y):
                 xAccel = 0
                 xPh = float(x)
-            if self.wallTable[targetY][x] == 1:
+            if self.wallGrid.isWall(x, targetY):
                 yAccel = 0
                 yPh = float(y)
             
@@ -208,19 +173,21 @@ class Maze(object):
             y = round(yPh)
 
             if not(pre_x == x and pre_y == y):
-                self.sense.set_pixel(pre_x, pre_y, O)
-                self.sense.set_pixel(x, y, BALL)
+                self.frameBuffer.set_pixel(pre_x, pre_y, O)
+                self.frameBuffer.set_pixel(x, y, BALL)
                 pre_time = time.monotonic()
-                if x == self.BLOCK_X_LENGTH - 2 and y == self.BLOCK_Y_LENGTH - 2:
-                    time.sleep(0.05)
-                    self.gotGoal()
-                    continue
             else:
                 subsecond = (time.monotonic() - pre_time) % 1
                 if subsecond < 0.8:
-                    self.sense.set_pixel(x, y, BALL)
+                    self.frameBuffer.set_pixel(x, y, BALL)
                 else:
-                    self.sense.set_pixel(x, y, O)
+                    self.frameBuffer.set_pixel(x, y, O)
+            self.frameBuffer.flush()
+            # ゴールには、動いた時にしか着かない
+            if x == self.BLOCK_X_LENGTH - 2 and y == self.BLOCK_Y_LENGTH - 2:
+                time.sleep(0.05)
+                self.gotGoal()
+                continue
 
             pre_x = x
             pre_y = y
@@ -228,13 +195,17 @@ class Maze(object):
     
     def gotGoal(self):
         count = 0.00
+        # 各行の壁のビットマスク。迷路は変わらないので、最初に1度だけ読み出す
+        wallMasks = self.wallGrid.getWindowMasks(0, 0, self.BLOCK_X_LENGTH, self.BLOCK_Y_LENGTH)
         while not self.shouldExit:
-            color = colorsys.hsv_to_rgb(count, 1.0, 1.0)
-            color = (int(color[0]*255), int(color[1]*255), int(color[2]*255))
+            color = Rainbow.getColor(count)
             for y in range(self.BLOCK_Y_LENGTH):
-                for x in range(self.BLOCK_X_LENGTH):
-                    if self.wallTable[y][x] == 1:
-                        self.sense.set_pixel(x, y, color)
+                mask = wallMasks[y]
+                while mask != 0:
+                    x = (mask & -mask).bit_length() - 1 # 一番下の 1 のビットの列
+                    self.frameBuffer.set_pixel(x, y, color)
+                    mask &= mask - 1
+            self.frameBuffer.flush()
             count += 0.08
             time.sleep(0.05)
 
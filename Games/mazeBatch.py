@@ -0,0 +1,55 @@
+"""
+たくさんの迷路の候補を、複数のプロセスで並列に生成して評価し、一番難しい迷路を選ぶ。
+
+候補は seed で表す。各プロセスは、受け取った seed の迷路を生成して MazeSolver で難しさを求め、seed と評価だけを返す。
+迷路そのもの（WallGrid）はプロセスの間で受け渡さないので、候補の数が多くても、通信とメモリーは少ない。
+選んだ迷路は、同じ seed から生成し直せば、評価した迷路と同じになる。
+
+プロセスは fork ではなく spawn で起動する。呼び出す側のプロセスでは、ジョイスティックや、メニューの事前の読み込み、
+GameRuntime などのスレッドが動いているので、fork すると、ほかのスレッドが持っていたロックを持ったままの状態が子プロセスに
+コピーされ、子プロセスが止まることがある。spawn は起動に時間がかかるが、新しいインタープリターで始めるので、その心配がない。
+"""
+import os, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from mazeGenerator import generateMaze
+from mazeSolver import MazeSolver
+
+def getProcessCount():
+    """
+    このプロセスが使えるコアの数を返す。
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def scoreMaze(task):
+    """
+    task の (width, height, algorithm, seed, goalX, goalY) の迷路を生成し、(左上の (1, 1) から解く場合の難しさ, 道のりのセルの数, seed) を返す。
+    ゴールにたどり着けない場合は、難しさと道のりを -1 とする。
+    プロセスの間で受け渡すので、引数と戻り値は、タプルにまとめている。
+    """
+    width, height, algorithm, seed, goalX, goalY = task
+    solver = MazeSolver(generateMaze(width, height, algorithm, seed=seed).grid, goalX, goalY)
+    difficulty = solver.getDifficulty(1, 1)
+    if difficulty is None:
+        return (-1, -1, seed)
+    return (difficulty, solver.getDistance(1, 1), seed)
+
+def findBestMaze(width, height, algorithm, seeds, goalX, goalY, processCount=None, minPathLength=0):
+    """
+    seeds の迷路をすべて評価し、一番難しい迷路の (難しさ, 道のりのセルの数, seed) を返す。難しさが同じ場合は、道のりが長い方を選ぶ。
+    道のりが minPathLength 以上の迷路があれば、その中から選ぶ。なければ、すべての迷路から選ぶので、呼び出す側で道のりを調べる。
+    processCount 個のプロセスで並列に評価する。None の場合は、使えるコアの数と候補の数の小さい方にする。
+    1 の場合は、プロセスを起動せずに、このプロセスで評価する。
+    """
+    tasks = [(width, height, algorithm, seed, goalX, goalY) for seed in seeds]
+    if processCount is None:
+        processCount = min(getProcessCount(), len(tasks))
+    if processCount <= 1:
+        scores = list(map(scoreMaze, tasks))
+    else:
+        # 1回の受け渡しで、1つのプロセスに平均4回分ずつ渡す
+        chunkSize = max(1, len(tasks) // (processCount * 4))
+        with ProcessPoolExecutor(max_workers=processCount, mp_context=multiprocessing.get_context("spawn")) as executor:
+            scores = list(executor.map(scoreMaze, tasks, chunksize=chunkSize))
+    return max(scores, key=lambda score: (score[1] >= minPathLength, score))
@@ -0,0 +1,169 @@
+"""
+生成した迷路（WallGrid）を、ファイルにキャッシュする。
+
+迷路は、大きさ、生成の方法、seed が同じであれば、いつも同じになるので、その3つから作ったキーをファイル名にする。
+ファイルは、P_HEADER の16バイトのヘッダーの後に、WallGrid の bits をそのまま並べただけの形式で、1セルが1ビットである。
+読み込む時は、ファイルを mmap して、コピーせずにそのまま WallGrid の bits として使うので、大きな迷路でもすぐに使い始められる。
+
+LargeMaze が候補の中から選んだ迷路の seed も、P_CHOICE_SUFFIX のファイルに保存するので、同じ候補から選び直す時は、
+候補を生成して評価し直さずに、選んだ迷路だけを読み込める。
+
+ファイルの合計の大きさが maxBytes を超えたら、最後に使ってから一番時間が経ったファイルから削除する（LRU）。
+最後に使った時刻は、読み込むたびに更新するファイルの更新時刻で表す。
+"""
+import os, mmap, struct, hashlib
+from wallGrid import WallGrid
+from mazeGenerator import ALGORITHMS, generateMaze
+
+class MazeCache(object):
+    """
+    directory に、迷路のファイルをキャッシュする。directory が None の場合は getDefaultDirectory() を使う。
+    """
+    P_MAGIC = b"MZ03" # ファイルの先頭の4バイト。形式や、生成の方法の結果を変えた場合は変えて、古いファイルを使わないようにする
+    P_HEADER = struct.Struct("<4sIII") # P_MAGIC、width、height、rowBytes
+    P_SUFFIX = ".maze" # ファイル名の拡張子
+    P_CHOICE_SUFFIX = ".choice" # 候補の中から選んだ迷路の seed を保存するファイルの拡張子
+    P_MAX_BYTES = 32 * 1024 * 1024 # キャッシュのファイルの合計の大きさの上限
+
+    def __init__(self, directory=None, maxBytes=P_MAX_BYTES):
+        self.directory = MazeCache.getDefaultDirectory() if directory is None else directory
+        self.maxBytes = maxBytes
+        self.hitCount = 0 # キャッシュから読み込んだ回数
+        self.missCount = 0 # キャッシュになかった回数
+        self.evictedCount = 0 # 削除したファイルの数
+
+    @classmethod
+    def getDefaultDirectory(cls):
+        cacheHome = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cacheHome, "sense-hat-samples", "mazes")
+
+    def getKey(self, width, height, algorithm, seed):
+        text = "{}:{}:{}x{}:{}".format(MazeCache.P_MAGIC.decode("ascii"), algorithm, width, height, seed)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def getPath(self, width, height, algorithm, seed):
+        return os.path.join(self.directory, self.getKey(width, height, algorithm, seed) + MazeCache.P_SUFFIX)
+
+    def getChoicePath(self, width, height, algorithm, seeds, condition):
+        """
+        seeds の候補の中から選んだ迷路の seed を保存するファイルのパスを返す。condition は、ゴールの位置など、選び方を変える設定を表す文字列。
+        """
+        text = "{}:{}:{}x{}:{}-{}:{}".format(MazeCache.P_MAGIC.decode("ascii"), algorithm, width, height, seeds[0], seeds[-1], condition)
+        return os.path.join(self.directory, hashlib.sha1(text.encode("utf-8")).hexdigest() + MazeCache.P_CHOICE_SUFFIX)
+
+    def loadChoice(self, width, height, algorithm, seeds, condition):
+        """
+        保存してある、seeds の候補の中から選んだ迷路の seed を返す。ないか、壊れている場合は None を返す。
+        """
+        path = self.getChoicePath(width, height, algorithm, seeds, condition)
+        try:
+            with open(path) as f:
+                seed = int(f.read())
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path) # 最後に使った時刻を更新する
+        except OSError:
+            pass
+        return seed
+
+    def storeChoice(self, width, height, algorithm, seeds, condition, seed):
+        """
+        seeds の候補の中から選んだ迷路の seed を保存する。保存できなくても、次に選び直すだけなので、エラーにはしない。
+        """
+        path = self.getChoicePath(width, height, algorithm, seeds, condition)
+        temporaryPath = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporaryPath, "w") as f:
+                f.write(str(seed))
+            os.replace(temporaryPath, path)
+        except OSError as e:
+            print("Could not write the maze cache: {}".format(e))
+
+    def load(self, width, height, algorithm, seed):
+        """
+        キャッシュの迷路を mmap して、WallGrid を返す。ないか、壊れている場合は None を返す。
+        返す WallGrid に書き込んでも、ファイルは変わらない（mmap.ACCESS_COPY）。
+        """
+        path = self.getPath(width, height, algorithm, seed)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError): # 空のファイルは mmap できず、ValueError になる
+            self.missCount += 1
+            return None
+        header = MazeCache.P_HEADER
+        rowBytes = (width + 7) // 8
+        if len(data) != header.size + rowBytes * height or header.unpack_from(data) != (MazeCache.P_MAGIC, width, height, rowBytes):
+            data.close()
+            self.missCount += 1
+            return None
+        try:
+            os.utime(path) # 最後に使った時刻を更新する
+        except OSError:
+            pass
+        self.hitCount += 1
+        return WallGrid(width, height, memoryview(data)[header.size:], shareBits=True)
+
+    def store(self, grid, algorithm, seed):
+        """
+        grid をキャッシュに書き込み、合計の大きさが maxBytes を超えていたら、古いファイルを削除する。
+        書き込み中のファイルを読まないように、一時ファイルに書いてから名前を変える。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.getPath(grid.width, grid.height, algorithm, seed)
+        temporaryPath = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporaryPath, "wb") as f:
+            f.write(MazeCache.P_HEADER.pack(MazeCache.P_MAGIC, grid.width, grid.height, grid.rowBytes))
+            f.write(grid.bits)
+        os.replace(temporaryPath, path)
+        self.evict(path)
+
+    def evict(self, keepPath=None):
+        """
+        ファイルの合計の大きさが maxBytes 以下になるまで、更新時刻が古いファイルから削除する。keepPath は削除しない。
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith((MazeCache.P_SUFFIX, MazeCache.P_CHOICE_SUFFIX)):
+                path = os.path.join(self.directory, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, path))
+        totalBytes = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            if path == keepPath:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            totalBytes -= size
+            self.evictedCount += 1
+
+    def getGenerator(self, width, height, algorithm, seed, recordSteps=False):
+        """
+        迷路をキャッシュから読み込むか、なければ生成してキャッシュに書き込み、MazeGenerator を返す。迷路は、戻り値の grid に入っている。
+        recordSteps が True の場合は、生成の途中の変化が必要なので、キャッシュがあっても生成する。
+        キャッシュに書き込めない場合も、生成した迷路を返す。
+        """
+        if not recordSteps:
+            grid = self.load(width, height, algorithm, seed)
+            if grid is not None:
+                generator = ALGORITHMS[algorithm](width, height, seed=seed)
+                generator.grid = grid
+                return generator
+        generator = generateMaze(width, height, algorithm, recordSteps=recordSteps, seed=seed)
+        try:
+            self.store(generator.grid, algorithm, seed)
+        except OSError as e:
+            print("Could not write the maze cache: {}".format(e))
+        return generator
+
+    def getStatsText(self):
+        return "{} cache hits, {} misses, {} evicted".format(self.hitCount, self.missCount, self.evictedCount)
@@ -0,0 +1,466 @@
+"""
+迷路を生成する。LED への描画とは独立しているので、大きな迷路も、表示せずに短い時間で生成できる。
+
+迷路は横 width、縦 height のセルからなり（どちらも奇数）、生成した結果は grid（WallGrid）に入る。
+外周はすべて壁で、x と y が両方とも奇数のセルはすべて通路になる。
+生成の途中では、セルを WallGrid のインデックス（y * rowBits + x）で表し、grid.bits のビットを直接読み書きするか、
+方法に合わせた詰めた配列に持って、最後に1行ずつ grid に書き込む。
+
+生成の方法は ALGORITHMS から選べる。recordSteps を True にすると、生成の途中の変化を steps に記録するので、
+ゲームは生成した後に、生成する様子を再生して表示できる。
+seed を指定すると、その seed の random.Random で生成するので、同じ大きさ、方法、seed からは、いつも同じ迷路ができる。
+"""
+import sys, random
+from array import array
+from wallGrid import WallGrid
+
+class MazeGenerator(object):
+    """
+    迷路を生成するクラスの基底クラス。サブクラスは generate() を実装する。
+    """
+    name = None # ALGORITHMS のキー
+
+    P_RIGHT = 1 # writeRooms() の links の、右の部屋へ通じていることを表すビット
+    P_DOWN = 2 # writeRooms() の links の、下の部屋へ通じていることを表すビット
+
+    # 4方向（ビット d が方向 d）のうち進める方向のビットマスク m から、進める方向の数（directionCounts[m]）と、
+    # k 番目の方向（directionChoices[m * 4 + k]）を引く表。進める方向の配列を毎回作らずに、ランダムに1つを選べる
+    directionCounts = bytes(bin(m).count("1") for m in range(16))
+    directionChoices = bytes(([d for d in range(4) if m >> d & 1] + [0, 0, 0, 0])[k] for m in range(16) for k in range(4))
+
+    def __init__(self, width, height, rand=None, recordSteps=False, seed=None):
+        if width < 3 or height < 3 or width % 2 == 0 or height % 2 == 0:
+            raise ValueError("Maze width and height must be odd numbers of at least 3")
+        self.width = width
+        self.height = height
+        self.seed = seed # rand を作った seed。rand を直接渡した場合は None
+        if rand is None:
+            rand = random if seed is None else random.Random(seed)
+        self.rand = rand # random モジュールか random.Random のインスタンス
+        self.grid = WallGrid(width, height)
+        # 生成する前の grid のコピー。recordSteps が True の場合だけ、generate() で設定する
+        self.initialGrid = None
+        # 生成の途中の変化。1つの要素が1回の変化で、変化したセルの (x, y, 壁かどうか) のタプルのタプルである
+        self.steps = [] if recordSteps else None
+
+    def isWall(self, x, y):
+        return self.grid.isWall(x, y)
+
+    def startRecording(self):
+        if self.steps is not None:
+            self.initialGrid = self.grid.copy()
+
+    def record(self, cells):
+        """
+        1回の変化を記録する。cells は (x, y, 壁かどうか) のタプルの並び。
+        """
+        if self.steps is not None:
+            self.steps.append(tuple(cells))
+
+    def generate(self):
+        """
+        迷路を生成して、grid を返す。
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def getCellPosition(cls, room, paddedWidth):
+        """
+        部屋（x と y が両方とも奇数のセル）を詰めて、周りに1部屋の番兵を付けた配列のインデックスから、迷路のセルの (x, y) を返す。
+        """
+        return (room % paddedWidth) * 2 - 1, (room // paddedWidth) * 2 - 1
+
+    def writeRooms(self, links, first, stride):
+        """
+        部屋ごとに、右の部屋へ通じていればビット P_RIGHT、下の部屋へ通じていればビット P_DOWN を立てた配列 links を、1行ずつ grid に書き込む。
+        上から ry 番目の行の部屋は、links の first + ry * stride から、横に並んでいる部屋の数だけ並んでいる。
+        """
+        width = self.width
+        roomWidth = (width - 1) // 2
+        roomHeight = (self.height - 1) // 2
+        rightTable = bytes(0x30 if v & MazeGenerator.P_RIGHT else 0x31 for v in range(256))
+        downTable = bytes(0x30 if v & MazeGenerator.P_DOWN else 0x31 for v in range(256))
+        roomLine = bytearray(b"1") * width
+        roomLine[1::2] = b"0" * roomWidth
+        wallLine = bytearray(b"1") * width
+        for ry in range(roomHeight):
+            row = links[first + ry * stride : first + ry * stride + roomWidth]
+            roomLine[2 : width - 1 : 2] = row[:-1].translate(rightTable)
+            self.grid.setRowFromText(2 * ry + 1, roomLine)
+            if ry < roomHeight - 1:
+                wallLine[1::2] = row.translate(downTable)
+                self.grid.setRowFromText(2 * ry + 2, wallLine)
+
+
+class WallExtensionGenerator(MazeGenerator):
+    """
+    壁延ばし法。外周の柱（x と y が両方とも偶数のセル）から、ランダムに選んだ方向に、まだ壁でない柱まで壁を伸ばす。
+    伸ばした先の柱からも、同じように壁を伸ばす。
+    柱は、座標から計算できるインデックス (y // 2) * pillarWidth + x // 2 で表すので、柱を探す必要はない。
+    生成の途中では、柱ごとに、まだ壁でないかどうかを free に、右と下に壁を伸ばしたかどうかを pillars に持ち、最後に grid に書き込む。
+    free の後ろには番兵（壁の柱）を付けるので、外周の柱の外側を調べても、番兵か反対側の外周の柱（どちらも壁）を読むだけで、
+    迷路の外かどうかを調べなくてよい。
+    """
+    name = "wallExtension"
+
+    P_RIGHT = MazeGenerator.P_RIGHT # pillars の、柱から右の柱まで壁があることを表すビット
+    P_DOWN = MazeGenerator.P_DOWN # pillars の、柱から下の柱まで壁があることを表すビット
+
+    def getPillarIndex(self, x, y):
+        return (y // 2) * self.pillarWidth + x // 2
+
+    def getPillarPosition(self, index):
+        return (index % self.pillarWidth) * 2, (index // self.pillarWidth) * 2
+
+    def generate(self):
+        RIGHT = WallExtensionGenerator.P_RIGHT
+        DOWN = WallExtensionGenerator.P_DOWN
+        directionCounts = MazeGenerator.directionCounts
+        directionChoices = MazeGenerator.directionChoices
+        random = self.rand.random
+        recording = self.steps is not None
+        self.grid.fillBorder()
+        self.startRecording()
+        pillarWidth = self.pillarWidth = (self.width + 1) // 2 # 1行の柱の数
+        pillarHeight = (self.height + 1) // 2 # 1列の柱の数
+        pillarCount = pillarWidth * pillarHeight
+        offsets = (1, -1, pillarWidth, -pillarWidth) # 方向ごとの、柱のインデックスの差
+        linkBits = (RIGHT, RIGHT, DOWN, DOWN) # 方向ごとの、伸ばした壁を表す pillars のビット
+        # 柱がまだ壁でなければ 1。外周の柱と、後ろの pillarWidth + 1 個の番兵は壁である。
+        # 一番上の行の柱の上（負のインデックス）は、番兵を読む
+        free = bytearray(b"\x01") * pillarCount + bytes(pillarWidth + 1)
+        free[0:pillarWidth] = bytes(pillarWidth)
+        free[pillarCount - pillarWidth : pillarCount] = bytes(pillarWidth)
+        free[0:pillarCount:pillarWidth] = bytes(pillarHeight)
+        free[pillarWidth - 1 : pillarCount : pillarWidth] = bytes(pillarHeight)
+        # 外周に沿って右と下に壁がある
+        pillars = bytearray(pillarCount)
+        pillars[0:pillarWidth] = bytes([RIGHT]) * pillarWidth
+        pillars[pillarCount - pillarWidth:] = bytes([RIGHT]) * pillarWidth
+        for py in range(pillarHeight):
+            pillars[py * pillarWidth] |= DOWN
+            pillars[py * pillarWidth + pillarWidth - 1] = DOWN
+        pillars[pillarCount - 1] = 0
+        # 稼働中（壁を伸ばすことを検証すべき）の柱のインデックスの配列。先頭の workingCount 個が稼働中の柱である。
+        # 柱は、壁になってから稼働中になり、稼働中でなくなるまで再び加えられないので、柱の数より多くはならない。
+        # 順番に意味はないので、ランダムに選んだ要素は最後の要素と入れ替えて取り除き、O(1) で取り除く
+        workingPillars = array("i", range(pillarWidth))
+        for py in range(1, pillarHeight - 1):
+            workingPillars.append(py * pillarWidth)
+            workingPillars.append(py * pillarWidth + pillarWidth - 1)
+        workingPillars.extend(range(pillarCount - pillarWidth, pillarCount))
+        workingCount = len(workingPillars)
+        workingPillars.extend(bytes(pillarCount - workingCount)) # 0 で埋めて、柱の数まで広げる
+        while workingCount > 0:
+            i = int(random() * workingCount)
+            workingCount -= 1
+            index = workingPillars[i]
+            workingPillars[i] = workingPillars[workingCount]
+            # 壁を伸ばせる方向のビットマスク
+            possible = free[index + 1] | free[index - 1] << 1 | free[index + pillarWidth] << 2 | free[index - pillarWidth] << 3
+            if possible != 0:
+                count = directionCounts[possible]
+                direction = directionChoices[possible * 4 + int(random() * count)] if count > 1 else directionChoices[possible * 4]
+                reached = index + offsets[direction]
+                free[reached] = 0
+                # 伸ばした壁は、左か上の柱の、右か下に壁があるビットで表す
+                pillars[index if direction % 2 == 0 else reached] |= linkBits[direction]
+                # 到達した柱を、稼働中の柱として保存する
+                workingPillars[workingCount] = reached
+                workingCount += 1
+                # 到達する前の柱も、まだ稼働中の柱として保存する
+                if count >= 2:
+                    workingPillars[workingCount] = index
+                    workingCount += 1
+                if recording:
+                    x, y = self.getPillarPosition(index)
+                    x2, y2 = self.getPillarPosition(reached)
+                    self.record([(x, y, True), ((x + x2) // 2, (y + y2) // 2, True), (x2, y2, True)])
+            elif recording:
+                x, y = self.getPillarPosition(index)
+                self.record([(x, y, True)])
+        # free と pillars を、1行ずつ grid に書き込む
+        wallTable = bytes(0x30 if v else 0x31 for v in range(256))
+        rightTable = bytes(0x31 if v & RIGHT else 0x30 for v in range(256))
+        downTable = bytes(0x31 if v & DOWN else 0x30 for v in range(256))
+        pillarLine = bytearray(self.width)
+        aisleLine = bytearray(b"0") * self.width
+        for py in range(pillarHeight):
+            row = pillars[py * pillarWidth : (py + 1) * pillarWidth]
+            pillarLine[0::2] = free[py * pillarWidth : (py + 1) * pillarWidth].translate(wallTable)
+            pillarLine[1::2] = row[:-1].translate(rightTable)
+            self.grid.setRowFromText(2 * py, pillarLine)
+            if py < pillarHeight - 1:
+                aisleLine[0::2] = row.translate(downTable)
+                self.grid.setRowFromText(2 * py + 1, aisleLine)
+        return self.grid
+
+
+class RecursiveBacktrackerGenerator(MazeGenerator):
+    """
+    穴掘り法（再帰的バックトラック）。すべて壁の状態から、(1, 1) から始めて、まだ掘っていない隣のセルへランダムに掘り進み、
+    行き止まりになったら、掘り進める場所がある所まで戻る。再帰の代わりにスタックを使う。
+    分岐が少なく、長い通路の多い迷路になる。
+    生成の途中では、部屋ごとに、掘ったかどうかと、右と下へ掘ったかどうかを cells に持ち、最後に writeRooms() で grid に書き込む。
+    """
+    name = "recursiveBacktracker"
+
+    P_VISITED = 4 # cells の、セルを掘ったことを表すビット
+    P_RIGHT = MazeGenerator.P_RIGHT # cells の、セルから右のセルへ掘ったことを表すビット
+    P_DOWN = MazeGenerator.P_DOWN # cells の、セルから下のセルへ掘ったことを表すビット
+
+    def generate(self):
+        VISITED = RecursiveBacktrackerGenerator.P_VISITED
+        RIGHT = RecursiveBacktrackerGenerator.P_RIGHT
+        DOWN = RecursiveBacktrackerGenerator.P_DOWN
+        width = self.width
+        self.grid.fill()
+        self.startRecording()
+        randrange = self.rand.randrange
+        recording = self.steps is not None
+        # 通路のセルだけを詰めて、周りに 1 セルの番兵（掘ったことにしたセル）を付けた配列。
+        # 番兵があるので、隣が迷路の外かどうかを調べなくてよい
+        cellWidth = (width - 1) // 2
+        cellHeight = (self.height - 1) // 2
+        paddedWidth = cellWidth + 2
+        cells = bytearray([VISITED]) * (paddedWidth * (cellHeight + 2))
+        for cy in range(1, cellHeight + 1):
+            cells[cy * paddedWidth + 1 : cy * paddedWidth + 1 + cellWidth] = bytes(cellWidth)
+        cell = paddedWidth + 1
+        cells[cell] = VISITED
+        self.record([(1, 1, False)])
+        stack = [cell] # 再帰の代わりのスタック
+        while len(stack) > 0:
+            cell = stack[-1]
+            directions = []
+            if cells[cell + 1] == 0:
+                directions.append(0)
+            if cells[cell - 1] == 0:
+                directions.append(1)
+            if cells[cell + paddedWidth] == 0:
+                directions.append(2)
+            if cells[cell - paddedWidth] == 0:
+                directions.append(3)
+            if len(directions) == 0:
+                stack.pop()
+                continue
+            direction = directions[randrange(len(directions))] if len(directions) > 1 else directions[0]
+            # 掘った通路は、左か上のセルの、右か下へ掘ったビットで表す
+            if direction == 0:
+                cells[cell] |= RIGHT
+                cell += 1
+                cells[cell] = VISITED
+            elif direction == 1:
+                cell -= 1
+                cells[cell] = VISITED | RIGHT
+            elif direction == 2:
+                cells[cell] |= DOWN
+                cell += paddedWidth
+                cells[cell] = VISITED
+            else:
+                cell -= paddedWidth
+                cells[cell] = VISITED | DOWN
+            if recording:
+                x1, y1 = self.getCellPosition(stack[-1], paddedWidth)
+                x2, y2 = self.getCellPosition(cell, paddedWidth)
+                self.record([((x1 + x2) // 2, (y1 + y2) // 2, False), (x2, y2, False)])
+            stack.append(cell)
+        self.writeRooms(cells, paddedWidth + 1, paddedWidth)
+        return self.grid
+
+
+class KruskalGenerator(MazeGenerator):
+    """
+    クラスカル法。すべて壁の状態から、部屋の間の壁をランダムな順に調べ、
+    壁の両側の部屋がまだつながっていなければ、壁を取り除いてつなぐ。つながっているかどうかは Union-Find で調べる。
+    短い行き止まりの多い迷路になる。
+    部屋は MazeSolver と同じく (y // 2) * roomWidth + x // 2 で表し、Union-Find の親は、部屋の数だけの array に持つ。
+    壁は、左か上の部屋の番号の2倍に、右の壁なら 0、下の壁なら 1 を足した番号で表す。
+    壁の配列は、shuffleWalls() でまとめてランダムな順に並べ替えてから、順に調べる。
+    """
+    name = "kruskal"
+
+    P_SORT_MAX_WALLS = 1 << 24 # shuffleWalls() で、ソートして並べ替えられる壁の数の上限（壁の番号が3バイトに収まる数）
+
+    def shuffleWalls(self, walls):
+        """
+        walls（壁の番号の array("i")）を、ランダムな順に並べ替えた array を返す。
+        random.shuffle() は1要素ごとに Python の処理を行うので遅い。代わりに、下位3バイトが壁の番号で、上位28ビットがランダムな
+        2**52 以上 2**53 未満の浮動小数点数の配列を、バイト列のスライスの代入だけで作り、C で実装された list.sort() で並べ替える。
+        ランダムな部分が等しい壁は番号の順になるが、1001 x 1001 の迷路（約50万の壁）でも数百組しかない。
+        ソートできない（壁が多すぎるか、バイト順が異なる）場合は、random.shuffle() を使う。
+        """
+        count = len(walls)
+        if count >= KruskalGenerator.P_SORT_MAX_WALLS or sys.byteorder != "little" or walls.itemsize != 4:
+            walls = array("i", walls)
+            self.rand.shuffle(walls)
+            return walls
+        wallBytes = walls.tobytes()
+        randomBytes = self.rand.randbytes(4 * count)
+        keys = bytearray(8 * count)
+        for k in range(3):
+            keys[k::8] = wallBytes[k::4]
+            keys[3 + k::8] = randomBytes[k::4]
+        # 7バイト目の上位4ビットと8バイト目は、指数部（2**52 以上 2**53 未満を表す 0x433）
+        keys[6::8] = randomBytes[3::4].translate(bytes(0x30 | (v & 0x0F) for v in range(256)))
+        keys[7::8] = b"\x43" * count
+        sortedKeys = array("d", keys).tolist()
+        sortedKeys.sort()
+        sortedBytes = array("d", sortedKeys).tobytes()
+        shuffled = bytearray(4 * count)
+        for k in range(3):
+            shuffled[k::4] = sortedBytes[k::8]
+        return array("i", shuffled)
+
+    def generate(self):
+        RIGHT = MazeGenerator.P_RIGHT
+        recording = self.steps is not None
+        self.grid.fill()
+        self.startRecording()
+        roomWidth = (self.width - 1) // 2 # 1行の部屋の数
+        roomHeight = (self.height - 1) // 2 # 1列の部屋の数
+        roomCount = roomWidth * roomHeight
+        parents = array("i", range(roomCount)) # Union-Find の親
+        sizes = array("i", [1]) * roomCount # Union-Find の、根の部屋の木に含まれる部屋の数
+        links = bytearray(roomCount) # writeRooms() に渡す、部屋ごとの右と下へ通じているかどうか
+        offsets = (1, roomWidth) # 右の壁と下の壁の、反対側の部屋の番号の差
+        # 取り除く候補の壁。右端の部屋の右と、一番下の行の部屋の下は外周なので除く
+        walls = array("i")
+        for ry in range(roomHeight):
+            first = ry * roomWidth
+            walls.extend(range(first * 2, (first + roomWidth - 1) * 2, 2))
+            if ry < roomHeight - 1:
+                walls.extend(range(first * 2 + 1, (first + roomWidth) * 2, 2))
+        if recording:
+            self.record([(x, y, False) for y in range(1, self.height - 1, 2) for x in range(1, self.width - 1, 2)])
+        linkCount = roomCount - 1 # すべての部屋がつながるまでに取り除く壁の数。取り除き終わったら、残りの壁は調べなくてよい
+        for wall in self.shuffleWalls(walls):
+            if linkCount == 0:
+                break
+            room = wall >> 1
+            # 経路を半分に縮めながら根を探す
+            a = room
+            parent = parents[a]
+            while parent != a:
+                grandparent = parents[parent]
+                parents[a] = grandparent
+                a = grandparent
+                parent = parents[a]
+            b = room + offsets[wall & 1]
+            parent = parents[b]
+            while parent != b:
+                grandparent = parents[parent]
+                parents[b] = grandparent
+                b = grandparent
+                parent = parents[b]
+            if a != b:
+                # 小さい方の木を、大きい方の木につなぐので、木が低くなり、根を探す回数が減る
+                if sizes[a] > sizes[b]:
+                    parents[b] = a
+                    sizes[a] += sizes[b]
+                else:
+                    parents[a] = b
+                    sizes[b] += sizes[a]
+                linkCount -= 1
+                links[room] |= RIGHT << (wall & 1) # 右の壁なら P_RIGHT、下の壁なら P_DOWN
+                if recording:
+                    x = (room % roomWidth) * 2 + 1
+                    y = (room // roomWidth) * 2 + 1
+                    self.record([(x + 1, y, False) if wall & 1 == 0 else (x, y + 1, False)])
+        self.writeRooms(links, 0, roomWidth)
+        return self.grid
+
+
+class WilsonGenerator(MazeGenerator):
+    """
+    ウィルソン法。迷路に含まれていないセルからランダムウォークし、迷路に含まれているセルに着いたら、
+    ループを取り除いた経路を迷路に加える。すべての迷路が同じ確率で生成される（偏りのない）方法である。
+    部屋だけを詰めて、周りに1部屋の番兵を付けた配列 states で、部屋が迷路に含まれているかどうかを持つ。
+    ランダムウォークは、4方向から1つを選び、番兵（迷路の外）を選んだら選び直すので、隣が迷路の外かどうかを調べなくてよい。
+    """
+    name = "wilson"
+
+    P_OUTSIDE = 2 # states の、番兵（迷路の外）を表す値
+    P_IN_MAZE = 1 # states の、迷路に含まれている部屋を表す値
+
+    def generate(self):
+        OUTSIDE = WilsonGenerator.P_OUTSIDE
+        IN_MAZE = WilsonGenerator.P_IN_MAZE
+        RIGHT = MazeGenerator.P_RIGHT
+        DOWN = MazeGenerator.P_DOWN
+        self.grid.fill()
+        self.startRecording()
+        getrandbits = self.rand.getrandbits
+        recording = self.steps is not None
+        roomWidth = (self.width - 1) // 2
+        roomHeight = (self.height - 1) // 2
+        paddedWidth = roomWidth + 2
+        states = bytearray([OUTSIDE]) * (paddedWidth * (roomHeight + 2))
+        for ry in range(1, roomHeight + 1):
+            states[ry * paddedWidth + 1 : ry * paddedWidth + 1 + roomWidth] = bytes(roomWidth)
+        links = bytearray(len(states)) # writeRooms() に渡す、部屋ごとの右と下へ通じているかどうか
+        nextRooms = array("i", bytes(4 * len(states))) # ランダムウォーク中の、部屋から次に進んだ部屋。ループは上書きされて消える
+        offsets = (1, -1, paddedWidth, -paddedWidth)
+        rooms = [ry * paddedWidth + rx for ry in range(1, roomHeight + 1) for rx in range(1, roomWidth + 1)]
+        first = rooms[self.rand.randrange(len(rooms))]
+        states[first] = IN_MAZE
+        self.record([self.getCellPosition(first, paddedWidth) + (False,)])
+        for start in rooms:
+            if states[start] != 0:
+                continue
+            # 迷路に含まれている部屋に着くまで、ランダムウォークする
+            room = start
+            while True:
+                nextRoom = room + offsets[getrandbits(2)]
+                state = states[nextRoom]
+                if state == OUTSIDE:
+                    continue
+                nextRooms[room] = nextRoom
+                room = nextRoom
+                if state == IN_MAZE:
+                    break
+            # ループを取り除いた経路を、迷路に加える
+            changed = []
+            room = start
+            while states[room] == 0:
+                nextRoom = nextRooms[room]
+                states[room] = IN_MAZE
+                # つないだ通路は、左か上の部屋の、右か下へ通じているビットで表す
+                offset = nextRoom - room
+                if offset == 1:
+                    links[room] |= RIGHT
+                elif offset == -1:
+                    links[nextRoom] |= RIGHT
+                elif offset > 0:
+                    links[room] |= DOWN
+                else:
+                    links[nextRoom] |= DOWN
+                if recording:
+                    x1, y1 = self.getCellPosition(room, paddedWidth)
+                    x2, y2 = self.getCellPosition(nextRoom, paddedWidth)
+                    changed.append((x1, y1, False))
+                    changed.append(((x1 + x2) // 2, (y1 + y2) // 2, False))
+                room = nextRoom
+            self.record(changed)
+        self.writeRooms(links, paddedWidth + 1, paddedWidth)
+        return self.grid
+
+
+ALGORITHMS = {generatorClass.name: generatorClass for generatorClass in [WallExtensionGenerator, RecursiveBacktrackerGenerator, KruskalGenerator, WilsonGenerator]}
+
+SEED_BITS = 32 # newSeed() が返す seed のビット数
+
+def newSeed(rand=random):
+    """
+    新しい迷路の seed を返す。表示や記録をして、後で同じ迷路を作り直すのに使える。
+    """
+    return rand.getrandbits(SEED_BITS)
+
+def generateMaze(width, height, algorithm=WallExtensionGenerator.name, rand=None, recordSteps=False, seed=None):
+    """
+    迷路を生成して、生成に使った MazeGenerator を返す。迷路は、戻り値の grid に入っている。
+    seed を指定した場合は、rand の代わりに random.Random(seed) を使う。
+    """
+    generator = ALGORITHMS[algorithm](width, height, rand, recordSteps, seed)
+    generator.generate()
+    return generator
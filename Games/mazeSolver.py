@@ -0,0 +1,151 @@
+"""
+mazeGenerator で生成した迷路（WallGrid）を解く。
+
+x と y が両方とも奇数のセル（部屋）だけを頂点とし、部屋の間の通路のセルを辺とするグラフで、ゴールから幅優先探索をして、
+すべての部屋のゴールまでの距離（距離の場）を1回で求める。部屋の数は迷路のセルの数の 1/4 なので、
+すべてのセルを探索するよりも速く、距離の場も小さい。距離の場は、部屋の数が 65535 未満であれば uint16（array の "H"）、
+それ以上であれば uint32（"I"）の配列で持つ。
+
+求めた距離の場から、どのセルについても、ゴールまでの距離（セルの数）、ゴールへ向かう次のセル、ゴールまでの道のりが分かるので、
+ヒントの表示や、迷路の難しさの評価、道のりの短い迷路の除外に使える。
+"""
+from array import array
+
+class MazeSolver(object):
+    """
+    ゴール (goalX, goalY) までの距離の場を求める。ゴールは部屋（x と y が両方とも奇数のセル）であること。
+    """
+    P_DEAD_END_WEIGHT = 2 # getDifficulty() で、行き止まり1つを道のりの何セル分と数えるか
+
+    def __init__(self, grid, goalX, goalY):
+        if goalX % 2 == 0 or goalY % 2 == 0 or not (0 < goalX < grid.width and 0 < goalY < grid.height):
+            raise ValueError("The goal must be a room, at odd coordinates inside the maze")
+        self.grid = grid
+        self.goalX = goalX
+        self.goalY = goalY
+        self.roomWidth = (grid.width - 1) // 2 # 1行の部屋の数
+        self.roomHeight = (grid.height - 1) // 2 # 1列の部屋の数
+        roomCount = self.roomWidth * self.roomHeight
+        self.typecode = "H" if roomCount < 0xFFFF else "I"
+        self.UNREACHED = 0xFFFF if self.typecode == "H" else 0xFFFFFFFF # まだ探索していない部屋の距離
+        self.links = self.getLinks()
+        self.distances = self.getDistances()
+
+    def getRoomIndex(self, x, y):
+        return (y // 2) * self.roomWidth + x // 2
+
+    def getLinks(self):
+        """
+        部屋ごとに、右の部屋へ通じていればビット 1、下の部屋へ通じていればビット 2 を立てた bytearray を返す。
+        WallGrid の行を文字列にして、1行ずつまとめて変換する。
+        """
+        grid = self.grid
+        roomWidth = self.roomWidth
+        rightTable = bytes(1 if c == 0x30 else 0 for c in range(256)) # 通路（b"0"）であれば 1
+        downTable = bytes(2 if c == 0x30 else 0 for c in range(256)) # 通路（b"0"）であれば 2
+        links = bytearray(roomWidth * self.roomHeight)
+        rights = bytearray(roomWidth)
+        for ry in range(self.roomHeight):
+            roomLine = grid.getRowText(2 * ry + 1)
+            wallLine = grid.getRowText(2 * ry + 2)
+            rights[0 : roomWidth - 1] = roomLine[2 : grid.width - 1 : 2].translate(rightTable)
+            downs = wallLine[1 : grid.width - 1 : 2].translate(downTable) if ry < self.roomHeight - 1 else bytes(roomWidth)
+            links[ry * roomWidth : (ry + 1) * roomWidth] = (int.from_bytes(rights, "little") | int.from_bytes(downs, "little")).to_bytes(roomWidth, "little")
+        return links
+
+    def getDistances(self):
+        """
+        ゴールの部屋から幅優先探索をして、各部屋のゴールまでの距離（部屋の数）の配列を返す。たどり着けない部屋は UNREACHED である。
+        """
+        roomWidth = self.roomWidth
+        links = self.links
+        UNREACHED = self.UNREACHED
+        distances = array(self.typecode, [UNREACHED]) * len(links)
+        goal = self.getRoomIndex(self.goalX, self.goalY)
+        distances[goal] = 0
+        queue = [goal] # for 文で読みながら、後ろに追加していく
+        for room in queue:
+            distance = distances[room] + 1
+            link = links[room]
+            if link & 1 and distances[room + 1] == UNREACHED:
+                distances[room + 1] = distance
+                queue.append(room + 1)
+            if link & 2 and distances[room + roomWidth] == UNREACHED:
+                distances[room + roomWidth] = distance
+                queue.append(room + roomWidth)
+            # 左端の部屋の左は、前の行の右端の部屋の右で、いつも壁なので、行をまたいでも間違えない
+            if room > 0 and links[room - 1] & 1 and distances[room - 1] == UNREACHED:
+                distances[room - 1] = distance
+                queue.append(room - 1)
+            if room >= roomWidth and links[room - roomWidth] & 2 and distances[room - roomWidth] == UNREACHED:
+                distances[room - roomWidth] = distance
+                queue.append(room - roomWidth)
+        self.reachedRoomCount = len(queue)
+        return distances
+
+    def getDistance(self, x, y):
+        """
+        セル (x, y) からゴールまでの距離（セルの数）を返す。壁のセルや、たどり着けないセルの場合は None を返す。
+        """
+        if self.grid.isWall(x, y):
+            return None
+        if x % 2 == 1 and y % 2 == 1:
+            distance = self.distances[self.getRoomIndex(x, y)]
+            return None if distance == self.UNREACHED else distance * 2
+        # 部屋の間の通路のセルは、両側の部屋のうちゴールに近い方より 1 遠い
+        if x % 2 == 0:
+            distances = [self.getDistance(x - 1, y), self.getDistance(x + 1, y)]
+        else:
+            distances = [self.getDistance(x, y - 1), self.getDistance(x, y + 1)]
+        distances = [distance for distance in distances if distance is not None]
+        return min(distances) + 1 if len(distances) > 0 else None
+
+    def getNextStep(self, x, y):
+        """
+        セル (x, y) から、ゴールへ向かって1つ進んだセルの (x, y) を返す。ゴールかたどり着けないセルの場合は None を返す。
+        """
+        distance = self.getDistance(x, y)
+        if distance is None or distance == 0:
+            return None
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if self.getDistance(nx, ny) == distance - 1:
+                return nx, ny
+        return None
+
+    def getPath(self, x, y, maxLength=None):
+        """
+        セル (x, y) の次のセルからゴールまでの道のりの、セルの (x, y) のリストを返す。maxLength を指定した場合は、その数までのセルを返す。
+        """
+        path = []
+        step = self.getNextStep(x, y)
+        while step is not None and (maxLength is None or len(path) < maxLength):
+            path.append(step)
+            step = self.getNextStep(*step)
+        return path
+
+    def countDeadEnds(self):
+        """
+        行き止まり（1方向にしか通じていない部屋）の数を返す。
+        各部屋の通じている方向の数を、右と下（自分の links）、左（左の部屋の右）、上（上の部屋の下）の数の和として、
+        1バイトに1部屋の整数の足し算でまとめて求める。和は 4 以下なので、隣のバイトに繰り上がらない。
+        """
+        roomWidth = self.roomWidth
+        links = self.links
+        ownTable = bytes((c & 1) + (c >> 1 & 1) for c in range(256))
+        rightTable = bytes(c & 1 for c in range(256))
+        downTable = bytes(c >> 1 & 1 for c in range(256))
+        own = int.from_bytes(links.translate(ownTable), "little")
+        # 左端の部屋の左は、前の行の右端の部屋の右で、いつも壁なので、行をまたいでも間違えない
+        left = int.from_bytes(b"\x00" + links[:-1].translate(rightTable), "little")
+        up = int.from_bytes(bytes(roomWidth) + links[:-roomWidth].translate(downTable), "little")
+        return (own + left + up).to_bytes(len(links), "little").count(1)
+
+    def getDifficulty(self, startX, startY):
+        """
+        スタート (startX, startY) から解く場合の迷路の難しさを返す。
+        ゴールまでの道のりのセルの数に、行き止まりの数に P_DEAD_END_WEIGHT を掛けたものを足す。たどり着けない場合は None を返す。
+        """
+        distance = self.getDistance(startX, startY)
+        if distance is None:
+            return None
+        return distance + self.countDeadEnds() * MazeSolver.P_DEAD_END_WEIGHT
@@ -1,40 +1,128 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-from ball import Ball
-from paint import Paint
-from maze import Maze
-from largeMaze import LargeMaze
-from alien import Alien
-from sensors import Sensors
-from rgb import RGB
-from wave import Wave
-from daruma import Daruma
-from pendulum import Pendulum
-from rhythm import Rhythm
-from space import Space
-import time, copy
+import time, copy, colorsys, importlib, threading
+from indexedScreen import Palette, Screen
+from frameBuffer import FrameBuffer
+from eventQueue import EventQueue
+from asyncRuntime import GameRuntime
+
+class MenuItem(object):
+    """
+    メニュー項目。ゲームの名前とメニューに表示する 6 x 2 ピクセルだけを持つ。
+    ゲームのモジュールは、load() が呼ばれるまで import しない。
+    NumPy などを使うゲームのモジュールの読み込みには時間がかかるので、メニューの最初の表示を遅らせないためである。
+    """
+
+    def __init__(self, moduleName, className, menuItemPixels):
+        self.moduleName = moduleName
+        self.className = className
+        self.menuItemPixels = menuItemPixels # ゲームのクラスの getMenuItemPixels() と同じもの
+        self.gameClass = None
+        self.lock = threading.Lock() # メニューのスレッドと、先読みのスレッドが同時に読み込まないようにする
+
+    def getName(self):
+        return self.className
+
+    def getMenuItemPixels(self):
+        return self.menuItemPixels
+
+    def isLoaded(self):
+        return self.gameClass is not None
+
+    def load(self):
+        """
+        ゲームのモジュールを import して、ゲームのクラスを返す。
+        """
+        with self.lock:
+            if self.gameClass is None:
+                self.gameClass = getattr(importlib.import_module(self.moduleName), self.className)
+        return self.gameClass
+
 
 class Menu:
     """
     メニューを提供する。
     上下ジョイスティックでメニュー項目を選択、右か真ん中を押してそれを実行する。
     左を長押ししたら、LED を消して終了する。
+    ゲームのモジュールは、選択されて実行する時に読み込む。
+    warmUp が True の場合は、メニューを表示している間に、バックグラウンドのスレッドで先に読み込んでおく。
+    表示する画面は、起動時にすべてのスクロール位置とカーソルの位置の組み合わせについて作っておくので、
+    各フレームでは画面を選んで書き込むだけであり、メニュー項目の数が増えても1フレームの処理は変わらない。
+    ジョイスティックのイベントはキューに入れ、メニューのループは、イベントが届くか、
+    カーソルの点滅やスクロールで次に画面が変わる時刻まで眠る。イベントが届いたらすぐに画面を書き換える。
     """
-    MENUITEMS = [Maze, LargeMaze, Ball, Paint, Wave, Sensors, Daruma, RGB, Alien, Pendulum, Rhythm, Space]
+    P_SCROLL_STEP_TIME = 0.1 # カーソルのスクロールで、1行動かすごとの時間（秒）
+    P_BLINK_PERIOD = 1.0 # カーソルの点滅の周期（秒）
+    P_BLINK_ON_TIME = 0.8 # 点滅の周期のうち、カーソルを表示している時間（秒）
+    P_WAKE_MARGIN = 0.001 # 点滅の切り替わりの時刻を確実に過ぎてから起きるための余裕（秒）
 
     green = G = [0, 255, 0]
     red = R = [255, 0, 0]
+    blue = B = [0, 0, 255]
+    cyan = C = [0, 255, 255]
+    yellow = Y = [255, 255, 0]
+    pink = K = [255, 130, 147]
+    orange = A = [239, 129, 15]
+    gray = GR = [100, 100, 100]
+    dark_cyan = D = [0, 80, 80]
+    dark_red = DR = [102, 0, 0]
     black = O = [0, 0, 0]
     white = W = [255, 255, 255]
     cursor_color = red
 
+    # 各ゲームのクラスの menuItemPixels と同じ色を、ゲームのモジュールを読み込まずに表示するために持っておく
+    MENUITEMS = [
+        MenuItem("maze", "Maze", [
+            R, W, GR, GR, GR, W,
+            GR, GR, GR, W, GR, B]),
+        MenuItem("largeMaze", "LargeMaze", [
+            R, GR, GR, W, GR, GR,
+            W, W, GR, GR, GR, W]),
+        MenuItem("ball", "Ball", [
+            R, R, G, G, R, R,
+            R, R, G, G, R, R]),
+        MenuItem("paint", "Paint", [
+            O, D, G, G, D, D,
+            D, D, G, G, D, O]),
+        MenuItem("wave", "Wave", [
+            tuple(int(c * 255) for c in colorsys.hsv_to_rgb((x + y * 2.5) / (2 * 6) + 0.5, 1.0, 1.0)) for y in range(2) for x in range(6)]),
+        MenuItem("sensors", "Sensors", [
+            K, G, O, B, R, O,
+            K, G, Y, B, R, C]),
+        MenuItem("daruma", "Daruma", [
+            R, Y, Y, Y, Y, R,
+            Y, R, Y, Y, R, Y]),
+        MenuItem("rgb", "RGB", [
+            R, G, B, O, W, W,
+            R, G, B, O, W, W]),
+        MenuItem("alien", "Alien", [
+            W, W, R, R, W, W,
+            W, W, R, R, W, W]),
+        MenuItem("pendulum", "Pendulum", [
+            GR, GR, R, R, GR, GR,
+            GR, GR, R, R, GR, GR]),
+        MenuItem("rhythm", "Rhythm", [
+            C, DR, DR, DR, DR, C,
+            O, O, R, R, O, O]),
+        MenuItem("space", "Space", [
+            C, GR, GR, Y, Y, GR,
+            GR, GR, A, A, GR, C]),
+    ]
+
     normal_screen_row = [
     O, O, O, O, O, O, O, O
     ]
 
-    def __init__(self, sense):
+    def __init__(self, sense, warmUp=True, menuItems=None):
         # print("In init")
         self.sense = sense
-        self.menuItems = Menu.MENUITEMS
+        self.menuItems = Menu.MENUITEMS if menuItems is None else menuItems # プラグインなどの項目を追加する場合は menuItems に渡す
+        self.frameBuffer = FrameBuffer(sense)
+        self.palette = Palette([Menu.O, Menu.cursor_color])
+        self.frameCache = [] # スクロール位置ごとの画面の配列。[カーソルなし, 0 行目にカーソル, ..., 6 行目にカーソル] の Screen の配列
+        self.frameCacheSeconds = None # frameCache を作るのにかかった秒数
+        self.warmUp = warmUp
+        self.warmUpThread = None
+        self.firstFrameTime = None # run() を呼んでから、最初のメニューの画面を表示するまでの秒数
         self.selectedItemIndex = 0
         self.itemRunning = False
         self.runningItemindex = -1
@@ -43,13 +131,21 @@ class Menu:
         self.currentCursorRow = 0
         self.cursorScrolling = False
         self.shouldExit = False
+        self.eventQueue = EventQueue()
+        self.runtime = GameRuntime(sense)
     
     @classmethod
     def getName(cls):
         return cls.__name__
 
     def joystick_any(self, event):
+        """
+        ジョイスティックのスレッドから呼ばれるので、イベントをキューに入れるだけにする。
+        """
         #print("joystick_any in " + self.__class__.__name__)
+        self.eventQueue.put(event)
+
+    def handleJoystickEvent(self, event):
         if not self.cursorScrolling and not self.shouldExit:
             if (event.direction == DIRECTION_MIDDLE and event.action == ACTION_RELEASED) or (event.direction == DIRECTION_RIGHT and event.action == ACTION_RELEASED):
                 self.startItem(self.selectedItemIndex)
@@ -78,18 +174,38 @@ class Menu:
         menuItemName = self.menuItems[index].getName()
         print("Starting " + menuItemName)
         # Run
-        (self.menuItems[self.runningItemindex](self.sense)).run()
+        # ゲームは GameRuntime で実行するので、ボタンを離したらスクロール中の文字の表示も途中で終わり、すぐにメニューに戻る
+        self.runtime.run(self.menuItems[self.runningItemindex].load())
         self.itemRunning = False
         self.runningItemindex = -1
         print("Finished " + menuItemName)
 
+    def warmUpItems(self):
+        """
+        選択されている項目から順に、まだ読み込んでいないゲームのモジュールを読み込む。
+        読み込みに失敗した場合は、そのゲームを実行する時にもう一度読み込むので、そこでエラーが表示される。
+        """
+        start = self.selectedItemIndex
+        for i in range(len(self.menuItems)):
+            if self.shouldExit:
+                break
+            try:
+                self.menuItems[(start + i) % len(self.menuItems)].load()
+            except Exception:
+                pass
+
+    def startWarmUp(self):
+        if self.warmUp and self.warmUpThread is None:
+            self.warmUpThread = threading.Thread(target=self.warmUpItems, name=self.__class__.__name__ + "WarmUp", daemon=True)
+            self.warmUpThread.start()
+
     def getAllMenuPixels(self):
         """ 
         Return 8 x (8+) pixels for all of menu items
         """
         screen_all = []
         screen_row = copy.copy(Menu.normal_screen_row) # 8 x 1 pixels
-        for i in range(len(Menu.MENUITEMS)):
+        for i in range(len(self.menuItems)):
             screen_all.extend(copy.copy(screen_row)) # 1st row
             screen_all.extend(copy.copy(screen_row)) # 2nd row
             itemPixels = self.menuItems[i].getMenuItemPixels()
@@ -97,25 +213,73 @@ class Menu:
             for n in range(6):
                 screen_all[i * 8 * 3 + 2 + n] = itemPixels[n]
                 screen_all[i * 8 * 3 + 8 + 2 + n] = itemPixels[6 + n]
-            if i != len(Menu.MENUITEMS) - 1:
+            if i != len(self.menuItems) - 1:
                 screen_all.extend(copy.copy(screen_row)) # 3rd row for margin 
         return screen_all
 
+    def buildFrameCache(self):
+        """
+        すべてのスクロール位置について、カーソルなしの画面と、各行にカーソルがある画面を作って self.frameCache に入れる。
+        カーソルは2行分なので、画面の 0 行目から 6 行目までのどこかにある。
+        """
+        startTime = time.perf_counter()
+        strip = bytearray(self.palette.getIndex(color) for color in self.allMenuPixels)
+        if len(strip) < 64:
+            strip.extend(bytes(64 - len(strip))) # 項目が少なくても、1画面分はあるようにする
+        cursor = self.palette.getIndex(Menu.cursor_color)
+        self.frameCache = []
+        for scroll in range(len(strip) // 8 - 8 + 1):
+            window = strip[scroll * 8 : scroll * 8 + 64]
+            frames = [Screen(self.palette, window)]
+            for row in range(7):
+                screen = Screen(self.palette, window)
+                screen[row * 8] = cursor
+                screen[row * 8 + 8] = cursor
+                frames.append(screen)
+            self.frameCache.append(frames)
+        self.frameCacheSeconds = time.perf_counter() - startTime
+
+    def getFrame(self, scroll, cursorRow=None):
+        """
+        スクロール位置 scroll で、cursorRow 行目（メニュー全体での行）にカーソルがある画面を返す。
+        cursorRow が None の時は、カーソルなしの画面を返す。
+        """
+        frames = self.frameCache[scroll]
+        if cursorRow is None:
+            return frames[0]
+        row = cursorRow - scroll
+        if 0 <= row <= 6:
+            return frames[row + 1]
+        # 画面の外にカーソルがある場合。スクロールの処理では起こらないはずだが、念のため
+        return frames[0]
+
     def getCurrentMenuPixels(self):
         """ 
         Return 8 x 8 pixels to show current menu screen
         """
-        screen = copy.copy(self.allMenuPixels[self.currentScroll * 8: self.currentScroll * 8 + 8 * 8])
+        return self.getFrame(self.currentScroll)
+
+    def stepCursorScrolling(self):
+        """
+        スクロール中のカーソルを1行動かし、その画面を返す。
+        """
+        cursorScrollDirection = DIRECTION_DOWN if self.selectedItemIndex * 3 > self.currentCursorRow else DIRECTION_UP
+        if cursorScrollDirection == DIRECTION_DOWN:
+            self.currentCursorRow += 1
+        else:
+            self.currentCursorRow -= 1
+        screen = self.getScreenDuringCursorScrolling(cursorScrollDirection)
+        # print(self.selectedItemIndex, self.currentCursorRow, self.currentScroll)
+        if self.selectedItemIndex * 3 == self.currentCursorRow:
+            self.cursorScrolling = False
         return screen
 
     def getScreenDuringCursorScrolling(self, cursorScrollDirection):
         """ 
-        カーソル スクロール中の画面用の 8 x 8 ピクセルの配列を返す
+        カーソル スクロール中の画面（Screen）を返す
         """
 
-        screen = self.getCurrentMenuPixels()
-        screen[self.currentCursorRow * 8 - self.currentScroll * 8 + 0] = Menu.cursor_color
-        screen[self.currentCursorRow * 8 - self.currentScroll * 8 + 8] = Menu.cursor_color
+        screen = self.getFrame(self.currentScroll, self.currentCursorRow)
 
         if cursorScrollDirection == DIRECTION_DOWN:
             # print("self.selectedItemIndex * 3 - self.currentScroll:", self.selectedItemIndex * 3 - self.currentScroll)
@@ -137,39 +301,57 @@ class Menu:
 
     def run(self):
         print(self.__class__.__name__ + " is running")
+        runTime = time.monotonic()
         self.allMenuPixels = self.getAllMenuPixels()
+        self.buildFrameCache()
+        print("{} frames of {} items prepared in {:.3f} seconds".format(len(self.frameCache) * 8, len(self.menuItems), self.frameCacheSeconds))
         pre_time = time.monotonic()
         while not self.shouldExit:
             # print("In run() in Menu")
             self.sense.stick.direction_any = self.joystick_any
+            self.frameBuffer.invalidate() # ゲームが画面を書き換えているので、画面全体を書き込み直す
+            self.eventQueue.clear() # ゲームの実行中に届いたイベントは捨てる
+            lastScreen = None
+            screen = None
+            holdUntil = 0.0 # スクロール中の画面を、この時刻まで表示し続ける
             while not self.itemRunning and not self.shouldExit:
-                screen = []
-                if self.cursorScrolling:
-                    cursorScrollDirection = DIRECTION_DOWN if self.selectedItemIndex * 3 > self.currentCursorRow else DIRECTION_UP
-                    if cursorScrollDirection == DIRECTION_DOWN:
-                        self.currentCursorRow += 1
+                now = time.monotonic()
+                if now >= holdUntil:
+                    if self.cursorScrolling:
+                        screen = self.stepCursorScrolling()
+                        holdUntil = deadline = now + Menu.P_SCROLL_STEP_TIME
                     else:
-                        self.currentCursorRow -= 1
-                    screen = self.getScreenDuringCursorScrolling(cursorScrollDirection)
-                    # print(self.selectedItemIndex, self.currentCursorRow, self.currentScroll)
-                    if self.selectedItemIndex * 3 == self.currentCursorRow:
-                        self.cursorScrolling = False
+                        subsecond = (now - pre_time) % Menu.P_BLINK_PERIOD
+                        if subsecond < Menu.P_BLINK_ON_TIME:
+                            screen = self.getFrame(self.currentScroll, self.selectedItemIndex * 3)
+                            deadline = now + Menu.P_BLINK_ON_TIME - subsecond + Menu.P_WAKE_MARGIN
+                        else:
+                            screen = self.getFrame(self.currentScroll)
+                            deadline = now + Menu.P_BLINK_PERIOD - subsecond + Menu.P_WAKE_MARGIN
                 else:
-                    subsecond = (time.monotonic() - pre_time) % 1
-                    screen = self.getCurrentMenuPixels()
-                    if subsecond < 0.8:
-                        screen[self.selectedItemIndex * 8 * 3 - self.currentScroll * 8 + 0] = Menu.cursor_color
-                        screen[self.selectedItemIndex * 8 * 3 - self.currentScroll * 8 + 8] = Menu.cursor_color
-                    else:
-                        screen[self.selectedItemIndex * 8 * 3 - self.currentScroll * 8 + 0] = Menu.O
-                        screen[self.selectedItemIndex * 8 * 3 - self.currentScroll * 8 + 8] = Menu.O
+                    deadline = holdUntil
+
+                if screen is not lastScreen: # あらかじめ作った画面なので、同一性だけで比較できる
+                    self.frameBuffer.set_pixels(screen)
+                    self.frameBuffer.flush() # 点滅などで変化したピクセルだけが書き込まれる
+                    lastScreen = screen
+                if self.firstFrameTime is None:
+                    self.firstFrameTime = time.monotonic() - runTime
+                    print("First menu frame in {:.3f} seconds".format(self.firstFrameTime))
+                    self.startWarmUp()
 
-                self.sense.set_pixels(screen)
-                time.sleep(0.1)
+                # 次に画面が変わる時刻まで、あるいはジョイスティックのイベントが届くまで眠る
+                event = self.eventQueue.get(deadline)
+                if event is not None:
+                    wasScrolling = self.cursorScrolling
+                    self.handleJoystickEvent(event)
+                    if self.cursorScrolling and not wasScrolling:
+                        holdUntil = 0.0 # スクロールをすぐに始める
             if not self.shouldExit:
                 # Run selected item
                 self.runItem(self.runningItemindex)
         self.sense.clear()
+        print(self.frameBuffer.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
@@ -1,10 +1,15 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import math, time, copy
+import math, time, copy, asyncio
+from indexedScreen import Palette, Screen
+from frameScheduler import FrameScheduler
+from textRenderer import TextRenderer, TextScroller
+from asyncRuntime import GameRuntime
 
 class Paint(object):
     """
     ジャイロセンサーで傾きを感知して、ボールが移動し、
     画面一面を塗りつぶす時間を測定する。
+    run() はコルーチンなので、GameRuntime で実行する。ジョイスティックのイベントは sense.stick.events() で受け取る。
     """
     P_SENSITIVE = 8.0 # Sensibility for orientation
     P_FRAME_TIME = 0.1 # フレーム間の時間（秒）
@@ -21,12 +26,14 @@ class Paint(object):
     ball_color = G
     ball_trail_color = D
 
+    palette = Palette([O, G, D, L, R, pink, orange, yellow, W])
+
     menuItemPixels = [
     O, D, G, G, D, D,
     D, D, G, G, D, O
     ]
 
-    normal_screen = [
+    normal_screen = Screen.fromPixels(palette, [
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
@@ -35,14 +42,16 @@ class Paint(object):
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O,
     O, O, O, O, O, O, O, O
-    ]
+    ])
 
     def __init__(self, sense):
         self.sense = sense
-        self.sense.stick.direction_any = self.joystick_any
         self.shouldExit = False
         self.completed = False
-        self.paintedScreen = copy.copy(Paint.normal_screen)
+        self.completedTime = None # 画面をすべて塗りつぶした時刻
+        self.durationText = None # 塗りつぶすのにかかった時間の文字列
+        self.durationScroller = TextScroller(sense, TextRenderer(sense)) # かかった時間をスクロールさせて表示する
+        self.paintedScreen = Paint.normal_screen.copy()
 
     @classmethod
     def getName(cls):
@@ -65,23 +74,61 @@ class Paint(object):
         if event.action == ACTION_RELEASED:
             self.shouldExit = True
 
-    def checkComplete(self, completedPixelCount, startTime):
-        isFirst = True
-        if completedPixelCount == 64:
-            time.sleep(Paint.P_FRAME_TIME * 5)
-            endTime = time.monotonic()
-            durationText = "{:.2f}".format(endTime - startTime)
-            while not self.shouldExit:
-                self.sense.show_message(("" if isFirst else " ") + durationText)
-                isFirst = False
+    async def watchJoystick(self):
+        """
+        ジョイスティックのイベントを受け取り、ボタンを離したら終了する。run() と並行して動くタスクである。
+        """
+        async for event in self.sense.stick.events():
+            self.joystick_any(event)
+            if self.shouldExit:
+                break
+
+    def checkComplete(self, completedPixelCount):
+        """
+        画面をすべて塗りつぶしたかどうかをチェックする。塗りつぶしていれば self.completed を True にする。
+        """
+        if completedPixelCount == 64 and not self.completed:
+            self.completed = True
+            self.completedTime = time.monotonic()
 
-    def run(self):
+    def displayDuration(self, startTime):
+        """
+        塗りつぶしてから少し待った後、かかった時間をスクロールさせて表示する。ブロックしないので、毎フレーム呼ぶ。
+        最後まで表示したら、先頭に空白を入れて、また最初から表示する。
+        """
+        now = time.monotonic()
+        if now < self.completedTime + Paint.P_FRAME_TIME * 5:
+            return
+        if self.durationText is None:
+            self.durationText = "{:.2f}".format(now - startTime)
+            self.durationScroller.start(self.durationText)
+        elif not self.durationScroller.isScrolling():
+            self.durationScroller.start(" " + self.durationText)
+        self.durationScroller.update()
+
+    async def run(self):
         print(self.__class__.__name__ + " is running")
+        joystickTask = asyncio.ensure_future(self.watchJoystick())
+        scheduler = FrameScheduler(Paint.P_FRAME_TIME)
+        try:
+            await self.paint(scheduler)
+        finally:
+            joystickTask.cancel()
+            print(scheduler.getStatsText())
+            print(self.__class__.__name__ + " is exiting")
+
+    async def paint(self, scheduler):
+        """
+        終了するまで、ボールを動かして画面を塗りつぶす。
+        """
         pre_x = pre_y = -1
         completedPixelCount = 0
         startTime = time.monotonic()
-        lastFrameTime = time.monotonic()
         while not self.shouldExit:
+            if self.completed:
+                self.displayDuration(startTime)
+                await scheduler.waitForNextFrameAsync(self.sense.sleep)
+                continue
             orientation_rad = self.sense.get_orientation_radians()
             #print("p: {pitch}, r: {roll}, y: {yaw}".format(**orientation_rad))
             p = orientation_rad["pitch"]
@@ -98,38 +145,32 @@ class Paint(object):
             #print("x: %d, y: %d, pre_x: %d, pre_y: %d" % (x, y, pre_x, pre_y))
             
             if not(pre_x == x and pre_y == y):
-                pixels = copy.copy(self.paintedScreen)
-                pixels[y*8 + x] = Paint.ball_color
-                pixels[y*8 + x+1] = Paint.ball_color
-                pixels[(y+1)*8 + x] = Paint.ball_color
-                pixels[(y+1)*8 + x+1] = Paint.ball_color
-                if self.paintedScreen[y*8 + x] == Paint.O:
+                ball = Paint.palette.getIndex(Paint.ball_color)
+                trail = Paint.palette.getIndex(Paint.ball_trail_color)
+                pixels = self.paintedScreen.copy()
+                pixels[y*8 + x] = ball
+                pixels[y*8 + x+1] = ball
+                pixels[(y+1)*8 + x] = ball
+                pixels[(y+1)*8 + x+1] = ball
+                if self.paintedScreen[y*8 + x] == 0: # 0 は黒
                     completedPixelCount += 1
-                    self.paintedScreen[y*8 + x] = Paint.ball_trail_color
-                if self.paintedScreen[y*8 + x+1] == Paint.O:
+                    self.paintedScreen[y*8 + x] = trail
+                if self.paintedScreen[y*8 + x+1] == 0:
                     completedPixelCount += 1
-                    self.paintedScreen[y*8 + x+1] = Paint.ball_trail_color
-                if self.paintedScreen[(y+1)*8 + x] == Paint.O:
+                    self.paintedScreen[y*8 + x+1] = trail
+                if self.paintedScreen[(y+1)*8 + x] == 0:
                     completedPixelCount += 1
-                    self.paintedScreen[(y+1)*8 + x] = Paint.ball_trail_color
-                if self.paintedScreen[(y+1)*8 + x+1] == Paint.O:
+                    self.paintedScreen[(y+1)*8 + x] = trail
+                if self.paintedScreen[(y+1)*8 + x+1] == 0:
                     completedPixelCount += 1
-                    self.paintedScreen[(y+1)*8 + x+1] = Paint.ball_trail_color
-                self.sense.set_pixels(pixels)
-                self.checkComplete(completedPixelCount, startTime)
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
-            if Paint.P_FRAME_TIME - duration >0:
-                time.sleep(Paint.P_FRAME_TIME - duration)
+                    self.paintedScreen[(y+1)*8 + x+1] = trail
+                self.sense.set_pixels(pixels.toPixels())
+                self.checkComplete(completedPixelCount)
+            if await scheduler.waitForNextFrameAsync(self.sense.sleep):
                 pre_x = x
                 pre_y = y
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}".format(Paint.P_FRAME_TIME))
-        print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
     sense = SenseHat()
-    paint = Paint(sense)
-    paint.run()
+    GameRuntime(sense).run(Paint)
     
\ No newline at end of file
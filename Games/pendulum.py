@@ -1,6 +1,8 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
 import time
 import numpy as np
+from frameBuffer import FrameBuffer
+from frameScheduler import FrameScheduler
 
 class Pendulum(object):
     """
@@ -13,7 +15,9 @@ class Pendulum(object):
     """
     P_SENSITIVE = 1.0 # Sensibility for accelerometer
     P_RESISTANCE = 0.01 # 速度に対する抵抗の割合。0だと抵抗がない。
-    P_FRAME_TIME = 0.08 # フレーム間の時間（秒）
+    P_FRAME_TIME = 0.04 # フレーム間の時間（秒）
+    P_STEP_TIME = 0.01 # 物理計算の時間刻み（秒）。フレーム間の時間とは独立している
+    P_TUNED_STEP_TIME = 0.08 # P_SENSITIVE や P_RESISTANCE を調整した時の、1回の計算あたりの時間（秒）
 
     red = R = [255, 0, 0]
     black = O = [0, 0, 0]
@@ -39,6 +43,7 @@ class Pendulum(object):
     def __init__(self, sense):
         self.sense = sense
         self.sense.stick.direction_any = self.joystick_any
+        self.frameBuffer = FrameBuffer(sense)
         self.shouldExit = False
         self.angle = 0 # radian
         self.angular_speed = 0
@@ -95,43 +100,49 @@ class Pendulum(object):
         else:
             return -np.arccos(np.dot(accel, norm) / np.linalg.norm(accel))
 
+    def step(self, accel, dt):
+        """
+        振り子の角速度と角度を dt 秒分だけ進める。
+        P_SENSITIVE や P_RESISTANCE は P_TUNED_STEP_TIME 秒ごとに計算した時の値なので、dt に比例させて適用する。
+        """
+        scale = dt / Pendulum.P_TUNED_STEP_TIME
+        tangent = np.array([np.cos(self.angle), np.sin(self.angle)]) # 振り子の位置の、円に対する接線。単位ベクトルでもある。
+        f = -np.dot(tangent, accel) * Pendulum.P_SENSITIVE # 接線方向に働く力の大きさ
+        self.angular_speed += (f - self.angular_speed * Pendulum.P_RESISTANCE) * scale
+        self.angle += self.angular_speed * dt
+
     def run(self):
         print(self.__class__.__name__ + " is running")
-        self.sense.set_pixels(Pendulum.normal_screen)
+        self.frameBuffer.set_pixels(Pendulum.normal_screen)
+        self.frameBuffer.flush()
         self.angle = self.getAngleFromCurrentAccel()
-        lastFrameTime = time.monotonic()
+        scheduler = FrameScheduler(Pendulum.P_FRAME_TIME, Pendulum.P_STEP_TIME)
         lastPosition = {"x": 0, "y": 0}
         while not self.shouldExit:
             a_raw = self.sense.accel_raw
             x_accel, y_accel = -a_raw["x"], a_raw["y"] # xは反転させる。z は使わない。
             # print("x:{:+.2f}, y:{:+.2f}, z:{:+.2f}".format(x, y, z))
-            
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
-
-            tangent = np.array([np.cos(self.angle), np.sin(self.angle)]) # 振り子の位置の、円に対する接線。単位ベクトルでもある。
             accel = np.array([x_accel, y_accel]) # 加速度
-            f = -np.dot(tangent, accel)  # 接線方向に働く力の大きさ
-            self.angular_speed += f - self.angular_speed * Pendulum.P_RESISTANCE
-            self.angle += self.angular_speed * duration
+            # フレーム間の時間に関係なく、一定の時間刻みで計算を進める
+            for i in range(scheduler.getSteps()):
+                self.step(accel, Pendulum.P_STEP_TIME)
             # print("self.angle:{:+.2f}".format(self.angle))
 
             leftTopPosition = self.get2x2LeftTopPosition(self.angle)
-            self.sense.set_pixel(lastPosition["x"], lastPosition["y"], Pendulum.O)
-            self.sense.set_pixel(lastPosition["x"]+1, lastPosition["y"], Pendulum.O)
-            self.sense.set_pixel(lastPosition["x"], lastPosition["y"]+1, Pendulum.O)
-            self.sense.set_pixel(lastPosition["x"]+1, lastPosition["y"]+1, Pendulum.O)
-            self.sense.set_pixel(leftTopPosition["x"], leftTopPosition["y"], Pendulum.R)
-            self.sense.set_pixel(leftTopPosition["x"]+1, leftTopPosition["y"], Pendulum.R)
-            self.sense.set_pixel(leftTopPosition["x"], leftTopPosition["y"]+1, Pendulum.R)
-            self.sense.set_pixel(leftTopPosition["x"]+1, leftTopPosition["y"]+1, Pendulum.R)
+            self.frameBuffer.set_pixel(lastPosition["x"], lastPosition["y"], Pendulum.O)
+            self.frameBuffer.set_pixel(lastPosition["x"]+1, lastPosition["y"], Pendulum.O)
+            self.frameBuffer.set_pixel(lastPosition["x"], lastPosition["y"]+1, Pendulum.O)
+            self.frameBuffer.set_pixel(lastPosition["x"]+1, lastPosition["y"]+1, Pendulum.O)
+            self.frameBuffer.set_pixel(leftTopPosition["x"], leftTopPosition["y"], Pendulum.R)
+            self.frameBuffer.set_pixel(leftTopPosition["x"]+1, leftTopPosition["y"], Pendulum.R)
+            self.frameBuffer.set_pixel(leftTopPosition["x"], leftTopPosition["y"]+1, Pendulum.R)
+            self.frameBuffer.set_pixel(leftTopPosition["x"]+1, leftTopPosition["y"]+1, Pendulum.R)
+            self.frameBuffer.flush() # 変化したピクセルだけが書き込まれる
             lastPosition = leftTopPosition
 
-            if Pendulum.P_FRAME_TIME - duration >0:
-                time.sleep(Pendulum.P_FRAME_TIME - duration)
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}".format(Pendulum.P_FRAME_TIME))
+            scheduler.waitForNextFrame()
+        print(self.frameBuffer.getStatsText())
+        print(scheduler.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+import colorsys
+
+class Rainbow(object):
+    """
+    虹色（HSV の色相）の色を、ベクトル化して計算する。
+    彩度と明度は 1.0 に固定し、色相 0.0 から 1.0 を P_HUE_STEPS 段階に分けた参照表をあらかじめ作っておく。
+    colorsys.hsv_to_rgb をピクセルごとに呼ぶ代わりに、画面全体の色を1回の配列演算で求める。
+    NumPy は、参照表と画面全体の色を求める時に初めて import する。1色だけを求める getColor() は、NumPy を使わない。
+    """
+    P_HUE_STEPS = 1024 # 色相の参照表の段階数
+
+    hueTable = None # P_HUE_STEPS x 3 の uint8 の配列。最初に使う時に作る。
+
+    @classmethod
+    def getHueTable(cls):
+        """
+        色相の参照表を返す。colorsys.hsv_to_rgb(h, 1.0, 1.0) の各成分を 255 倍して切り捨てたものと同じ値になる。
+        """
+        if cls.hueTable is None:
+            import numpy as np
+            h6 = np.arange(cls.P_HUE_STEPS) * 6.0 / cls.P_HUE_STEPS
+            sector = h6.astype(np.int64) % 6
+            f = h6 - np.floor(h6)
+            one = np.ones_like(f)
+            zero = np.zeros_like(f)
+            r = np.choose(sector, [one, 1.0 - f, zero, zero, f, one])
+            g = np.choose(sector, [f, one, one, 1.0 - f, zero, zero])
+            b = np.choose(sector, [zero, zero, f, one, one, 1.0 - f])
+            cls.hueTable = (np.stack([r, g, b], axis=1) * 255).astype(np.uint8)
+        return cls.hueTable
+
+    @classmethod
+    def getHueIndexes(cls, hues):
+        """
+        色相の配列（1.0 で1周）を、参照表のインデックスの配列に変換する。
+        """
+        import numpy as np
+        return (np.asarray(hues) * cls.P_HUE_STEPS).astype(np.int64) % cls.P_HUE_STEPS
+
+    @classmethod
+    def getColor(cls, hue):
+        """
+        1つの色相に対する色を (r, g, b) のタプルで返す。参照表と同じく、色相を P_HUE_STEPS 段階に丸めてから、colorsys で求める。
+        """
+        r, g, b = colorsys.hsv_to_rgb((int(hue * cls.P_HUE_STEPS) % cls.P_HUE_STEPS) / cls.P_HUE_STEPS, 1.0, 1.0)
+        return (int(r * 255), int(g * 255), int(b * 255))
+
+    @classmethod
+    def getHueGradient(cls, xCoefficient, yCoefficient, width=8, height=8):
+        """
+        (x, y) のピクセルの色相が x * xCoefficient + y * yCoefficient となる、width x height 個の配列を返す。
+        getField() に offset とともに渡す。
+        """
+        import numpy as np
+        ys, xs = np.mgrid[0:height, 0:width]
+        return (xs * xCoefficient + ys * yCoefficient).ravel()
+
+    @classmethod
+    def getField(cls, offset, gradient):
+        """
+        色相が gradient + offset となる画面全体の色を、sense.set_pixels() に渡せる配列で返す。
+        """
+        return cls.getHueTable()[cls.getHueIndexes(gradient + offset)].tolist()
@@ -1,5 +1,6 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
 import time, copy
+from frameBuffer import FrameBuffer
 
 class RGB(object):
     """
@@ -33,6 +34,7 @@ class RGB(object):
     def __init__(self, sense):
         self.sense = sense
         self.sense.stick.direction_any = self.joystick_any
+        self.frameBuffer = FrameBuffer(sense)
         self.shouldExit = False
         self.selectionChanged = False
         self.currentSelection = 0 # R=0, G=1, B=2
@@ -92,7 +94,8 @@ class RGB(object):
         # print(self.r, self.g, self.b, color)
         for y in range(8):
             screen[y * 8 + 4: y * 8 + 8] = [color for i in range(4)]
-        self.sense.set_pixels(screen)
+        self.frameBuffer.set_pixels(screen)
+        self.frameBuffer.flush()
 
     def run(self):
         print(self.__class__.__name__ + " is running")
@@ -101,17 +104,19 @@ class RGB(object):
         while not self.shouldExit:
             if self.selectionChanged:
                 self.selectionChanged = False
-                self.sense.set_pixel(0, 7, RGB.R)
-                self.sense.set_pixel(1, 7, RGB.G)
-                self.sense.set_pixel(2, 7, RGB.B)
+                self.frameBuffer.set_pixel(0, 7, RGB.R)
+                self.frameBuffer.set_pixel(1, 7, RGB.G)
+                self.frameBuffer.set_pixel(2, 7, RGB.B)
                 pre_time = time.monotonic()
             subsecond = (time.monotonic() - pre_time) % 1
             if subsecond < 0.2:
-                self.sense.set_pixel(self.currentSelection, 7, RGB.O)
+                self.frameBuffer.set_pixel(self.currentSelection, 7, RGB.O)
             else:
                 color = RGB.R if self.currentSelection == 0 else (RGB.G if self.currentSelection == 1 else RGB.B)
-                self.sense.set_pixel(self.currentSelection, 7, color)
+                self.frameBuffer.set_pixel(self.currentSelection, 7, color)
+            self.frameBuffer.flush()
             time.sleep(RGB.P_INTERVAL)
+        print(self.frameBuffer.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
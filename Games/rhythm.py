@@ -1,5 +1,8 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
 import time, random
+from indexedScreen import Palette, Screen
+from sensorSampler import SensorSampler
+from textRenderer import TextRenderer, TextScroller
 
 class Rhythm(object):
     """
@@ -19,6 +22,8 @@ class Rhythm(object):
     P_STEP_TIME = 0.15 # 表示上の1ステップの時間（秒）
     P_SCORE_COEFFICIENT_TIME = 0.25 # スコアを算出する際に何秒ずれたら 0 点にするか。この数字が小さいほど高スコアを得るのが難しい。
     P_SCORE_PERFECT = 120.0 # スコアで100点を取りやすくするために、タイミングが完璧であれば内部的にこの点数をつける。
+    P_SAMPLING_INTERVAL = 0.01 # 加速度センサーを読み取る間隔（秒）
+    P_FRAME_TIME = 0.01 # フレーム間の時間（秒）
 
     red = R = [255, 0, 0]
     green = G = [0, 255, 0]
@@ -34,6 +39,8 @@ class Rhythm(object):
     player0 = R # プレーヤーの色 明るい
     player1 = D = [int(R[0]*0.4), int(R[1]*0.4), int(R[2]*0.4)] # プレーヤーの色 暗い
 
+    palette = Palette([O, beat, model0, model1, player0, player1, R, G, B, Y, W])
+
     menuItemPixels = [
     C, D, D, D, D, C,
     O, O, R, R, O, O
@@ -48,6 +55,12 @@ class Rhythm(object):
         self.accelerometerYArray = []
         self.timeArray = []
         self.lastActionIndex = Rhythm.P_THRESHOLD_IGNORE_COUNT # 最後にアクションを起こしたのが、何回前なのかを表す。
+        self.startTime = 0.0 # 開始した時刻
+        self.lastSampleTime = None # 最後に処理した加速度センサーの値を読み取った時刻
+        # 加速度センサーはバックグラウンドで読み取る
+        self.sampler = SensorSampler(sense, {"accelerometer": Rhythm.P_SAMPLING_INTERVAL})
+        self.scoreScroller = TextScroller(sense, TextRenderer(sense)) # スコアをスクロールさせて表示する
+        self.scoreDisplayCount = 0 # スコアを表示し始めた回数
 
     @classmethod
     def getName(cls):
@@ -85,7 +98,7 @@ class Rhythm(object):
     def updateBeatScreen(self, screen, color):
         """
         拍のタイミング用の画面を更新する。
-        受け取ったscreenを更新する。
+        受け取ったscreenを更新する。color はパレットのインデックスである。
         """
         screen[0 + 0 * 8] = color
         screen[7 + 0 * 8] = color
@@ -105,15 +118,19 @@ class Rhythm(object):
             return None
         else:
             # print("d = %.2f    ★" % (d))
-            self.updateActiveStepsScreen(screen, d, playerAction["x"], playerAction["y"], Rhythm.player0, Rhythm.player1)
+            self.updateActiveStepsScreen(screen, d, playerAction["x"], playerAction["y"], Rhythm.palette.getIndex(Rhythm.player0), Rhythm.palette.getIndex(Rhythm.player1))
             return playerAction
 
     def displayScore(self, score):
-        isFirst = True
-        scoreText = "{:.1f}".format(score)
-        while not self.shouldExit:
-            self.sense.show_message(("" if isFirst else " ") + scoreText)
-            isFirst = False
+        """
+        スコアをスクロールさせて表示する。ブロックしないので、スコアを表示している間は毎フレーム呼ぶ。
+        最後まで表示したら、先頭に空白を入れて、また最初から表示する。
+        """
+        if not self.scoreScroller.isScrolling():
+            scoreText = "{:.1f}".format(score)
+            self.scoreScroller.start(("" if self.scoreDisplayCount == 0 else " ") + scoreText)
+            self.scoreDisplayCount += 1
+        self.scoreScroller.update()
 
     def getPlayerAction(self):
         """
@@ -123,8 +140,16 @@ class Rhythm(object):
         x か y かどちらかは必ず 0 である。
         correction は、補正を行った結果 action が True になった場合に、 True が入る。
         しきい値未満の場合の戻り値は {"action": False} のような値。
+        前回から加速度センサーの新しい値が得られていない場合も、{"action": False} を返す。
         """
-        a_raw = self.sense.accel_raw
+        sample = self.sampler.get("accelerometer")
+        if sample["time"] == self.lastSampleTime:
+            return {"action": False}
+        self.lastSampleTime = sample["time"]
+        self.timeArray.append(sample["time"] - self.startTime)
+        if len(self.timeArray) > Rhythm.P_THRESHOLD_SAMPLE_COUNT:
+            self.timeArray.pop(0)
+        a_raw = sample["value"]
         x = -a_raw["x"]
         y = -a_raw["y"]
         
@@ -195,7 +220,7 @@ class Rhythm(object):
     def updateActiveStepsScreen(self, screen, d, x, y, color0, color1):
         """
         アクティブなステップ用の画面を更新する。
-        受け取ったscreenを更新する。
+        受け取ったscreenを更新する。color0 と color1 はパレットのインデックスである。
         """
         d_beat = d % self.beatTime
         if d_beat <= Rhythm.P_STEP_TIME:
@@ -303,14 +328,15 @@ class Rhythm(object):
         # print("d_duration = %.2f,  modelAction_time = %.2f,   d = %.2f" % (d_duration, modelAction["time"], d))
         if d >= 0:
             # print("r = %.2f, modelAction_time = %.2f,    d_duration = %.2f,     d = %.2f  ★" % (r, modelAction["time"], d_duration, d))
-            self.updateActiveStepsScreen(screen, d, modelAction["x"], modelAction["y"], Rhythm.model0, Rhythm.model1)
+            self.updateActiveStepsScreen(screen, d, modelAction["x"], modelAction["y"], Rhythm.palette.getIndex(Rhythm.model0), Rhythm.palette.getIndex(Rhythm.model1))
         # else:
         #     print("r = %.2f, modelAction_time = %.2f,    d_duration = %.2f,     d = %.2f" % (r , modelAction["time"], d_duration, d))
 
     def run(self):
         print(self.__class__.__name__ + " is running")
         self.sense.clear()
-        startTime = time.monotonic()
+        self.sampler.start()
+        startTime = self.startTime = time.monotonic()
         score = 0.0
         shouldDisplayScore = False
         shouldDisplayScoreTime = None
@@ -318,14 +344,16 @@ class Rhythm(object):
         # print(modelList)
         lastPlayerAction = None
         while not self.shouldExit:
-            screen = [Rhythm.O for i in range(64)]
             now = time.monotonic()
+            # スコア表示画面に遷移する直前に少し画面を表示す続ける
+            if shouldDisplayScore and now > shouldDisplayScoreTime + Rhythm.P_STEP_TIME * 6:
+                self.displayScore(score)
+                time.sleep(Rhythm.P_FRAME_TIME)
+                continue
+            screen = Screen(Rhythm.palette) # 黒で初期化される
             duration = now - startTime
-            self.timeArray.append(duration)
-            if len(self.timeArray) > Rhythm.P_THRESHOLD_SAMPLE_COUNT:
-                self.timeArray.pop(0)
             if duration % self.beatTime <= Rhythm.P_STEP_TIME:
-                self.updateBeatScreen(screen, Rhythm.beat)
+                self.updateBeatScreen(screen, Rhythm.palette.getIndex(Rhythm.beat))
             beatPosition = round( duration / self.beatTime ) # now が開始してから何拍目に位置付くのか、四捨五入で求める。
             #beatPosition = int( (now - startTime) / self.beatTime ) # now が開始してから何拍目に位置付くのか、切り捨てで求める。
             playPosition = (beatPosition - Rhythm.P_MODEL_BEAT_COUNT) % (Rhythm.P_MODEL_BEAT_COUNT * 2)
@@ -351,14 +379,13 @@ class Rhythm(object):
             if lastPlayerAction is not None:
                 lastPlayerAction = self.updatePlayerScreen(screen, duration, lastPlayerAction)
             # 画面表示
-            self.sense.set_pixels(screen)
+            self.sense.set_pixels(screen.toPixels())
             # スコア表示画面への遷移すべきか判断
             if not shouldDisplayScore and score > 0.0 and playPosition == Rhythm.P_MODEL_BEAT_COUNT * 2 - 1:
                 shouldDisplayScore = True
                 shouldDisplayScoreTime = now
-            # スコア表示画面に遷移する直前に少し画面を表示す続ける
-            if shouldDisplayScore and now > shouldDisplayScoreTime + Rhythm.P_STEP_TIME * 6:
-                self.displayScore(score)
+            time.sleep(Rhythm.P_FRAME_TIME)
+        self.sampler.stop()
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
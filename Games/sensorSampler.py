@@ -0,0 +1,182 @@
+import time, threading, heapq
+
+class SensorSampler(object):
+    """
+    センサーをバックグラウンドのスレッドで読み取り、最新の値をスナップショットとして提供する。
+    センサーごとに読み取り間隔（秒）を指定できる。
+    読み取りは、次に読み取るべき時刻の順に1つずつ行うので、間隔の異なるセンサーの読み取りが交互に挟み込まれる。
+    boost() で、一定時間だけ特定のセンサーの読み取り間隔を短くできる。
+    描画ループは getSnapshot() や get() で最新の値を得るだけなので、センサーの読み取りを待つことはない。
+    スナップショットは読み取りのたびに新しい辞書として作り直して差し替えるので、ロックは不要である。
+    threaded が False の場合は、スレッドを使わずに、値を得る時に読み取る時刻になったセンサーを読み取る。
+    仮想の時刻で動かすエミュレーターのためのもので、threaded が None の場合は P_THREADED に従う。
+    """
+    P_THREADED = True # threaded を指定しない場合に、スレッドを使うかどうか。emulatedSenseHat.installVirtualTime() が False にする
+
+    # センサーの名前と、それを読み取る関数
+    readers = {
+        "temperature": lambda sense: sense.temperature,
+        "humidity": lambda sense: sense.humidity,
+        "pressure": lambda sense: sense.pressure,
+        "compass": lambda sense: sense.get_compass_raw(),
+        "orientation": lambda sense: sense.get_orientation_radians(),
+        "accelerometer": lambda sense: sense.accel_raw,
+        "imu": lambda sense: SensorSampler.readImu(sense),
+    }
+
+    @classmethod
+    def readImu(cls, sense):
+        """
+        IMU を1回だけ読み取り、{"orientation": 傾き（ラジアン）, "accelerometer": 加速度, "compass": 地磁気} を返す。
+        sense_hat の get_orientation_radians()、accel_raw、get_compass_raw() は、呼ぶたびに IMU を I2C で読み取り直すので、
+        3つを別々に読むと、バスを3回使う。そこで、sense_hat の内部の _read_imu() と _imu.getIMUData() で1回だけ読み取り、
+        その結果から3つの値を取り出す。それらがない場合（EmulatedSenseHat など）や、読み取りに失敗した場合は、3つを別々に読む。
+        """
+        if hasattr(sense, "_read_imu") and hasattr(sense, "_imu") and sense._read_imu():
+            data = sense._imu.getIMUData()
+            if data["fusionPoseValid"] and data["accelValid"] and data["compassValid"]:
+                roll, pitch, yaw = data["fusionPose"]
+                return {
+                    "orientation": {"roll": roll, "pitch": pitch, "yaw": yaw},
+                    "accelerometer": dict(zip("xyz", data["accel"])),
+                    "compass": dict(zip("xyz", data["compass"])),
+                }
+        return {
+            "orientation": sense.get_orientation_radians(),
+            "accelerometer": sense.accel_raw,
+            "compass": sense.get_compass_raw(),
+        }
+
+    @classmethod
+    def getIntervalsFromRates(cls, rates):
+        """
+        センサーの名前から読み取り頻度（Hz）への辞書を、読み取り間隔（秒）への辞書に変換する。
+        """
+        return {name: 1.0 / rate for name, rate in rates.items()}
+
+    def __init__(self, sense, intervals, threaded=None):
+        self.sense = sense
+        self.intervals = dict(intervals) # センサーの名前から読み取り間隔（秒）への辞書
+        self.boosts = {} # センサーの名前から {"interval": 読み取り間隔, "until": 終了時刻} への辞書
+        self.snapshot = {} # センサーの名前から {"value": 値, "time": 読み取った時刻} への辞書。読み取りのたびに差し替える。
+        self.nextReadTimes = {} # センサーの名前から、次に読み取るべき時刻への辞書
+        self.schedule = [] # (次に読み取るべき時刻, センサーの名前) のヒープ。nextReadTimes と一致しない要素は無視する
+        self.scheduleLock = threading.Lock()
+        self.readCount = 0 # 読み取った回数
+        self.readCounts = {name: 0 for name in self.intervals} # センサーごとの読み取った回数
+        self.readSeconds = {name: 0.0 for name in self.intervals} # センサーごとの読み取りにかかった時間の合計（秒）
+        self.wakeEvent = threading.Event() # 読み取り予定が変わった時にスレッドを起こす
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.threaded = SensorSampler.P_THREADED if threaded is None else threaded # False の場合は、スレッドを使わない
+        self.startTime = None
+
+    def start(self):
+        """
+        すべてのセンサーを1回ずつ読み取ってから、バックグラウンドのスレッドを開始する。
+        そのため、start() の後は必ずすべてのセンサーの値が得られる。
+        """
+        self.startTime = time.monotonic()
+        for name in self.intervals:
+            self.read(name)
+            self.reschedule(name, time.monotonic() + self.intervals[name])
+        if self.threaded:
+            self.stopEvent.clear()
+            self.thread = threading.Thread(target=self.loop, name=self.__class__.__name__, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopEvent.set()
+        self.wakeEvent.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def reschedule(self, name, nextReadTime):
+        with self.scheduleLock:
+            self.nextReadTimes[name] = nextReadTime
+            heapq.heappush(self.schedule, (nextReadTime, name))
+
+    def getInterval(self, name, now):
+        """
+        今の読み取り間隔を返す。boost() されている間は短い間隔を返す。
+        """
+        boost = self.boosts.get(name)
+        if boost is not None and now < boost["until"]:
+            return min(boost["interval"], self.intervals[name])
+        return self.intervals[name]
+
+    def boost(self, name, interval, duration):
+        """
+        duration 秒の間だけ、センサーの読み取り間隔を interval 秒にする。
+        既に boost() されている場合は、終了時刻を延長する。
+        """
+        now = time.monotonic()
+        self.boosts[name] = {"interval": interval, "until": now + duration}
+        if name in self.nextReadTimes and self.nextReadTimes[name] > now + interval:
+            self.reschedule(name, now + interval)
+            self.wakeEvent.set()
+
+    def isBoosted(self, name):
+        boost = self.boosts.get(name)
+        return boost is not None and time.monotonic() < boost["until"]
+
+    def read(self, name):
+        readStartTime = time.monotonic()
+        value = SensorSampler.readers[name](self.sense)
+        now = time.monotonic()
+        snapshot = dict(self.snapshot)
+        snapshot[name] = {"value": value, "time": now}
+        self.snapshot = snapshot # 参照の代入は不可分なので、読み手は常に一貫したスナップショットを得る
+        self.readCount += 1
+        self.readCounts[name] += 1
+        self.readSeconds[name] += now - readStartTime
+
+    def poll(self):
+        """
+        読み取る時刻になったセンサーを1つだけ読み取り、次に読み取るべき時刻までの秒数を返す。
+        """
+        with self.scheduleLock:
+            while len(self.schedule) > 0 and self.schedule[0][0] != self.nextReadTimes[self.schedule[0][1]]:
+                heapq.heappop(self.schedule) # reschedule() で置き換えられた古い予定
+            if len(self.schedule) == 0:
+                return None
+            nextReadTime, name = self.schedule[0]
+            now = time.monotonic()
+            if nextReadTime > now:
+                return nextReadTime - now
+            heapq.heappop(self.schedule)
+        self.read(name)
+        # 読み取りが遅れた場合は、遅れを取り戻そうとして連続で読み取ることはしない
+        interval = self.getInterval(name, now)
+        self.reschedule(name, nextReadTime + interval if nextReadTime + interval > now else now + interval)
+        return 0.0
+
+    def loop(self):
+        while not self.stopEvent.is_set():
+            wait = self.poll()
+            if wait is None or wait > 0:
+                self.wakeEvent.wait(wait)
+                self.wakeEvent.clear()
+
+    def getSnapshot(self):
+        if not self.threaded:
+            while self.poll() == 0.0:
+                pass
+        return self.snapshot
+
+    def get(self, name):
+        """
+        センサーの最新の値を {"value": 値, "time": 読み取った時刻} の形で返す。
+        """
+        return self.getSnapshot()[name]
+
+    def getStatsText(self):
+        """
+        センサーごとの1秒あたりの読み取り回数と、読み取りにかかった時間の割合を文字列で返す。
+        """
+        elapsed = max(time.monotonic() - self.startTime, 1e-9) if self.startTime is not None else 1e-9
+        texts = ["{}: {:.1f} reads/s, {:.1%} busy".format(name, self.readCounts[name] / elapsed, self.readSeconds[name] / elapsed) for name in self.intervals]
+        texts.append("total: {:.1f} reads/s".format(self.readCount / elapsed))
+        return ", ".join(texts)
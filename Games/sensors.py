@@ -1,5 +1,9 @@
 from sense_hat import SenseHat, DIRECTION_UP, DIRECTION_DOWN, DIRECTION_LEFT, DIRECTION_RIGHT, DIRECTION_MIDDLE, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import time, statistics, copy, math
+import time, copy, math
+from indexedScreen import Palette, Screen
+from slidingWindow import SlidingWindow
+from sensorSampler import SensorSampler
+from frameScheduler import FrameScheduler
 
 class Sensors(object):
     """
@@ -13,9 +17,20 @@ class Sensors(object):
     P_SENSITIVE_ACCEL = 7/1.5 # Sensibility for accelerometer
     P_SENSITIVE_PRESSURE = 7/13.0 # Sensibility for pressure
 
-    P_FRAME_TIME = 0.16 # フレーム間の時間（秒）
+    P_FRAME_TIME = 0.05 # フレーム間の時間（秒）
+    # センサーごとの読み取り頻度（Hz）。湿度や気圧は数秒かけて変化するが、加速度や傾きは一瞬で変化する
+    # 傾き、加速度、地磁気は、IMU の1回の読み取り（"imu"）からまとめて得る。合計で 1秒あたり 12 回の読み取りになる
+    P_SAMPLING_RATES = {
+        "imu": 10,
+        "temperature": 1,
+        "humidity": 0.5,
+        "pressure": 0.5,
+    }
+    P_BOOST_LEVEL = 2 # レベルがこの値以上になったら、そのセンサーの読み取り頻度を一時的に上げる
+    P_BOOST_INTERVAL = 0.05 # 読み取り頻度を上げている間の読み取り間隔（秒）。1フレームに1回で、これより速く読んでも表示は変わらない
+    P_BOOST_DURATION = 3.0 # 読み取り頻度を上げ続ける秒数
     P_DURATIUON = 3.0 # Seconds of duration in which sensor data are counted for average calculation
-    P_STAY_MAX_COUNT = 6 # ここに指定した回数分だけ、max 表示を続ける
+    P_STAY_MAX_COUNT = 20 # ここに指定した回数分だけ、max 表示を続ける（約1秒）
 
     red = R = [255, 0, 0]
     green = G = [0, 255, 0]
@@ -34,41 +49,33 @@ class Sensors(object):
     Accelerometer = R
     Pressure = C
 
+    palette = Palette([O, R, G, B, C, K, Y, W])
+
     menuItemPixels = [
     K, G, O, B, R, O, 
     K, G, Y, B, R, C
     ]
 
-    normal_screen = [
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O,
-    O, O, O, O, O, O, O, O
-    ]
-
     def __init__(self, sense):
         self.sense = sense
         self.sense.stick.direction_any = self.joystick_any
         self.shouldExit = False
-        self.temperatureArray = []
-        self.humidityArray = []
-        self.magnetometerArray = []
-        self.orientationPArray = []
-        self.orientationRArray = []
-        self.orientationYArray = []
-        self.accelerometerArray = []
-        self.pressureArray = []
+        self.temperatureWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.humidityWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.magnetometerWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.orientationPWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.orientationRWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.orientationYWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.accelerometerWindow = SlidingWindow(Sensors.P_DURATIUON)
+        self.pressureWindow = SlidingWindow(Sensors.P_DURATIUON)
+        # センサーはバックグラウンドで読み取り、描画ループは最新の値を使うだけにする
+        self.sampler = SensorSampler(sense, SensorSampler.getIntervalsFromRates(Sensors.P_SAMPLING_RATES))
         self.temperatureRecentMax = { "level": 0, "count": 0 }
         self.humidityRecentMax = { "level": 0, "count": 0 }
         self.magnetometerRecentMax= { "level": 0, "count": 0 }
         self.orientationRecentMax = { "level": 0, "count": 0 }
         self.accelerometerRecentMax = { "level": 0, "count": 0 }
         self.pressureRecentMax = { "level": 0, "count": 0 }
-        self.dataCount = Sensors.P_DURATIUON / Sensors.P_FRAME_TIME
 
     @classmethod
     def getName(cls):
@@ -88,27 +95,35 @@ class Sensors(object):
 
     def getRowPixelsOfLevel(self, level, max, color):
         """
-        0から7までのレベルの値を受け取って、1行分に相当する 8 x 1 ピクセル（色付き）を返す。
+        0から7までのレベルの値を受け取って、1行分に相当する 8 x 1 ピクセル（色のパレットのインデックス）を返す。
         一番左は必ず color の色である。
         また、max の値のレベルのところは、level が何であれ、color の色を付ける。
         """
-        pixels = [color if i <= level else Sensors.O for i in range(8)]
+        colorIndex = Sensors.palette.getIndex(color)
+        pixels = [colorIndex if i <= level else 0 for i in range(8)]
         if max > level:
-            pixels[max] = (int(color[0]/3), int(color[1]/3), int(color[2]/3)) # max の色は暗くする
+            pixels[max] = Sensors.palette.getIndex((int(color[0]/3), int(color[1]/3), int(color[2]/3))) # max の色は暗くする
         return pixels
 
+    def boostIfActive(self, name, level):
+        """
+        レベルが P_BOOST_LEVEL 以上の時は、そのセンサーの読み取り頻度を P_BOOST_DURATION 秒間だけ上げる。
+        変化しているセンサーだけを細かく読み取り、変化していないセンサーの読み取りは減らす。
+        """
+        if level >= Sensors.P_BOOST_LEVEL:
+            self.sampler.boost(name, Sensors.P_BOOST_INTERVAL, Sensors.P_BOOST_DURATION)
+
     def getLatestTemperatureLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の温度がどの程度絶対値として離れているのかをレベルで返す。
-        最新の温度を測定し、 self.temperatureArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.temperatureArray を最新のものにする。
+        サンプラーが読み取った最新の温度を、self.temperatureWindow に追加する。
+        self.temperatureWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        t = self.sense.temperature
-        self.temperatureArray.append(t)
-        if len(self.temperatureArray) > self.dataCount:
-            del(self.temperatureArray[0])
-        ave = statistics.mean(self.temperatureArray)
+        sample = self.sampler.get("temperature")
+        t = sample["value"]
+        self.temperatureWindow.appendIfNewer(t, sample["time"])
+        ave = self.temperatureWindow.mean()
         delta = abs(t - ave)
         level = min(int(delta * Sensors.P_SENSITIVE_TEMP), 7)
         # print("delta:{0:+.2f}, level: {1:d}".format(delta, level))
@@ -120,6 +135,7 @@ class Sensors(object):
         else:
             self.temperatureRecentMax["level"] = level
             self.temperatureRecentMax["count"] = 0
+        self.boostIfActive("temperature", level)
         # print("delta:{:+.2f}, level:{:d}, recentMax:{:d}, recentCount:{:d}".format(delta, level, self.temperatureRecentMax["level"], self.temperatureRecentMax["count"]))
         return level
     
@@ -127,14 +143,13 @@ class Sensors(object):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の湿度がどの程度絶対値として離れているのかをレベルで返す。
-        最新の湿度を測定し、 self.humidityArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.humidityArray を最新のものにする。
+        サンプラーが読み取った最新の湿度を、self.humidityWindow に追加する。
+        self.humidityWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        h = self.sense.humidity
-        self.humidityArray.append(h)
-        if len(self.humidityArray) > self.dataCount:
-            del(self.humidityArray[0])
-        ave = statistics.mean(self.humidityArray)
+        sample = self.sampler.get("humidity")
+        h = sample["value"]
+        self.humidityWindow.appendIfNewer(h, sample["time"])
+        ave = self.humidityWindow.mean()
         delta = abs(h - ave)
         level = min(int(delta * Sensors.P_SENSITIVE_HUMITIDY), 7)
         # print("delta:{0:+.2f}, level: {1:d}".format(delta, level))
@@ -146,24 +161,24 @@ class Sensors(object):
         else:
             self.humidityRecentMax["level"] = level
             self.humidityRecentMax["count"] = 0
+        self.boostIfActive("humidity", level)
         return level
     
     def getLatestMagnetometerLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の磁力がどの程度絶対値として離れているのかをレベルで返す。
-        最新の磁力を測定し、 self.magnetometerArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.magnetometerArray を最新のものにする。
+        サンプラーが読み取った最新の磁力を、self.magnetometerWindow に追加する。
+        self.magnetometerWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        m_raw = self.sense.get_compass_raw()
+        sample = self.sampler.get("imu")
+        m_raw = sample["value"]["compass"]
         x = m_raw["x"]
         y = m_raw["y"]
         z = m_raw["z"]
         m = math.sqrt(x * x + y * y + z * z)
-        self.magnetometerArray.append(m)
-        if len(self.magnetometerArray) > self.dataCount:
-            del(self.magnetometerArray[0])
-        ave = statistics.mean(self.magnetometerArray)
+        self.magnetometerWindow.appendIfNewer(m, sample["time"])
+        ave = self.magnetometerWindow.mean()
         delta = abs(m - ave)
         level = min(int(delta * Sensors.P_SENSITIVE_MAGNET), 7)
         # print("x:{:+.2f}, y:{:+.2f}, z:{:+.2f}, m:{:+.2f}, delta:{:+.2f}, level: {:d}".format(x, y, z, m, delta, level))
@@ -175,16 +190,18 @@ class Sensors(object):
         else:
             self.magnetometerRecentMax["level"] = level
             self.magnetometerRecentMax["count"] = 0
+        self.boostIfActive("imu", level)
         return level
     
     def getLatestOrientationLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の傾きがどの程度絶対値として離れているのかをレベルで返す。
-        最新の傾きを測定し、 self.orientationPArray, self.orientationRArray, self.orientationYArray, の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.orientationArray を最新のものにする。
+        サンプラーが読み取った最新の傾きを、self.orientationPWindow, self.orientationRWindow, self.orientationYWindow に追加する。
+        これらは過去 P_DURATIUON 秒分の値を保つ。
         """
-        orientation_rad = self.sense.get_orientation_radians()
+        sample = self.sampler.get("imu")
+        orientation_rad = sample["value"]["orientation"]
         p_raw = orientation_rad["pitch"]
         r_raw = orientation_rad["roll"]
         y_raw = orientation_rad["yaw"]
@@ -192,19 +209,13 @@ class Sensors(object):
         p = math.sin(p_raw)
         r = math.sin(r_raw)
         y = math.sin(y_raw)
-        self.orientationPArray.append(p)
-        if len(self.orientationPArray) > self.dataCount:
-            del(self.orientationPArray[0])
-        self.orientationRArray.append(r)
-        if len(self.orientationRArray) > self.dataCount:
-            del(self.orientationRArray[0])
-        self.orientationYArray.append(y)
-        if len(self.orientationYArray) > self.dataCount:
-            del(self.orientationYArray[0])
+        self.orientationPWindow.appendIfNewer(p, sample["time"])
+        self.orientationRWindow.appendIfNewer(r, sample["time"])
+        self.orientationYWindow.appendIfNewer(y, sample["time"])
             
-        ave_p = statistics.mean(self.orientationPArray)
-        ave_r = statistics.mean(self.orientationRArray)
-        ave_y = statistics.mean(self.orientationYArray)
+        ave_p = self.orientationPWindow.mean()
+        ave_r = self.orientationRWindow.mean()
+        ave_y = self.orientationYWindow.mean()
         delta_p = abs(p - ave_p)
         delta_r = abs(r - ave_r)
         delta_y = abs(y - ave_y)
@@ -219,24 +230,24 @@ class Sensors(object):
         else:
             self.orientationRecentMax["level"] = level
             self.orientationRecentMax["count"] = 0
+        self.boostIfActive("imu", level)
         return level
     
     def getLatestAccelerometerLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の加速度がどの程度絶対値として離れているのかをレベルで返す。
-        最新の加速度を測定し、 self.accelerometerArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.accelerometerArray を最新のものにする。
+        サンプラーが読み取った最新の加速度を、self.accelerometerWindow に追加する。
+        self.accelerometerWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        a_raw = self.sense.accel_raw
+        sample = self.sampler.get("imu")
+        a_raw = sample["value"]["accelerometer"]
         x = a_raw["x"]
         y = a_raw["y"]
         z = a_raw["z"]
         a = math.sqrt(x * x + y * y + z * z)
-        self.accelerometerArray.append(a)
-        if len(self.accelerometerArray) > self.dataCount:
-            del(self.accelerometerArray[0])
-        ave = statistics.mean(self.accelerometerArray)
+        self.accelerometerWindow.appendIfNewer(a, sample["time"])
+        ave = self.accelerometerWindow.mean()
         delta = abs(a - ave)
         level = min(int(delta * Sensors.P_SENSITIVE_ACCEL), 7)
         # print("x:{:+.2f}, y:{:+.2f}, z:{:+.2f}, a:{:+.2f}, delta:{:+.2f}, level: {:d}".format(x, y, z, a, delta, level))
@@ -248,20 +259,20 @@ class Sensors(object):
         else:
             self.accelerometerRecentMax["level"] = level
             self.accelerometerRecentMax["count"] = 0
+        self.boostIfActive("imu", level)
         return level
     
     def getLatestPressureLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の気圧がどの程度絶対値として離れているのかをレベルで返す。
-        最新の気圧を測定し、 self.pressureArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.pressureArray を最新のものにする。
+        サンプラーが読み取った最新の気圧を、self.pressureWindow に追加する。
+        self.pressureWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        p = self.sense.pressure
-        self.pressureArray.append(p)
-        if len(self.pressureArray) > self.dataCount:
-            del(self.pressureArray[0])
-        ave = statistics.mean(self.pressureArray)
+        sample = self.sampler.get("pressure")
+        p = sample["value"]
+        self.pressureWindow.appendIfNewer(p, sample["time"])
+        ave = self.pressureWindow.mean()
         delta = abs(p - ave)
         level = min(int(delta * Sensors.P_SENSITIVE_PRESSURE), 7)
         # print("delta:{0:+.2f}, level: {1:d}".format(delta, level))
@@ -273,6 +284,7 @@ class Sensors(object):
         else:
             self.pressureRecentMax["level"] = level
             self.pressureRecentMax["count"] = 0
+        self.boostIfActive("pressure", level)
         # print("delta:{:+.2f}, level:{:d}, recentMax:{:d}, recentCount:{:d}".format(delta, level, self.pressureRecentMax["level"], self.pressureRecentMax["count"]))
         return level
 
@@ -281,7 +293,7 @@ class Sensors(object):
         showActualData が True の時は、実際のセンサーデータに基づく表示をする。
         False の時は、Level = 0 という固定の表示だけをするが、センサーデータは蓄積する。
         """
-        screen = copy.copy(Sensors.normal_screen)
+        screen = Screen(Sensors.palette) # 黒で初期化される
         if showActualData:
             screen[1 * 8: (1 + 1) * 8] = self.getRowPixelsOfLevel(self.getLatestTemperatureLevel(), self.temperatureRecentMax["level"], Sensors.Temperature)
             screen[2 * 8: (2 + 1) * 8] = self.getRowPixelsOfLevel(self.getLatestHumidityLevel(), self.humidityRecentMax["level"], Sensors.Humidity)
@@ -302,37 +314,29 @@ class Sensors(object):
             screen[4 * 8: (4 + 1) * 8] = self.getRowPixelsOfLevel(0, 0, Sensors.Orientation)
             screen[5 * 8: (5 + 1) * 8] = self.getRowPixelsOfLevel(0, 0, Sensors.Accelerometer)
             screen[6 * 8: (6 + 1) * 8] = self.getRowPixelsOfLevel(0, 0, Sensors.Pressure)
-        self.sense.set_pixels(screen)
+        self.sense.set_pixels(screen.toPixels())
 
     def run(self):
         print(self.__class__.__name__ + " is running")
-        startTime = lastFrameTime = time.monotonic()
+        self.sampler.start()
+        scheduler = FrameScheduler(Sensors.P_FRAME_TIME)
+        startTime = time.monotonic()
         # 最初の P_DURATIUON / 3 秒間だけは、データを取得するだけで表示は固定
         while not self.shouldExit:
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
-            if now - startTime < Sensors.P_DURATIUON / 3:
+            if time.monotonic() - startTime < Sensors.P_DURATIUON / 3:
                 self.getSensorDataAndDisplay(False)
             else:
                 break
-            
-            if Sensors.P_FRAME_TIME - duration >0:
-                time.sleep(Sensors.P_FRAME_TIME - duration)
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}, duration = {:.2f}".format(Sensors.P_FRAME_TIME, duration))
+            scheduler.waitForNextFrame()
 
         # その後は通常通り
         while not self.shouldExit:
             self.getSensorDataAndDisplay(True)
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
-            if Sensors.P_FRAME_TIME - duration >0:
-                time.sleep(Sensors.P_FRAME_TIME - duration)
-            else:
-                print("フレーム落ち P_FRAME_TIME = {:.2f}, duration = {:.2f}".format(Sensors.P_FRAME_TIME, duration))
+            scheduler.waitForNextFrame()
 
+        self.sampler.stop()
+        print(self.sampler.getStatsText())
+        print(scheduler.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+import time, collections
+
+class SlidingWindow(object):
+    """
+    過去 duration 秒間のセンサー値を保持し、平均と最大値を返す。
+    値の追加、古い値の削除、平均と最大値の取得は、どれも（償却）O(1) である。
+    平均は合計値を逐次更新して求め、最大値は単調減少の deque で求める。
+    """
+    P_RESUM_INTERVAL = 1024 # この回数だけ値を追加するごとに、浮動小数点の誤差を避けるために合計値を計算し直す
+
+    def __init__(self, duration):
+        self.duration = duration # 値を保持する秒数
+        self.samples = collections.deque() # (時刻, 値) の配列。古いものが先頭
+        self.maxCandidates = collections.deque() # 最大値の候補の (時刻, 値) の配列。値は単調減少で、先頭が最大値
+        self.maxCandidatesDirty = False # pop() により maxCandidates を作り直す必要があるかどうか
+        self.total = 0.0 # samples の値の合計
+        self.appendCount = 0
+        self.lastAppendTime = None # 最後に append() した時刻。pop() しても元に戻らない
+
+    def __len__(self):
+        return len(self.samples)
+
+    def append(self, value, now=None):
+        """
+        最新の値を追加し、duration 秒より古い値を削除する。
+        """
+        if now is None:
+            now = time.monotonic()
+        self.lastAppendTime = now
+        self.samples.append((now, value))
+        self.total += value
+        if not self.maxCandidatesDirty:
+            while len(self.maxCandidates) > 0 and self.maxCandidates[-1][1] <= value:
+                self.maxCandidates.pop()
+            self.maxCandidates.append((now, value))
+        self.removeExpired(now)
+        self.appendCount += 1
+        if self.appendCount % SlidingWindow.P_RESUM_INTERVAL == 0:
+            self.total = sum(v for t, v in self.samples)
+
+    def appendIfNewer(self, value, now):
+        """
+        now が最後に append() した時刻より新しい場合にだけ値を追加する。
+        同じセンサーの読み取り結果を、フレームごとに重複して追加しないために使う。
+        追加した場合は True を返す。
+        """
+        if self.lastAppendTime is not None and now <= self.lastAppendTime:
+            return False
+        self.append(value, now)
+        return True
+
+    def removeExpired(self, now):
+        """
+        duration 秒より古い値を削除する。ただし、最新の値は必ず残す。
+        """
+        limit = now - self.duration
+        while len(self.samples) > 1 and self.samples[0][0] <= limit:
+            t, v = self.samples.popleft()
+            self.total -= v
+        while len(self.maxCandidates) > 1 and self.maxCandidates[0][0] <= limit:
+            self.maxCandidates.popleft()
+
+    def pop(self):
+        """
+        最新の値を取り除いて返す。
+        最大値の候補は次に max() を呼んだ時に作り直す（O(n)）。
+        """
+        t, v = self.samples.pop()
+        self.total -= v
+        self.maxCandidatesDirty = True
+        return v
+
+    def latest(self):
+        return self.samples[-1][1]
+
+    def mean(self):
+        return self.total / len(self.samples)
+
+    def max(self):
+        if self.maxCandidatesDirty:
+            self.maxCandidates.clear()
+            for t, v in self.samples:
+                while len(self.maxCandidates) > 0 and self.maxCandidates[-1][1] <= v:
+                    self.maxCandidates.pop()
+                self.maxCandidates.append((t, v))
+            self.maxCandidatesDirty = False
+        return self.maxCandidates[0][1]
@@ -1,6 +1,13 @@
 from sense_hat import SenseHat, ACTION_PRESSED, ACTION_HELD, ACTION_RELEASED
-import time, math, statistics, colorsys
-import numpy as np
+import time, math, random
+from indexedScreen import Palette
+from rainbow import Rainbow
+from slidingWindow import SlidingWindow
+from sensorSampler import SensorSampler
+from frameScheduler import FrameScheduler
+from textRenderer import TextRenderer, TextScroller
+from tileMap import StreamingTileMap, SpriteSheet, Sprite, CollisionIndex, TileMapRenderer
+from asyncRuntime import wait
 
 class Space(object):
     """
@@ -12,11 +19,13 @@ class Space(object):
     P_SENSITIVE_ROLL = 2.0 # Sensibility for orientation roll. 前後の傾き
     P_SPACE_ROW_LENGTH = 100 # 宇宙全体の行の長さ
     P_METEORITE_RATIO = 0.5 # 隕石が1行あたりに出現する頻度。ゲームの難易度を調節できる。0.5: 難しい、0.3: 普通。
+    P_ENDLESS = False # True にすると、ゴールも最強の敵もなく、クラッシュするまで宇宙が続く
     P_FRAME_TIME = 0.1 # フレーム間の時間（秒）
     P_SENSITIVE_TEMP = 7/0.7 # Sensibility for temperature
     P_SENSITIVE_ORIENT = 7/1.1  # Sensibility for orientation
     P_SENSITIVE_MAGNET = 7/100.0 # Sensibility for magnetometer
     P_DURATIUON = 3.0 # Seconds of duration in which sensor data are counted for average calculation
+    P_SAMPLING_INTERVAL = 0.05 # センサーを読み取る間隔（秒）
 
     red = R = [255, 0, 0]
     green = G = [0, 255, 0]
@@ -36,6 +45,8 @@ class Space(object):
     Orientation = B # 最強の敵の色 湿度
     Magnetometer = Y # 最強の敵の色 磁力
 
+    palette = Palette([O, R, G, B, C, K, A, Y, W, GR]) # 宇宙全体と画面は、このパレットのインデックスで表す
+
     menuItemPixels = [
     C , GR, GR,  Y,  Y, GR,
     GR, GR,  A,  A, GR,  C
@@ -246,26 +257,40 @@ class Space(object):
     ]]
     ]
 
-    def __init__(self, sense):
+    # 最強の敵の色から、enemyPixelsLayouts の各レイアウトをその色の SpriteSheet に変換したもののタプルへの辞書。
+    # compileEnemyLayouts() で、インポート時に1度だけ作る。
+    enemySheets = None
+
+    def __init__(self, sense, seed=None, endless=P_ENDLESS):
         self.sense = sense
+        # 同じ seed からは、いつも同じ宇宙が作られる
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.endless = endless
         self.sense.stick.direction_any = self.joystick_any
         self.shouldExit = False
-        # 宇宙全体を表す配列。色を表すタプルが要素。要素の個数は 8 x P_SPACE_ROW_LENGTH 個 である。
+        # 宇宙全体の隕石を表す地図。色を表すパレットのインデックスが要素。横 8 列、縦 P_SPACE_ROW_LENGTH 行である。
         # また、0行目が画面表示上の一番上であり、スクロールされて最後に表示される行である。
-        self.spaceArray = []
+        # 隕石は、スクロールして表示する直前に生成し、通り過ぎたら捨てる。endless の場合は、0行目より上（負の行）にも続く。
+        self.spaceMap = None
+        self.renderer = None # spaceMap と、最強の敵と宇宙船を合成して、画面を作る
+        self.collisionIndex = None # spaceMap と、最強の敵と宇宙船の当たり判定をする
+        self.enemySprite = None # 最強の敵
+        self.shipSprite = None # 宇宙船
         self.currentScroll = 0 # int型。0 は、一番下の行が表示されている状態。この数字は大きくなるのみ、決して小さくならない。
         self.currentScrollPh = 0.0 # float型。self.currentScroll の算出の基となる数字。この数字は大きくなるのみ、決して小さくならない。
         self.ship_x = 3 # 宇宙船の現在の x 軸のピクセル上の位置
-        self.selectedEnemyPixelsLayout = None # 選択された最強の敵を表すピクセル群から成るレイアウト
         self.enemyStartRow = 8 + 8 # ゴールまで進まなければいけない場所の手前8個行目から最強の敵を表示する
         self.enemyFunction = None # 最強の敵をやっつけるための関数
         self.enemyColor = None # 最強の敵の色
-        self.temperatureArray = []
-        self.orientationPArray = []
-        self.orientationRArray = []
-        self.orientationYArray = []
-        self.magnetometerArray = []
-        self.dataCount = Space.P_DURATIUON / Space.P_FRAME_TIME
+        self.enemyColorIndex = 0 # 最強の敵の色のパレットのインデックス
+        self.temperatureWindow = SlidingWindow(Space.P_DURATIUON)
+        self.orientationPWindow = SlidingWindow(Space.P_DURATIUON)
+        self.orientationRWindow = SlidingWindow(Space.P_DURATIUON)
+        self.orientationYWindow = SlidingWindow(Space.P_DURATIUON)
+        self.magnetometerWindow = SlidingWindow(Space.P_DURATIUON)
+        # センサーはバックグラウンドで読み取る
+        self.sampler = SensorSampler(sense, {name: Space.P_SAMPLING_INTERVAL for name in ["orientation", "temperature", "compass"]})
+        self.textRenderer = TextRenderer(sense) # 文字のピクセルを1度だけ読み取ってキャッシュする
 
     @classmethod
     def getName(cls):
@@ -283,39 +308,74 @@ class Space(object):
         if event.action == ACTION_RELEASED:
             self.shouldExit = True
 
-    def initSpaceArray(self):
+    def initSpaceMap(self):
         """
-        宇宙全体を表す配列を初期化する。ランダムに構成される要素もある。
-        また、スクロール0の状態のそれを画面を表示する。
+        宇宙全体を表す地図と、最強の敵と宇宙船を初期化する。ランダムに構成される要素もある。
+        隕石は、ここでは生成しない。
         """
-        self.spaceArray = [Space.O for i in range(8 * Space.P_SPACE_ROW_LENGTH)]
-        # 隕石をちりばめる。ただし、最下部の5行と最上部の8行を除く。また、最下部から5行目には必ず1つ隕石がある。
-        randomRows = np.random.choice(np.array([i for i in range(8, Space.P_SPACE_ROW_LENGTH - 7)]), int(Space.P_METEORITE_RATIO * (Space.P_SPACE_ROW_LENGTH - 7 - 8)), replace=False)
-        randomRows = np.append(randomRows, Space.P_SPACE_ROW_LENGTH - 7)
-        for row in randomRows:
-            randomColum = np.random.randint(8)
-            self.spaceArray[row*8 + randomColum] = Space.meteorite
+        print("seed = {}".format(self.seed))
+        rand = random.Random(self.seed)
         # 最後の少し手前に、最強の敵が現れる
-        self.enemyFunction = np.random.choice([self.checkTemperature, self.checkOrientation, self.checkMagnetometer], 1, replace=False)
+        self.enemyFunction = rand.choice([self.checkTemperature, self.checkOrientation, self.checkMagnetometer])
         self.enemyColor = Space.Temperature if self.enemyFunction == self.checkTemperature else (Space.Orientation if self.enemyFunction == self.checkOrientation else Space.Magnetometer)
-        self.selectedEnemyPixelsLayout = self.enemyPixelsLayouts[np.random.randint(len(self.enemyPixelsLayouts))]
-        # レイアウトのセルの色をすべて、敵の色に変更する
-        for l in range(len(self.selectedEnemyPixelsLayout)):
-            self.selectedEnemyPixelsLayout[l] = [self.enemyColor if i != Space.O else Space.O for i in self.selectedEnemyPixelsLayout[l]]
-        self.spaceArray[self.enemyStartRow * 8 : self.enemyStartRow * 8 + len(self.selectedEnemyPixelsLayout)] = self.selectedEnemyPixelsLayout[0]
+        self.enemyColorIndex = Space.palette.getIndex(self.enemyColor)
+        layoutIndex = rand.randrange(len(self.enemyPixelsLayouts))
+        # 敵の色に変換済みのフレームを共有するので、ここではコピーも変換もしない
+        self.enemySprite = Sprite(Space.enemySheets[tuple(self.enemyColor)][layoutIndex], row=self.enemyStartRow)
+        self.enemySprite.visible = not self.endless
+        self.spaceMap = StreamingTileMap(self.generateMeteorites, None if self.endless else Space.P_SPACE_ROW_LENGTH)
+        ship = Space.palette.getIndex(Space.ship)
+        self.shipSprite = Sprite([bytes([ship, ship])], width=2)
+        self.renderer = TileMapRenderer(Space.palette, self.spaceMap)
+        self.renderer.addSprite(self.enemySprite)
+        self.renderer.addSprite(self.shipSprite)
+        self.collisionIndex = CollisionIndex(self.spaceMap)
+        self.collisionIndex.addSprite(self.enemySprite)
+        self.collisionIndex.addSprite(self.shipSprite)
+
+    def generateMeteorites(self, spaceMap, firstRow, endRow):
+        """
+        firstRow 行目から endRow - 1 行目までに隕石をちりばめる。1行には多くても1つの隕石しか置かない。
+        ただし、最下部の5行と最上部の8行と、最強の敵がいる行を除く。また、最下部から5行目には必ず1つ隕石がある。
+        endless の場合は、最上部の8行と最強の敵がいる行も、他の行と同じように隕石を置く。
+        乱数は seed と firstRow から決めるので、どの順番で生成しても、同じ seed からはいつも同じ隕石になる。
+        """
+        rand = random.Random("{}:{}".format(self.seed, firstRow))
+        meteorite = Space.palette.getIndex(Space.meteorite)
+        rows = [row for row in range(firstRow, endRow) if row < Space.P_SPACE_ROW_LENGTH - 7 and (self.endless or (row >= 8 and not self.enemyStartRow <= row < self.enemyStartRow + self.enemySprite.height))]
+        for row in rand.sample(rows, int(Space.P_METEORITE_RATIO * len(rows))):
+            spaceMap.set(rand.randrange(8), row, meteorite)
+        if firstRow <= Space.P_SPACE_ROW_LENGTH - 7 < endRow:
+            spaceMap.set(rand.randrange(8), Space.P_SPACE_ROW_LENGTH - 7, meteorite)
+
+    def getTopRow(self):
+        """
+        今のスクロールの状態で、画面の一番上に表示される地図の行の番号を返す。
+        """
+        return Space.P_SPACE_ROW_LENGTH - self.currentScroll - 8
+
+    @classmethod
+    def compileEnemyLayouts(cls):
+        """
+        最強の敵のレイアウトを、最強の敵の色ごとに、セルの色をすべてその色のインデックスに変換した SpriteSheet にして、
+        cls.enemySheets に入れる。
+        """
+        cls.enemySheets = {}
+        for color in [cls.Temperature, cls.Orientation, cls.Magnetometer]:
+            index = cls.palette.getIndex(color)
+            cls.enemySheets[tuple(color)] = tuple(SpriteSheet([bytes(index if c != cls.O else 0 for c in pixels) for pixels in layout]) for layout in cls.enemyPixelsLayouts)
 
     def getLatestTemperatureLevel(self):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の温度がどの程度絶対値として離れているのかをレベルで返す。
-        最新の温度を測定し、 self.temperatureArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.temperatureArray を最新のものにする。
+        サンプラーが読み取った最新の温度を、self.temperatureWindow に追加する。
+        self.temperatureWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        t = self.sense.temperature
-        self.temperatureArray.append(t)
-        if len(self.temperatureArray) > self.dataCount:
-            del(self.temperatureArray[0])
-        ave = statistics.mean(self.temperatureArray)
+        sample = self.sampler.get("temperature")
+        t = sample["value"]
+        self.temperatureWindow.appendIfNewer(t, sample["time"])
+        ave = self.temperatureWindow.mean()
         delta = abs(t - ave)
         level = min(int(delta * Space.P_SENSITIVE_TEMP), 7)
         return level
@@ -334,10 +394,11 @@ class Space(object):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の傾きがどの程度絶対値として離れているのかをレベルで返す。
-        最新の傾きを測定し、 self.orientationPArray, self.orientationRArray, self.orientationYArray, の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.orientationArray を最新のものにする。
+        サンプラーが読み取った最新の傾きを、self.orientationPWindow, self.orientationRWindow, self.orientationYWindow に追加する。
+        これらは過去 P_DURATIUON 秒分の値を保つ。
         """
-        orientation_rad = self.sense.get_orientation_radians()
+        sample = self.sampler.get("orientation")
+        orientation_rad = sample["value"]
         p_raw = orientation_rad["pitch"]
         r_raw = orientation_rad["roll"]
         y_raw = orientation_rad["yaw"]
@@ -345,19 +406,13 @@ class Space(object):
         p = math.sin(p_raw)
         r = math.sin(r_raw)
         y = math.sin(y_raw)
-        self.orientationPArray.append(p)
-        if len(self.orientationPArray) > self.dataCount:
-            del(self.orientationPArray[0])
-        self.orientationRArray.append(r)
-        if len(self.orientationRArray) > self.dataCount:
-            del(self.orientationRArray[0])
-        self.orientationYArray.append(y)
-        if len(self.orientationYArray) > self.dataCount:
-            del(self.orientationYArray[0])
+        self.orientationPWindow.appendIfNewer(p, sample["time"])
+        self.orientationRWindow.appendIfNewer(r, sample["time"])
+        self.orientationYWindow.appendIfNewer(y, sample["time"])
             
-        ave_p = statistics.mean(self.orientationPArray)
-        ave_r = statistics.mean(self.orientationRArray)
-        ave_y = statistics.mean(self.orientationYArray)
+        ave_p = self.orientationPWindow.mean()
+        ave_r = self.orientationRWindow.mean()
+        ave_y = self.orientationYWindow.mean()
         delta_p = abs(p - ave_p)
         delta_r = abs(r - ave_r)
         delta_y = abs(y - ave_y)
@@ -379,18 +434,17 @@ class Space(object):
         """ 
         0から7までのレベルの値を返す。
         過去の平均と比べて最新の磁力がどの程度絶対値として離れているのかをレベルで返す。
-        最新の磁力を測定し、 self.magnetometerArray の最後に追加する。
-        過去何秒分(P_DURATION秒)に相当する数を保つように self.magnetometerArray を最新のものにする。
+        サンプラーが読み取った最新の磁力を、self.magnetometerWindow に追加する。
+        self.magnetometerWindow は過去 P_DURATIUON 秒分の値を保つ。
         """
-        m_raw = self.sense.get_compass_raw()
+        sample = self.sampler.get("compass")
+        m_raw = sample["value"]
         x = m_raw["x"]
         y = m_raw["y"]
         z = m_raw["z"]
         m = math.sqrt(x * x + y * y + z * z)
-        self.magnetometerArray.append(m)
-        if len(self.magnetometerArray) > self.dataCount:
-            del(self.magnetometerArray[0])
-        ave = statistics.mean(self.magnetometerArray)
+        self.magnetometerWindow.appendIfNewer(m, sample["time"])
+        ave = self.magnetometerWindow.mean()
         delta = abs(m - ave)
         level = min(int(delta * Space.P_SENSITIVE_MAGNET), 7)
         return level
@@ -406,78 +460,89 @@ class Space(object):
             return False
     
     def goGoal(self):
+        """
+        ゴール時の処理をする。"GOAL!!" を1文字ずつ、背景の色を変えながら表示する。
+        文字の画面は、キャッシュした文字のピクセルから作るので、毎回 show_letter() で読み取り直すことはない。
+        """
         letters = "GOAL!!"
         count = 0
         while not self.shouldExit:
             letter = letters[int(count / 40) % len(letters)]
-            color = colorsys.hsv_to_rgb(count * 0.005, 1.0, 1.0)
-            color = (int(color[0]*255), int(color[1]*255), int(color[2]*255))
-            self.sense.show_letter(letter, Space.O, color)
+            color = Rainbow.getColor(count * 0.005)
+            self.sense.set_pixels(self.textRenderer.getLetterFrame(letter, Space.O, color))
             count += 1
             time.sleep(0.01)
 
-    def goCrushed(self, screen):
+    def goCrushed(self):
         """
-        クラッシュ時の処理をする。宇宙船を点滅させる。
+        クラッシュ時の処理をする。宇宙船を点滅させた後、"Bye" をスクロールさせて表示する。
+        スクロールはブロックしないので、終了の操作にはスクロールの途中でもすぐに応じる。
         """
-        currentColor = Space.crushed
+        self.shipSprite.visible = False
+        screen = self.renderer.render(self.getTopRow()).copy()
+        crushed = Space.palette.getIndex(Space.crushed)
+        currentColor = crushed
         for i in range(5):
             screen[7*8 + self.ship_x : 7*8 + self.ship_x + 2] = [currentColor for j in range(2)]
-            self.sense.set_pixels(screen)
-            time.sleep(0.3)
-            currentColor = Space.O if currentColor == Space.crushed else Space.crushed
+            self.sense.set_pixels(screen.toPixels())
+            wait(self.sense, 0.3)
+            currentColor = 0 if currentColor == crushed else crushed
             if self.shouldExit:
                 break
-        isFirst = True
+        scroller = TextScroller(self.sense, self.textRenderer)
+        scroller.start("Bye")
         while not self.shouldExit:
-            self.sense.show_message(("" if isFirst else " ") + "Bye")
-            isFirst = False
+            if not scroller.isScrolling():
+                scroller.start(" Bye")
+            scroller.update()
+            time.sleep(max(scroller.getNextFrameTime() - time.monotonic(), 0.0))
     
-    def checkHit(self, screen):
+    def checkHit(self):
         """
         隕石あるいは敵に、宇宙船が当たったかどうかをチェックする。
         当たっていれば True を、そうでなければ False を返す。
         """
-        for i in range(7*8 + self.ship_x, 7*8 + self.ship_x + 2):
-            if screen[i] != Space.O:
-                return True
-        return False
+        return self.collisionIndex.collides(self.shipSprite, self.ship_x, self.getTopRow() + 7)
 
     def animateEnemy(self, enemyFrame, lastEnemySelectedIndex):
         """
         最強の敵が表示されている際に、選択されているレイアウトの中でアニメーション処理をする
         """
-        selectedIndex = int(enemyFrame / 2.5) % len(self.selectedEnemyPixelsLayout)
+        selectedIndex = int(enemyFrame / 2.5) % len(self.enemySprite.sheet)
         if lastEnemySelectedIndex != selectedIndex:
-            self.spaceArray[self.enemyStartRow * 8 : self.enemyStartRow * 8 + len(self.selectedEnemyPixelsLayout[selectedIndex])] = self.selectedEnemyPixelsLayout[selectedIndex]
+            self.enemySprite.frameIndex = selectedIndex
         return selectedIndex
 
     def destroyEnemy(self):
         """
-        最強の敵が攻撃されて破壊される処理
+        最強の敵が攻撃されて破壊される処理。最強の敵を点滅させた後、表示しないようにする。
+        点滅の途中でも、終了の操作にすぐに応じる。
         """
-        screen0 = self.spaceArray[(self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8 - 64 : (self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8]
-        screen0[7*8 + self.ship_x : 7*8 + self.ship_x + 2] = [Space.ship, Space.ship] # 宇宙船
-        screen1 = [color if color != self.enemyColor else Space.O for color in screen0]
-        screen1[7*8 + self.ship_x : 7*8 + self.ship_x + 2] = [Space.ship, Space.ship] # 宇宙船
+        top = self.getTopRow()
+        self.shipSprite.moveTo(self.ship_x, top + 7)
+        self.enemySprite.visible = True
+        screen0 = self.renderer.render(top)
+        self.enemySprite.visible = False
+        screen1 = self.renderer.render(top)
         for i in range(21):
+            if self.shouldExit:
+                break
             screen = screen1 if i % 2 == 0 else screen0
-            self.sense.set_pixels(screen)
-            time.sleep(0.1 if i >= 11 else (0.2 if i >= 5 else 0.4))
-        # spaceArray そのものを更新する
-        screen0 = self.spaceArray[0 : (self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8]
-        self.spaceArray[0 : (self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8] = [color if color != self.enemyColor else Space.O for color in screen0]
+            self.sense.set_pixels(screen.toPixels())
+            wait(self.sense, 0.1 if i >= 11 else (0.2 if i >= 5 else 0.4))
 
     def run(self):
         print(self.__class__.__name__ + " is running")
         self.sense.clear()
-        self.initSpaceArray()
-        lastFrameTime = time.monotonic()
+        self.initSpaceMap()
+        self.sampler.start()
+        scheduler = FrameScheduler(Space.P_FRAME_TIME)
         enemyFrame = 0 # 最強の敵が表示されている際にカウントするフレーム数
         lastEnemySelectedIndex = -1 # # 最強の敵のアニメーション用の、 8 x n 個のピクセル配列を示すインデックスで最後に使用したもの
         enemyDestroyed = False
+        lastScreen = None # 最後に書き込んだ画面
         while not self.shouldExit:
-            orientation_rad = self.sense.get_orientation_radians()
+            orientation_rad = self.sampler.get("orientation")["value"]
             #print("p: {pitch}, r: {roll}, y: {yaw}".format(**orientation_rad))
             p = orientation_rad["pitch"]
             roll = orientation_rad["roll"]
@@ -491,34 +556,38 @@ class Space(object):
             self.currentScrollPh += y
             self.currentScroll = int(self.currentScrollPh)
 
-            now = time.monotonic()
-            duration = now - lastFrameTime
-            lastFrameTime = now
-
-            attacked = self.enemyFunction[0]() # 常にセンサーデータを取得するため、ここで実行すべき
+            attacked = self.enemyFunction() # 常にセンサーデータを取得するため、ここで実行すべき
             # 最強の敵が表示されているスクロール状態であるかどうかをチェック
-            if self.P_SPACE_ROW_LENGTH - self.currentScroll - 7 <= self.enemyStartRow + int(len(self.selectedEnemyPixelsLayout[0])/8) and not enemyDestroyed:
+            if not self.endless and self.P_SPACE_ROW_LENGTH - self.currentScroll - 7 <= self.enemyStartRow + self.enemySprite.height and not enemyDestroyed:
                 # 最強の敵が表示されている、かつ最強の敵が破壊されていない。
                 lastEnemySelectedIndex = self.animateEnemy(enemyFrame, lastEnemySelectedIndex)
                 enemyFrame += 1
                 if attacked:
                     self.destroyEnemy()
                     enemyDestroyed = True
-            screen = self.spaceArray[(self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8 - 64 : (self.P_SPACE_ROW_LENGTH - self.currentScroll) * 8]
-            if self.checkHit(screen):
-                self.goCrushed(screen)
+            if self.checkHit():
+                self.goCrushed()
             else:
-                screen[7*8 + self.ship_x : 7*8 + self.ship_x + 2] = [Space.ship, Space.ship] # 宇宙船
-                self.sense.set_pixels(screen)
-                if self.currentScroll >= Space.P_SPACE_ROW_LENGTH - 8:
+                top = self.getTopRow()
+                self.shipSprite.moveTo(self.ship_x, top + 7)
+                screen = self.renderer.render(top)
+                # 前回と同じ画面であれば、書き込まない
+                if screen is not lastScreen:
+                    self.sense.set_pixels(screen.toPixels())
+                    lastScreen = screen
+                # 通り過ぎた隕石は捨てる
+                self.spaceMap.discardRows(top, top + 8)
+                if not self.endless and self.currentScroll >= Space.P_SPACE_ROW_LENGTH - 8:
                     self.goGoal()
                     break
-                if Space.P_FRAME_TIME - duration >0:
-                    time.sleep(Space.P_FRAME_TIME - duration)
-                else:
-                    print("フレーム落ち P_FRAME_TIME = {:.2f}".format(Space.P_FRAME_TIME))
+                scheduler.waitForNextFrame()
+        self.sampler.stop()
+        print(scheduler.getStatsText())
+        print(self.renderer.getStatsText())
         print(self.__class__.__name__ + " is exiting")
 
+Space.compileEnemyLayouts()
+
 if __name__ == '__main__':
     sense = SenseHat()
     space = Space(sense)
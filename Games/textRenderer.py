@@ -0,0 +1,129 @@
+import time
+
+class TextRenderer(object):
+    """
+    sense.show_message() や sense.show_letter() と同じ画面を、ブロックせずに作る。
+    文字のピクセルは、最初に使った時に1度だけ sense._get_char_pixels() から読み取り、
+    1列（8ピクセル）を1つの整数のビットで表した5列分のタプルとして、self.glyphs にキャッシュする。
+    show_message() は画面を 90 度回転させて、文字の列を行として書き込んでいるので、
+    ここでは回転させない画面の座標に変換している。
+    """
+    P_GLYPH_WIDTH = 5 # 1文字の列の数
+    P_GLYPH_HEIGHT = 8 # 1列のピクセルの数
+
+    def __init__(self, sense):
+        self.sense = sense
+        self.glyphs = {} # 文字から、5列分のビットのタプルへの辞書
+        self.columnsCache = {} # 文字列から、スクロールする列のビットのタプルへの辞書
+        self.rasterizeCount = 0 # 文字のピクセルを読み取った回数
+
+    def getGlyph(self, s):
+        """
+        文字の5列分のビットのタプルを返す。ビット j が 1 であれば、その列の j 番目のピクセルが文字の色である。
+        """
+        glyph = self.glyphs.get(s)
+        if glyph is None:
+            pixels = self.sense._get_char_pixels(s)
+            glyph = tuple(
+                sum(1 << j for j in range(TextRenderer.P_GLYPH_HEIGHT) if list(pixels[i * TextRenderer.P_GLYPH_HEIGHT + j]) == [255, 255, 255])
+                for i in range(TextRenderer.P_GLYPH_WIDTH))
+            self.glyphs[s] = glyph
+            self.rasterizeCount += 1
+        return glyph
+
+    def getMessageColumns(self, text_string):
+        """
+        show_message() でスクロールする列のビットのタプルを返す。
+        左右に 8 列の余白があり、空白でない文字は左右の何も描かれていない列を取り除き、文字の間には 1 列の空白を入れる。
+        """
+        columns = self.columnsCache.get(text_string)
+        if columns is None:
+            columns = [0 for i in range(8)] # 左の余白
+            for s in text_string:
+                glyph = list(self.getGlyph(s))
+                if any(glyph):
+                    while glyph[0] == 0:
+                        del glyph[0]
+                    while glyph[-1] == 0:
+                        del glyph[-1]
+                columns.extend(glyph)
+                columns.append(0) # 文字の間の空白
+            columns.extend([0 for i in range(8)]) # 右の余白
+            columns = self.columnsCache[text_string] = tuple(columns)
+        return columns
+
+    def getMessageFrameCount(self, text_string):
+        return len(self.getMessageColumns(text_string)) - 8
+
+    def getFrame(self, columns, start, text_colour, back_colour):
+        """
+        columns の start 列目から 8 列分を、64 個の色の配列で返す。
+        """
+        text_colour = list(text_colour)
+        back_colour = list(back_colour)
+        frame = []
+        for y in range(8):
+            bit = 1 << (7 - y)
+            for x in range(8):
+                frame.append(text_colour if columns[start + x] & bit else back_colour)
+        return frame
+
+    def iterateMessageFrames(self, text_string, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        """
+        show_message() と同じスクロールの画面を、1画面ずつ返すジェネレーター。
+        """
+        columns = self.getMessageColumns(text_string)
+        for start in range(len(columns) - 8):
+            yield self.getFrame(columns, start, text_colour, back_colour)
+
+    def getLetterFrame(self, s, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        """
+        show_letter() と同じ画面を返す。左に 1 列、右に 2 列の空白を入れ、列は取り除かない。
+        """
+        return self.getFrame((0,) + self.getGlyph(s) + (0, 0), 0, text_colour, back_colour)
+
+
+class TextScroller(object):
+    """
+    文字をスクロールさせて表示する。show_message() と違い、呼び出し元をブロックしない。
+    ゲームのループの中で毎フレーム update() を呼ぶと、表示する時刻になった画面だけを書き込む。
+    処理が遅れた場合は、途中の画面を飛ばして、その時刻の画面を表示する。
+    """
+
+    def __init__(self, sense, renderer=None, scroll_speed=0.1):
+        self.sense = sense
+        self.renderer = TextRenderer(sense) if renderer is None else renderer
+        self.scroll_speed = scroll_speed # 1画面を表示する時間（秒）
+        self.frames = None # 表示中の画面のジェネレーター
+        self.nextFrameTime = 0.0 # 次の画面を表示する時刻（time.monotonic()）
+
+    def start(self, text_string, text_colour=(255, 255, 255), back_colour=(0, 0, 0)):
+        self.frames = self.renderer.iterateMessageFrames(text_string, text_colour, back_colour)
+        self.nextFrameTime = time.monotonic()
+
+    def isScrolling(self):
+        return self.frames is not None
+
+    def getNextFrameTime(self):
+        return self.nextFrameTime
+
+    def update(self):
+        """
+        表示する時刻になった画面があれば書き込む。最後の画面を表示し終えたら、isScrolling() が False になる。
+        画面を書き込んだ場合は True を返す。
+        """
+        if self.frames is None:
+            return False
+        now = time.monotonic()
+        frame = None
+        while self.frames is not None and self.nextFrameTime <= now:
+            nextFrame = next(self.frames, None)
+            if nextFrame is None:
+                self.frames = None
+            else:
+                frame = nextFrame
+                self.nextFrameTime += self.scroll_speed
+        if frame is None:
+            return False
+        self.sense.set_pixels(frame)
+        return True
@@ -0,0 +1,284 @@
+from indexedScreen import Screen
+
+def shiftMask(mask, x):
+    """
+    列 0 を基準にした行のビットマスクを、x 列だけ右にずらす。画面の外（8 列目以降と負の列）にはみ出したビットは捨てる。
+    """
+    mask = mask << x if x >= 0 else mask >> -x
+    return mask & 0xFF
+
+class TileMap(object):
+    """
+    横 8 列、縦 rowCount 行の地図。要素はパレットのインデックスで、0 は何もない（黒）を表す。
+    rowCount が None の場合は、行の数に上限がなく、行の番号は負の数でもよい。
+    rowCount を指定した場合は、0 行目から rowCount - 1 行目までだけが地図で、その外の行は読むと何もなく、set() しても何も置かれない。
+    何かが置かれている行だけを、行の番号から 8 バイトの配列への辞書で持つので、
+    行の数が多くても、メモリと1画面分の読み出しの時間は、置かれている物の数だけで決まる。
+    当たり判定のために、各行の何かが置かれている列を、ビット x が列 x を表すビットマスクとしても持つ。
+    0行目が一番上の行である。
+    """
+    P_WIDTH = 8 # 列の数
+
+    EMPTY_ROW = bytes(P_WIDTH) # 何も置かれていない行
+
+    def __init__(self, rowCount):
+        self.rowCount = rowCount
+        self.rows = {} # 行の番号から、その行の bytearray への辞書
+        self.masks = {} # 行の番号から、その行の何かが置かれている列のビットマスクへの辞書
+        self.version = 0 # 書き換えるたびに増える。TileMapRenderer が、描き直しが必要かどうかの判定に使う
+
+    def isInside(self, row):
+        return self.rowCount is None or 0 <= row < self.rowCount
+
+    def get(self, x, row):
+        line = self.rows.get(row)
+        return 0 if line is None else line[x]
+
+    def set(self, x, row, index):
+        if not self.isInside(row):
+            return
+        line = self.rows.get(row)
+        if line is None:
+            if index == 0:
+                return
+            line = self.rows[row] = bytearray(TileMap.P_WIDTH)
+        line[x] = index
+        if index == 0:
+            self.masks[row] = self.masks.get(row, 0) & ~(1 << x)
+        else:
+            self.masks[row] = self.masks.get(row, 0) | (1 << x)
+        self.version += 1
+
+    def getMask(self, row):
+        return self.masks.get(row, 0)
+
+    def getRow(self, row):
+        line = self.rows.get(row)
+        return TileMap.EMPTY_ROW if line is None else line
+
+
+class StreamingTileMap(TileMap):
+    """
+    必要になった行だけを生成する地図。行は P_CHUNK_SIZE 行ずつのまとまり（チャンク）で、
+    そのチャンクの行が初めて読み出された時に generateChunk(tileMap, firstRow, endRow) を呼んで生成する。
+    generateChunk は、firstRow 行目から endRow - 1 行目までに set() で物を置く。
+    discardRows() で表示しなくなったチャンクを捨てられるので、rowCount が None でも、メモリの使用量は一定である。
+    rowCount を指定した場合は、0 行目から rowCount - 1 行目までだけを生成し、generateChunk に渡す範囲もその中に収める。
+    """
+    P_CHUNK_SIZE = 32 # 1つのチャンクの行の数
+
+    def __init__(self, generateChunk, rowCount=None, chunkSize=P_CHUNK_SIZE):
+        TileMap.__init__(self, rowCount)
+        self.generateChunk = generateChunk
+        self.chunkSize = chunkSize
+        self.chunks = set() # 生成済みのチャンクの番号
+        self.generatedChunkCount = 0 # チャンクを生成した回数
+        self.discardedChunkCount = 0 # チャンクを捨てた回数
+
+    def ensureChunk(self, row):
+        if not self.isInside(row):
+            return
+        chunk = row // self.chunkSize
+        if chunk not in self.chunks:
+            self.chunks.add(chunk)
+            endRow = (chunk + 1) * self.chunkSize
+            if self.rowCount is not None:
+                endRow = min(endRow, self.rowCount)
+            self.generateChunk(self, chunk * self.chunkSize, endRow)
+            self.generatedChunkCount += 1
+
+    def get(self, x, row):
+        self.ensureChunk(row)
+        return TileMap.get(self, x, row)
+
+    def getRow(self, row):
+        self.ensureChunk(row)
+        return TileMap.getRow(self, row)
+
+    def getMask(self, row):
+        self.ensureChunk(row)
+        return TileMap.getMask(self, row)
+
+    def discardRows(self, firstRow, endRow):
+        """
+        firstRow 行目から endRow - 1 行目までと重ならないチャンクを捨てる。
+        捨てたチャンクをまた読み出した場合は、もう1度生成する。
+        """
+        for chunk in [chunk for chunk in self.chunks if (chunk + 1) * self.chunkSize <= firstRow or chunk * self.chunkSize >= endRow]:
+            for row in range(chunk * self.chunkSize, (chunk + 1) * self.chunkSize):
+                self.rows.pop(row, None)
+                self.masks.pop(row, None)
+            self.chunks.remove(chunk)
+            self.discardedChunkCount += 1
+
+
+class SpriteSheet(object):
+    """
+    物のアニメーションのフレームの集まり。各フレームは、幅 width のパレットのインデックスの配列（bytes）である。
+    インデックス 0 のセルは透明である。
+    当たり判定のために、各フレームの各行の透明でない列を、ビットマスクとしても持つ。
+    作った後は変更しないので、複数の Sprite で共有できる。
+    """
+
+    def __init__(self, frames, width=TileMap.P_WIDTH):
+        self.frames = tuple(bytes(frame) for frame in frames)
+        self.width = width
+        self.height = len(self.frames[0]) // width
+        # self.frameMasks[frameIndex][dy] は、dy 行目の透明でない列のビットマスク（x = 0 の位置）
+        self.frameMasks = tuple(tuple(sum(1 << i for i in range(width) if frame[dy * width + i] != 0) for dy in range(self.height)) for frame in self.frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+
+class Sprite(object):
+    """
+    地図の上に重ねて描く物。sheet（SpriteSheet か、SpriteSheet に渡すフレームのリスト）の
+    frameIndex 番目のフレームを、左上が (x, row) の位置に描く。
+    """
+
+    def __init__(self, sheet, width=TileMap.P_WIDTH, x=0, row=0):
+        self.sheet = sheet if isinstance(sheet, SpriteSheet) else SpriteSheet(sheet, width)
+        self.width = self.sheet.width
+        self.height = self.sheet.height
+        self.x = x
+        self.row = row
+        self.frameIndex = 0
+        self.visible = True
+
+    def moveTo(self, x, row):
+        self.x = x
+        self.row = row
+
+    def getState(self):
+        """
+        描画に影響する状態を返す。前回描いた時と同じであれば、描き直す必要はない。
+        """
+        return (self.x, self.row, self.frameIndex, self.visible)
+
+    def getMask(self, row, x=None, top=None):
+        """
+        地図の row 行目のうち、この物が描かれる列のビットマスクを返す。
+        x と top を指定した場合は、左上が (x, top) の位置にあるものとして返す。
+        """
+        x = self.x if x is None else x
+        top = self.row if top is None else top
+        if not self.visible or not (top <= row < top + self.height):
+            return 0
+        return shiftMask(self.sheet.frameMasks[self.frameIndex][row - top], x)
+
+    def drawRow(self, line, row):
+        """
+        地図の row 行目の 8 バイトの配列 line に、この物を重ねて描く。
+        """
+        if not self.visible or not (self.row <= row < self.row + self.height):
+            return
+        frame = self.sheet.frames[self.frameIndex]
+        start = (row - self.row) * self.width
+        for i in range(self.width):
+            index = frame[start + i]
+            if index != 0 and 0 <= self.x + i < TileMap.P_WIDTH:
+                line[self.x + i] = index
+
+
+class CollisionIndex(object):
+    """
+    地図と、その上の物（Sprite）の当たり判定をする。
+    各行の何かがある列をビットマスクで表し、ビットごとの AND で重なりを調べるので、描画とは独立に、1行あたり O(1) で判定できる。
+    """
+
+    def __init__(self, tileMap):
+        self.tileMap = tileMap
+        self.sprites = [] # 当たり判定の対象の物
+
+    def addSprite(self, sprite):
+        self.sprites.append(sprite)
+        return sprite
+
+    def getMask(self, row, exclude=None):
+        """
+        row 行目の、地図と exclude 以外の物がある列のビットマスクを返す。
+        """
+        mask = self.tileMap.getMask(row)
+        for sprite in self.sprites:
+            if sprite is not exclude:
+                mask |= sprite.getMask(row)
+        return mask
+
+    def collides(self, sprite, x=None, top=None):
+        """
+        sprite が、地図か他の物と重なっているかどうかを返す。
+        x と top を指定した場合は、左上が (x, top) の位置に動かしたとしたら重なるかどうかを返す。
+        """
+        top = sprite.row if top is None else top
+        for row in range(top, top + sprite.height):
+            mask = sprite.getMask(row, x, top)
+            if mask != 0 and mask & self.getMask(row, sprite) != 0:
+                return True
+        return False
+
+
+class TileMapRenderer(object):
+    """
+    地図と、その上に重ねる物（Sprite）を、8 x 8 の画面に合成する。
+    前回と同じ位置を表示する場合は、状態が変わった物が重なる行だけを合成し直す。
+    何も変わっていなければ、前回と同一の Screen を返すので、呼び出し元は画面の書き込みを省ける。
+    """
+
+    def __init__(self, palette, tileMap):
+        self.palette = palette
+        self.tileMap = tileMap
+        self.sprites = [] # 追加した順に重ねて描く
+        self.screen = None # 前回合成した画面
+        self.top = None # 前回合成した画面の一番上の行の番号
+        self.mapVersion = None # 前回合成した時の tileMap.version
+        self.spriteStates = {} # 物から、前回合成した時の getState() への辞書
+        self.renderCount = 0 # render() を呼んだ回数
+        self.composedRowCount = 0 # 合成し直した行の数
+
+    def addSprite(self, sprite):
+        self.sprites.append(sprite)
+        return sprite
+
+    def getDirtyRows(self, top):
+        """
+        前回合成した画面から変わった、地図の行の番号の集合を返す。
+        """
+        if self.screen is None or top != self.top or self.tileMap.version != self.mapVersion:
+            return set(range(top, top + 8))
+        rows = set()
+        for sprite in self.sprites:
+            state = sprite.getState()
+            lastState = self.spriteStates.get(sprite)
+            if state == lastState:
+                continue
+            if lastState is not None and lastState[3]:
+                rows.update(range(lastState[1], lastState[1] + sprite.height))
+            if sprite.visible:
+                rows.update(range(sprite.row, sprite.row + sprite.height))
+        return {row for row in rows if top <= row < top + 8}
+
+    def render(self, top):
+        """
+        地図の top 行目から 8 行分を表示する画面を返す。
+        """
+        self.renderCount += 1
+        dirtyRows = self.getDirtyRows(top)
+        if len(dirtyRows) == 0:
+            return self.screen
+        screen = Screen(self.palette) if self.screen is None else self.screen.copy()
+        for row in dirtyRows:
+            line = bytearray(self.tileMap.getRow(row))
+            for sprite in self.sprites:
+                sprite.drawRow(line, row)
+            y = row - top
+            screen[y * 8 : y * 8 + 8] = line
+        self.composedRowCount += len(dirtyRows)
+        self.screen = screen
+        self.top = top
+        self.mapVersion = self.tileMap.version
+        self.spriteStates = {sprite: sprite.getState() for sprite in self.sprites}
+        return screen
+
+    def getStatsText(self):
+        return "{} renders, {} rows composed".format(self.renderCount, self.composedRowCount)
@@ -0,0 +1,91 @@
+class Viewport(object):
+    """
+    WallGrid の一部を、width x height の画面として表示するための窓。
+    窓の中の各行の壁のビットマスク（masks）と、壁を wallColor、通路を aisleColor にした画面（pixels）をキャッシュする。
+    スクロールの位置が縦か横に 1 だけ変わった場合は、キャッシュをずらして、新しく見えるようになった1行か1列だけを WallGrid から読む。
+    それ以外の場合は、窓の全体を読み直す。どちらの場合も、読むセルの数は迷路の大きさによらない。
+    """
+
+    def __init__(self, grid, wallColor, aisleColor, width=8, height=8):
+        self.grid = grid
+        self.wallColor = wallColor
+        self.aisleColor = aisleColor
+        self.width = width
+        self.height = height
+        self.left = None # 窓の左端の列。まだ読んでいなければ None
+        self.top = None # 窓の上端の行
+        self.masks = [] # 窓の各行の壁のビットマスク。ビット i が、left + i 列目を表す
+        self.pixels = [] # 窓の画面。width x height 個の色の配列
+        self.fetchedCellCount = 0 # WallGrid から読んだセルの数
+        self.refreshCount = 0 # 窓の全体を読み直した回数
+
+    def getColor(self, isWall):
+        return self.wallColor if isWall else self.aisleColor
+
+    def refresh(self):
+        """
+        窓の全体を読み直す。
+        """
+        self.masks = self.grid.getWindowMasks(self.left, self.top, self.width, self.height)
+        self.pixels = [self.getColor((mask >> x) & 1 == 1) for mask in self.masks for x in range(self.width)]
+        self.fetchedCellCount += self.width * self.height
+        self.refreshCount += 1
+
+    def shiftColumns(self, dx):
+        """
+        窓を横に dx（1 か -1）列ずらし、新しく見えるようになった列だけを読む。
+        """
+        width = self.width
+        x = width - 1 if dx > 0 else 0 # 窓の中の、新しく見えるようになった列
+        column = self.left + x # 新しく見えるようになった、迷路の列
+        for y in range(self.height):
+            isWall = self.grid.getRowSpan(self.top + y, column, 1) == 1
+            mask = self.masks[y] >> 1 if dx > 0 else (self.masks[y] << 1) & ((1 << width) - 1)
+            self.masks[y] = mask | (1 << x) if isWall else mask
+            start = y * width
+            if dx > 0:
+                del self.pixels[start]
+                self.pixels.insert(start + width - 1, self.getColor(isWall))
+            else:
+                del self.pixels[start + width - 1]
+                self.pixels.insert(start, self.getColor(isWall))
+        self.fetchedCellCount += self.height
+
+    def shiftRows(self, dy):
+        """
+        窓を縦に dy（1 か -1）行ずらし、新しく見えるようになった行だけを読む。
+        """
+        width = self.width
+        y = self.top + (self.height - 1 if dy > 0 else 0) # 新しく見えるようになった、迷路の行
+        mask = self.grid.getRowSpan(y, self.left, width)
+        line = [self.getColor((mask >> x) & 1 == 1) for x in range(width)]
+        if dy > 0:
+            del self.masks[0]
+            self.masks.append(mask)
+            self.pixels = self.pixels[width:] + line
+        else:
+            del self.masks[-1]
+            self.masks.insert(0, mask)
+            self.pixels = line + self.pixels[:-width]
+        self.fetchedCellCount += width
+
+    def scrollTo(self, left, top):
+        """
+        窓の左上を (left, top) にする。
+        """
+        if self.left is None or abs(left - self.left) > 1 or abs(top - self.top) > 1:
+            self.left = left
+            self.top = top
+            self.refresh()
+            return
+        if left != self.left:
+            dx = left - self.left
+            self.left = left
+            self.shiftColumns(dx)
+        if top != self.top:
+            dy = top - self.top
+            self.top = top
+            self.shiftRows(dy)
+
+    def getStatsText(self):
+        return "{} cells fetched, {} full refreshes".format(self.fetchedCellCount, self.refreshCount)
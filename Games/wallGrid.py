@@ -0,0 +1,110 @@
+class WallGrid(object):
+    """
+    迷路の壁を、1セルを1ビットで表す横 width、縦 height の格子。ビットが 1 であれば壁、0 であれば通路である。
+    各行は rowBytes バイトで、bits の y * rowBytes バイト目から始まる。列 x は、その行の x // 8 バイト目の x % 8 ビット目である。
+    4096 x 4096 の迷路でも 2 MB で持てる。
+    shareBits を True にすると、bits（mmap の memoryview など）をコピーせずに、そのまま使う。
+    セル (x, y) のビットの番号 y * rowBits + x を、セルのインデックスとしても使う。
+    1行を、ビット x が列 x を表す整数（行のビットマスク）として読み書きできるので、範囲の問い合わせは整数のビット演算でまとめて行える。
+    """
+
+    def __init__(self, width, height, bits=None, shareBits=False):
+        self.width = width
+        self.height = height
+        self.rowBytes = (width + 7) // 8 # 1行のバイト数
+        self.rowBits = self.rowBytes * 8 # 1行のビット数。下の行の同じ列のセルのインデックスは、この数だけ大きい
+        if bits is None:
+            bits = bytearray(self.rowBytes * height)
+        elif not shareBits:
+            bits = bytearray(bits)
+        self.bits = bits
+        self.fullRowMask = (1 << width) - 1 # すべての列が壁の行のビットマスク
+
+    def copy(self):
+        return WallGrid(self.width, self.height, self.bits)
+
+    def getIndex(self, x, y):
+        return y * self.rowBits + x
+
+    def getPosition(self, index):
+        return index % self.rowBits, index // self.rowBits
+
+    def isWall(self, x, y):
+        index = y * self.rowBits + x
+        return (self.bits[index >> 3] >> (index & 7)) & 1 == 1
+
+    def setWall(self, x, y, isWall):
+        index = y * self.rowBits + x
+        if isWall:
+            self.bits[index >> 3] |= 1 << (index & 7)
+        else:
+            self.bits[index >> 3] &= ~(1 << (index & 7))
+
+    def getRowMask(self, y):
+        """
+        y 行目の壁のビットマスクを返す。迷路の外の行は 0（壁なし）である。
+        """
+        if not (0 <= y < self.height):
+            return 0
+        return int.from_bytes(self.bits[y * self.rowBytes : (y + 1) * self.rowBytes], "little")
+
+    def setRowMask(self, y, mask):
+        self.bits[y * self.rowBytes : (y + 1) * self.rowBytes] = (mask & self.fullRowMask).to_bytes(self.rowBytes, "little")
+
+    def setRowFromText(self, y, text):
+        """
+        y 行目を、列ごとに b"1"（壁）か b"0"（通路）を並べた width バイトの text で設定する。
+        1セルずつ設定するよりも速いので、生成した迷路をまとめて書き込むのに使う。
+        """
+        self.setRowMask(y, int(text[::-1], 2))
+
+    def getRowText(self, y):
+        """
+        y 行目を、列ごとに b"1"（壁）か b"0"（通路）を並べた width バイトの bytes で返す。setRowFromText() の逆である。
+        """
+        return format(self.getRowMask(y), "0{}b".format(self.width))[::-1].encode("ascii")
+
+    def getRowSpan(self, y, left, width=8):
+        """
+        y 行目の left 列目から width 列分の壁のビットマスクを返す。ビット i が left + i 列目を表す。迷路の外は壁なしとして扱う。
+        その範囲のバイトだけを読むので、迷路の幅によらず一定の時間で返す。
+        """
+        start = max(left, 0)
+        end = min(left + width, self.width)
+        if not (0 <= y < self.height) or start >= end:
+            return 0
+        rowStart = y * self.rowBytes
+        firstByte = start >> 3
+        value = int.from_bytes(self.bits[rowStart + firstByte : rowStart + ((end - 1) >> 3) + 1], "little")
+        value = (value >> (start - firstByte * 8)) & ((1 << (end - start)) - 1)
+        return value << (start - left)
+
+    def getWindowMasks(self, left, top, width=8, height=8):
+        """
+        左上が (left, top) の width x height の範囲の、各行の壁のビットマスクのリストを返す。
+        ビット i が、その行の left + i 列目を表す。迷路の外は壁なしとして扱う。
+        """
+        return [self.getRowSpan(y, left, width) for y in range(top, top + height)]
+
+    def fill(self):
+        """
+        すべてのセルを壁にする。
+        """
+        self.bits[:] = self.fullRowMask.to_bytes(self.rowBytes, "little") * self.height
+
+    def fillBorder(self):
+        """
+        外周だけを壁にする。
+        """
+        sideMask = 1 | (1 << (self.width - 1))
+        for y in range(self.height):
+            self.setRowMask(y, self.fullRowMask if y == 0 or y == self.height - 1 else sideMask)
+
+    def countWalls(self):
+        return bin(int.from_bytes(self.bits, "little")).count("1")
+
+    def getMemoryBytes(self):
+        """
+        壁を持つのに使っているバイト数を返す。
+        """
+        return len(self.bits)